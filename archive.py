@@ -0,0 +1,218 @@
+"""SQLite archive of every published pool cache, for history queries.
+
+good_list_cache.json only ever holds the latest scrape, so a cancelled session
+or a closure leaves no trace. The scraper's archive sink appends each published
+snapshot to tmp/archive.sqlite3:
+
+    snapshots(id, taken_at, window_start, window_end, pool_count, session_count)
+    pools(locationid, complexname, address, x, y, pool_type, first_seen, last_seen)
+    sessions(snapshot_id, locationid, start_time, end_time, pool_length)
+    removals(snapshot_id, locationid, start_time, end_time, pool_length)
+
+`removals` is filled at ingest: the previous snapshot's sessions that are missing
+from this one although this snapshot's window (its earliest to latest session)
+still covers them. Sessions that simply fell into the past are not removals.
+
+Times are the cache's naive Toronto ISO strings, which sort as text. Sessions
+are indexed by (locationid, start_time) and by snapshot. Ingest is one
+transaction of bulk inserts. The database runs in WAL mode, so the API's
+read-only connections never block the scraper's writer, and the writer never
+blocks them.
+"""
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FILE = "tmp/archive.sqlite3"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    taken_at TEXT NOT NULL,
+    window_start TEXT,
+    window_end TEXT,
+    pool_count INTEGER NOT NULL,
+    session_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (taken_at);
+
+CREATE TABLE IF NOT EXISTS pools (
+    locationid INTEGER PRIMARY KEY,
+    complexname TEXT,
+    address TEXT,
+    x REAL,
+    y REAL,
+    pool_type TEXT,
+    first_seen INTEGER NOT NULL REFERENCES snapshots (id),
+    last_seen INTEGER NOT NULL REFERENCES snapshots (id)
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    locationid INTEGER NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    pool_length TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_by_pool ON sessions (locationid, start_time);
+CREATE INDEX IF NOT EXISTS sessions_by_snapshot ON sessions (snapshot_id, locationid, start_time);
+
+CREATE TABLE IF NOT EXISTS removals (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id),
+    locationid INTEGER NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    pool_length TEXT
+);
+CREATE INDEX IF NOT EXISTS removals_by_pool ON removals (locationid, start_time);
+CREATE INDEX IF NOT EXISTS removals_by_time ON removals (start_time);
+"""
+
+_REMOVALS = """
+INSERT INTO removals (snapshot_id, locationid, start_time, end_time, pool_length)
+SELECT DISTINCT :current, p.locationid, p.start_time, p.end_time, p.pool_length
+FROM sessions p
+WHERE p.snapshot_id = :previous AND p.start_time >= :window_start AND p.start_time <= :window_end
+  AND NOT EXISTS (
+    SELECT 1 FROM sessions c
+    WHERE c.snapshot_id = :current AND c.locationid = p.locationid AND c.start_time = p.start_time
+      AND c.end_time = p.end_time AND c.pool_length IS p.pool_length
+  )
+"""
+
+
+def connect(path=ARCHIVE_FILE, readonly=False):
+    """A connection to the archive. The writer creates the schema and turns on
+    WAL; read-only connections fail (sqlite3.OperationalError) while there is
+    no archive yet."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        return conn
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        conn.close()
+        raise RuntimeError(f"{path} is archive schema v{version}, newer than this code (v{SCHEMA_VERSION})")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def ingest(pool_data, taken_at, path=ARCHIVE_FILE):
+    """Append one published cache (the scraper's pool list) as a snapshot taken
+    at `taken_at` (naive Toronto datetime). Returns the snapshot id."""
+    sessions = [
+        (pool.get("locationid"), s["start_time"], s["end_time"], s.get("pool_length", "Unknown"))
+        for pool in pool_data
+        for s in pool.get("swim_data", [])
+        if s.get("start_time") and s.get("end_time") and pool.get("locationid") is not None
+    ]
+    starts = [row[1] for row in sessions]
+    conn = connect(path)
+    try:
+        with conn:
+            previous = conn.execute("SELECT MAX(id) FROM snapshots").fetchone()[0]
+            current = conn.execute(
+                "INSERT INTO snapshots (taken_at, window_start, window_end, pool_count, session_count) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (taken_at.isoformat(timespec="seconds"), min(starts, default=None), max(starts, default=None),
+                 len(pool_data), len(sessions)),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO sessions (snapshot_id, locationid, start_time, end_time, pool_length) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(current,) + row for row in sessions],
+            )
+            conn.executemany(
+                "INSERT INTO pools (locationid, complexname, address, x, y, pool_type, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (locationid) DO UPDATE SET complexname = excluded.complexname, "
+                "address = excluded.address, x = excluded.x, y = excluded.y, pool_type = excluded.pool_type, "
+                "last_seen = excluded.last_seen",
+                [(pool["locationid"], pool.get("complexname"), (pool.get("address") or "").strip(), pool.get("x"),
+                  pool.get("y"), pool.get("pool_type"), current, current)
+                 for pool in pool_data if pool.get("locationid") is not None],
+            )
+            removed = 0
+            if previous is not None and starts:
+                removed = conn.execute(_REMOVALS, dict(current=current, previous=previous,
+                                                       window_start=min(starts), window_end=max(starts))).rowcount
+    finally:
+        conn.close()
+    logger.info(f"Archived snapshot {current}: {len(sessions)} sessions, {removed} removed since the last one")
+    return current
+
+
+def pool_history(conn, locationid, start_date=None, end_date=None):
+    """Every session ever archived for the pool with start_time in
+    start_date..end_date (ISO strings, optional), oldest first. Each has
+    first_seen and last_seen (when it was in the published schedule) and
+    removed_at (when it was first found missing, or None). Returns None for
+    a pool the archive has never seen."""
+    if conn.execute("SELECT 1 FROM pools WHERE locationid = ?", (locationid,)).fetchone() is None:
+        return None
+    where, params = _window("s", start_date, end_date)
+    rows = conn.execute(
+        "SELECT s.start_time, s.end_time, s.pool_length, MIN(n.taken_at) AS first_seen, "
+        "MAX(n.taken_at) AS last_seen, "
+        "(SELECT MIN(m.taken_at) FROM removals r JOIN snapshots m ON m.id = r.snapshot_id "
+        " WHERE r.locationid = s.locationid AND r.start_time = s.start_time AND r.end_time = s.end_time "
+        " AND r.pool_length IS s.pool_length) AS removed_at "
+        "FROM sessions s JOIN snapshots n ON n.id = s.snapshot_id "
+        f"WHERE s.locationid = ?{where} "
+        "GROUP BY s.start_time, s.end_time, s.pool_length ORDER BY s.start_time, s.end_time",
+        [locationid] + params,
+    )
+    return [dict(row) for row in rows]
+
+
+def removed_sessions(conn, start_date=None, end_date=None, locationid=None):
+    """Sessions dropped from the published schedule, with start_time in
+    start_date..end_date, oldest first: locationid, complexname, start_time,
+    end_time, pool_length and removed_at (the snapshot that dropped it)."""
+    where, params = _window("r", start_date, end_date)
+    if locationid is not None:
+        where += " AND r.locationid = ?"
+        params.append(locationid)
+    rows = conn.execute(
+        "SELECT r.locationid, p.complexname, r.start_time, r.end_time, r.pool_length, n.taken_at AS removed_at "
+        "FROM removals r JOIN snapshots n ON n.id = r.snapshot_id LEFT JOIN pools p ON p.locationid = r.locationid "
+        f"WHERE 1 = 1{where} ORDER BY r.start_time, r.locationid, n.taken_at",
+        params,
+    )
+    return [dict(row) for row in rows]
+
+
+def _window(table, start_date, end_date):
+    where, params = "", []
+    if start_date is not None:
+        where += f" AND {table}.start_time >= ?"
+        params.append(start_date)
+    if end_date is not None:
+        where += f" AND {table}.start_time <= ?"
+        params.append(end_date)
+    return where, params
+
+
+_readers = threading.local()
+
+
+def reader(path=ARCHIVE_FILE):
+    """This thread's read-only connection to the archive (opened once), or
+    None while there is no archive yet."""
+    conn = getattr(_readers, "conn", None)
+    if conn is None or _readers.path != path:
+        if not os.path.exists(path):
+            return None
+        conn = _readers.conn = connect(path, readonly=True)
+        _readers.path = path
+    return conn
@@ -0,0 +1,53 @@
+"""Atomic file writes, shared by the scraper, its sinks and the API's helpers.
+
+Every file another process reads while it may be rewritten (the caches the API
+watches, the compact snapshot, the prerendered pages nginx serves, exports) is
+written to a temp file in the same directory and renamed over the target, so a
+reader sees either the old file or the complete new one, never a truncated
+write. The temp file gets `mode` before the rename: mkstemp creates it 0600,
+which would hide the result from a reader running as another user (nginx).
+"""
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+DEFAULT_MODE = 0o644
+
+
+@contextmanager
+def atomic_open(path, text=False, mode=DEFAULT_MODE, fsync=True):
+    """Open a temp file next to `path` for writing (binary, or UTF-8 text with
+    text=True). When the block exits normally it is flushed, fsynced (unless
+    fsync=False), given `mode` and renamed over `path`; on an error it is
+    removed and `path` is left as it was."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w" if text else "wb", **({"encoding": "utf-8"} if text else {})) as f:
+            yield f
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_atomic(path, data, mode=DEFAULT_MODE, fsync=True):
+    """Replace `path` with `data` (bytes, or str written as UTF-8)."""
+    with atomic_open(path, text=isinstance(data, str), mode=mode, fsync=fsync) as f:
+        f.write(data)
+    return path
+
+
+def write_json_atomic(path, data, indent=None, mode=DEFAULT_MODE):
+    """Replace `path` with `data` as JSON (UTF-8, non-ASCII kept as is)."""
+    with atomic_open(path, text=True, mode=mode) as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    return path
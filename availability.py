@@ -0,0 +1,162 @@
+"""Lane-swim availability aggregates, computed at scrape time for /stats/availability.
+
+"When in the week are there the most lane swims near me?" needs every session
+of every pool. Instead of the API rescanning them per request, the scraper's
+availability sink counts them once. For each (geo cell, pool type, session
+length) it stores a 168-slot array: how many sessions are open during each hour
+of the week (slot 0 is Monday 00:00-01:00, in Toronto wall-clock time). The
+counts are summed over the weeks the cache covers. A session counts in every
+hour it overlaps.
+
+The result is written to tmp/availability_stats.json. The API keeps it in an
+AvailabilityStats snapshot and answers a query by adding up the arrays of the
+series that match its filters. That is at most a few hundred arrays of 168
+numbers, however many sessions there are. Geo cells are the same 0.02-degree
+grid geo.GridIndex uses, so a radius filter is applied per cell (about 2 km).
+"""
+import math
+from datetime import timedelta
+
+from atomic_io import write_json_atomic
+from geo import KM_PER_DEGREE_LAT, haversine_km, pool_coordinates
+import pool_store
+
+AVAILABILITY_FILE = "tmp/availability_stats.json"
+STATS_VERSION = 1
+HOURS_PER_WEEK = 7 * 24
+CELL_DEG = 0.02
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def hour_of_week(dt):
+    return dt.weekday() * 24 + dt.hour
+
+
+def build(pool_data, generated_at=None, cell_deg=CELL_DEG):
+    """The stats document for a cache's pool list (first record per
+    locationid, like /pools)."""
+    series = {}
+    starts = []
+    seen_ids = set()
+    for pool in pool_data:
+        if pool.get("locationid") in seen_ids:
+            continue
+        seen_ids.add(pool.get("locationid"))
+        point = pool_coordinates(pool)
+        cell = None if point is None else [int(math.floor(point[0] / cell_deg)), int(math.floor(point[1] / cell_deg))]
+        kind = pool_store.pool_type(pool)
+        for swim_data in pool.get("swim_data", []):
+            try:
+                start, end = pool_store.parse_iso(swim_data["start_time"]), pool_store.parse_iso(swim_data["end_time"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if end <= start:
+                continue
+            starts.append(start)
+            key = (None if cell is None else tuple(cell), kind, swim_data.get("pool_length", "Unknown"))
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = {"cell": cell, "pool_type": kind, "pool_length": key[2],
+                                       "pools": set(), "counts": [0] * HOURS_PER_WEEK}
+            entry["pools"].add(pool.get("locationid"))
+            counts = entry["counts"]
+            # Every hour slot the session overlaps, from the one it starts in.
+            first = hour_of_week(start)
+            span = math.ceil((end - start.replace(minute=0, second=0, microsecond=0)) / timedelta(hours=1))
+            for h in range(first, first + min(span, HOURS_PER_WEEK)):
+                counts[h % HOURS_PER_WEEK] += 1
+    if starts:
+        first_monday = min(starts).date() - timedelta(days=min(starts).weekday())
+        weeks = (max(starts).date() - first_monday).days // 7 + 1
+    else:
+        weeks = 0
+    return {
+        "version": STATS_VERSION,
+        "generated_at": generated_at.isoformat(timespec="seconds") if generated_at else None,
+        "window_start": min(starts).isoformat() if starts else None,
+        "window_end": max(starts).isoformat() if starts else None,
+        "weeks": weeks,
+        "cell_deg": cell_deg,
+        "series": [dict(entry, pools=sorted(entry["pools"], key=str)) for entry in series.values()],
+    }
+
+
+class AvailabilityStats:
+    """The stats document held by the API, queried by summing series."""
+
+    def __init__(self, data, generation=0):
+        self.generation = generation
+        self.data = data
+        self.cell_deg = data.get("cell_deg", CELL_DEG)
+        self.series = data.get("series", [])
+        self.lengths = {entry["pool_length"] for entry in self.series}
+        # Queries without a radius come from a small, fixed set of filters:
+        # each is summed once per snapshot.
+        self._memo = {}
+
+    def _near(self, cell, lat, lng, radius_km):
+        # Distance to the nearest point of the cell, so cells the circle only
+        # clips still count.
+        if cell is None:
+            return False
+        south, west = cell[0] * self.cell_deg, cell[1] * self.cell_deg
+        nearest_lat = min(max(lat, south), south + self.cell_deg)
+        nearest_lng = min(max(lng, west), west + self.cell_deg)
+        return haversine_km(lat, lng, nearest_lat, nearest_lng) <= radius_km
+
+    def query(self, pool_type=None, pool_length=None, lat=None, lng=None, radius_km=None, group_by=None):
+        """{"hour_of_week": [168 counts], "pools": n} over the matching series,
+        plus "groups" ({key: [168 counts]}) when group_by is "pool_type",
+        "pool_length" or "cell"."""
+        if radius_km is None and (pool_length is None or pool_length in self.lengths):
+            key = (pool_type, pool_length, group_by)
+            result = self._memo.get(key)
+            if result is None:
+                result = self._memo[key] = self._sum(pool_type, pool_length, None, None, None, group_by)
+            return result
+        return self._sum(pool_type, pool_length, lat, lng, radius_km, group_by)
+
+    def _sum(self, pool_type, pool_length, lat, lng, radius_km, group_by):
+        total = [0] * HOURS_PER_WEEK
+        groups = {}
+        pools = set()
+        # Only cells whose box is within reach can be near: skip the rest
+        # without a haversine.
+        reach = None if radius_km is None else radius_km / KM_PER_DEGREE_LAT + self.cell_deg
+        for entry in self.series:
+            if pool_type is not None and entry["pool_type"] != pool_type:
+                continue
+            if pool_length is not None and entry["pool_length"] != pool_length:
+                continue
+            if radius_km is not None:
+                cell = entry["cell"]
+                if cell is None or abs(cell[0] * self.cell_deg - lat) > reach:
+                    continue
+                if not self._near(cell, lat, lng, radius_km):
+                    continue
+            counts = entry["counts"]
+            total = [a + b for a, b in zip(total, counts)]
+            pools.update(entry["pools"])
+            if group_by is not None:
+                key = entry[group_by]
+                key = "unlocated" if key is None else ",".join(map(str, key)) if group_by == "cell" else key
+                group = groups.get(key)
+                groups[key] = counts if group is None else [a + b for a, b in zip(group, counts)]
+        result = {"hour_of_week": total, "pools": len(pools)}
+        if group_by is not None:
+            result["groups"] = groups
+        return result
+
+
+def peak_hours(counts, top=5):
+    """The busiest hour slots: [{"day", "hour", "hour_of_week", "count"}]."""
+    best = sorted((h for h in range(len(counts)) if counts[h]), key=lambda h: (-counts[h], h))[:top]
+    return [{"day": DAYS[h // 24], "hour": h % 24, "hour_of_week": h, "count": counts[h]} for h in best]
+
+
+def write(pool_data, path=AVAILABILITY_FILE, generated_at=None):
+    write_json_atomic(path, build(pool_data, generated_at))
+    return path
+
+
+availability_store = pool_store.SnapshotStore(AVAILABILITY_FILE, AvailabilityStats, required=False)
@@ -2,8 +2,13 @@
 
 Toronto Public Health samples its supervised beaches daily in summer and posts a
 SAFE / UNSAFE swim advisory per beach. The City's own beach page is powered by two
-JSON endpoints (below); we read the same feed, reduce it to the latest posting per
-beach, and write tmp/beaches_cache.json for the /beaches API + the beaches page.
+JSON endpoints (below); we read the same feed, keep every sample in a per-beach
+history (tmp/beach_history.json), and write the latest posting per beach to
+tmp/beaches_cache.json for the /beaches API + the beaches page.
+
+Each refresh only asks the feed for the dates from the newest stored sample
+onwards and merges them into the history; the first run (or a lost history)
+backfills RESULTS_WINDOW_DAYS.
 
 Degrades cleanly: any network/parse failure leaves the previous cache untouched and
 never raises to the caller (the scrape must not fail because beaches are down).
@@ -16,27 +21,60 @@ import logging
 import os
 from datetime import datetime, timedelta
 
+import clock
+import http_client
+from atomic_io import write_json_atomic
+
 logger = logging.getLogger(__name__)
 
-BEACH_LIST_URL = "https://secure.toronto.ca/opendata/adv/beach_list/v1?format=json"
-BEACH_RESULTS_URL = "https://secure.toronto.ca/opendata/adv/beach_results/v1?format=json&startDate={start}&endDate={end}"
+# Override (e.g. LANEDUCK_OPENDATA_URL=http://127.0.0.1:8765) to use fixture_server.py.
+OPENDATA_BASE_URL = os.environ.get("LANEDUCK_OPENDATA_URL", "https://secure.toronto.ca")
+BEACH_LIST_URL = OPENDATA_BASE_URL + "/opendata/adv/beach_list/v1?format=json"
+BEACH_RESULTS_URL = OPENDATA_BASE_URL + "/opendata/adv/beach_results/v1?format=json&startDate={start}&endDate={end}"
 OUTPUT_FILE = "tmp/beaches_cache.json"
-RESULTS_WINDOW_DAYS = 30   # look back far enough to find the latest posting, in or off season
+HISTORY_FILE = "tmp/beach_history.json"
+HISTORY_VERSION = 1
+RESULTS_WINDOW_DAYS = 30   # backfill: look back far enough to find the latest posting, in or off season
 STALE_AFTER_DAYS = 3       # older than this -> flag as possibly out of date
 
 
 def _get_json(url):
-    """GET a URL and parse JSON, reusing the scraper's retry/backoff helper."""
-    from scrape import fetch_with_retries
-    resp = fetch_with_retries(url)
+    """GET a URL through the shared client (pooled connections, timeouts,
+    retry/backoff) and parse JSON."""
+    resp = http_client.get(url)
+    resp.raise_for_status()
     return resp.json()
 
 
-def _latest_status_by_beach(results):
-    """results: list of {CollectionDate, data:[{beachId, eColi, advisory, statusFlag}]}.
-    Return {beachId: {status, ecoli, advisory, sample_date}} keeping, per beach, the
-    most recent date that carries a posted status."""
-    latest = {}
+def load_history(path=HISTORY_FILE):
+    """{beach_id (str): [sample, ...] oldest first}. Empty when the file is
+    missing or unreadable, so the next fetch backfills instead of failing."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read {path} ({e}); starting a new beach history")
+        return {}
+    if data.get("version") != HISTORY_VERSION:
+        logger.warning(f"{path} is history format v{data.get('version')}, not v{HISTORY_VERSION}; starting over")
+        return {}
+    return data.get("beaches") or {}
+
+
+def newest_sample_date(history):
+    """The most recent sample_date across all beaches (ISO date), or None."""
+    return max((samples[-1]["sample_date"] for samples in history.values() if samples), default=None)
+
+
+def merge_results(history, results):
+    """Merge results (list of {CollectionDate, data:[{beachId, eColi, advisory,
+    statusFlag}]}) into history in place, one sample per beach per date. A
+    re-fetched date replaces the stored sample unless that would swap a posted
+    status for a blank one. Returns how many samples were added or changed."""
+    touched = {}
+    changed = 0
     for day in results or []:
         date = day.get("CollectionDate")
         if not date:
@@ -45,39 +83,55 @@ def _latest_status_by_beach(results):
             bid = rec.get("beachId")
             if bid is None:
                 continue
-            flag = (rec.get("statusFlag") or "").upper()
-            prev = latest.get(bid)
-            # Prefer the newest date; among equal dates prefer one that has a status.
-            if prev is None or date > prev["sample_date"] or (
-                date == prev["sample_date"] and flag and not prev["status"]
-            ):
-                latest[bid] = {
-                    "status": flag,                 # "SAFE" / "UNSAFE" / ""
-                    "ecoli": rec.get("eColi"),
-                    "advisory": rec.get("advisory") or "",
-                    "sample_date": date,
-                }
-    return latest
-
-
-def build(output_file=OUTPUT_FILE):
-    from scrape import now_toronto
-    today = now_toronto().date()
-
+            by_date = touched.get(str(bid))
+            if by_date is None:
+                by_date = touched[str(bid)] = {s["sample_date"]: s for s in history.get(str(bid), [])}
+            sample = {
+                "sample_date": date,
+                "status": (rec.get("statusFlag") or "").upper(),   # "SAFE" / "UNSAFE" / ""
+                "ecoli": rec.get("eColi"),
+                "advisory": rec.get("advisory") or "",
+            }
+            prev = by_date.get(date)
+            if prev != sample and (prev is None or sample["status"] or not prev["status"]):
+                by_date[date] = sample
+                changed += 1
+    for bid, by_date in touched.items():
+        history[bid] = [by_date[d] for d in sorted(by_date)]
+    return changed
+
+
+def build(output_file=OUTPUT_FILE, history_file=HISTORY_FILE):
+    """Fetch new beach results into the history and rebuild the beaches cache
+    from it. Returns the list written (for callers that render from it
+    directly), or None if the feed could not be fetched."""
+    today = clock.now_toronto().date()
+
+    history = load_history(history_file)
+    newest = newest_sample_date(history)
+    if newest is None:
+        start = (today - timedelta(days=RESULTS_WINDOW_DAYS)).isoformat()
+    else:
+        # From the newest stored date itself: samples are posted through the
+        # day, so that date may be incomplete.
+        start = min(newest, today.isoformat())
     try:
         beaches = _get_json(BEACH_LIST_URL)
-        start = (today - timedelta(days=RESULTS_WINDOW_DAYS)).isoformat()
         results = _get_json(BEACH_RESULTS_URL.format(start=start, end=today.isoformat()))
     except Exception as e:
         logger.error(f"Beaches fetch failed (non-fatal); cache left as-is: {e}")
         return None
 
-    status_by_beach = _latest_status_by_beach(results)
+    changed = merge_results(history, results)
+    os.makedirs(os.path.dirname(history_file) or ".", exist_ok=True)
+    write_json_atomic(history_file, {"version": HISTORY_VERSION, "beaches": history})
+    logger.info(f"Beach history: {changed} new/updated samples since {start} -> {history_file}")
 
     out = []
     for b in beaches or []:
         bid = b.get("beachId")
-        st = status_by_beach.get(bid, {})
+        samples = history.get(str(bid))
+        st = samples[-1] if samples else {}
         sample_date = st.get("sample_date")
         stale = True
         if sample_date:
@@ -101,14 +155,13 @@ def build(output_file=OUTPUT_FILE):
 
     out.sort(key=lambda x: x["beach_name"])
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(out, f, ensure_ascii=False, indent=2)
+    write_json_atomic(output_file, out, indent=2)
 
     safe = sum(1 for b in out if b["status"] == "SAFE")
     unsafe = sum(1 for b in out if b["status"] == "UNSAFE")
     logger.info(f"Beaches: wrote {len(out)} ({safe} safe, {unsafe} unsafe) -> {output_file}")
     print(f"Beaches: wrote {len(out)} beaches ({safe} safe, {unsafe} unsafe) -> {output_file}")
-    return output_file
+    return out
 
 
 if __name__ == "__main__":
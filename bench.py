@@ -0,0 +1,294 @@
+"""Benchmarks for the API's hot paths on synthetic, city-scale data.
+
+    python bench.py                       # full matrix -> bench_output.txt
+    python bench.py --scales 1 --weeks 2  # quick run
+    python bench.py --output /tmp/before.txt
+
+Two parts:
+
+  * Micro-benchmarks per dataset: building the snapshot, filtering a day and a
+    week window, building the simple view, and serializing (stdlib json vs
+    encode_json, full vs simple vs format=compact).
+  * A load driver: concurrent requests against the FastAPI app in-process
+    (httpx's ASGI transport — the full app stack, no sockets), reporting
+    p50/p95/p99 latency and requests/second for a mix of realistic queries.
+
+Datasets follow the good_list_cache.json schema at 1x, 10x and 100x Toronto's
+pool count and 2, 8 and 26 week horizons. The default runs the whole matrix;
+its top tier (100x/26w, ~3.1M sessions) takes several minutes and peaks near
+5 GB of memory. --max-sessions skips the combinations above it on a smaller
+machine, and every skipped one is listed in the report's header.
+
+The output is plain aligned text with the commit at the top, one result per
+line, so two runs can be diffed across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import compact_cache
+import pool_store
+from response_cache import ResponseCache, encode_json, orjson
+
+BENCH_OUTPUT_FILE = "bench_output.txt"
+TORONTO_POOLS = 83         # locations in pool_lengths.json
+SESSIONS_PER_WEEK = 15     # a typical pool's weekly lane swims
+SCALES = (1, 10, 100)
+HORIZONS = (2, 8, 26)
+MAX_SESSIONS = 4_000_000  # above 100x/26w, so the default covers the whole matrix
+# How much slower than the simple view format=compact may measure before the
+# report flags it.
+COMPACT_TOLERANCE = 1.1
+MONDAY = datetime(2026, 7, 6)
+
+FMT = pool_store.ISO_FORMAT
+
+
+def synthetic_cache(scale=1, weeks=2, seed=0, monday=MONDAY):
+    """A good_list_cache.json-shaped list: scale x Toronto's pools, each with
+    `weeks` weeks of sessions starting at `monday`."""
+    rng = random.Random(seed)
+    pools = []
+    for n in range(TORONTO_POOLS * scale):
+        locationid = 100 + n
+        outdoor = rng.random() < 0.2
+        length = rng.choice(["25m", "25m", "25m", "50m", "25y", "Unknown"])
+        sessions = []
+        for week in range(weeks):
+            for _ in range(max(1, int(rng.gauss(SESSIONS_PER_WEEK, 5)))):
+                start = monday + timedelta(weeks=week, days=rng.randint(0, 6), minutes=15 * rng.randint(24, 84))
+                end = start + timedelta(minutes=rng.choice([45, 60, 75, 90, 120]))
+                sessions.append({
+                    "status": "active",
+                    "start_time": start.strftime(FMT),
+                    "end_time": end.strftime(FMT),
+                    "id": rng.randint(1, 9),
+                    "pool_length": length if rng.random() < 0.2 else "Unknown",
+                })
+        sessions.sort(key=lambda s: s["start_time"])
+        pools.append({
+            "objectid": n + 1,
+            "locationid": locationid,
+            "complexname": f"{'Outdoor ' if outdoor else ''}Synthetic Recreation Centre {n}",
+            "location_type": "Outdoor Pool" if outdoor else "Indoor Pool",
+            "x": -79.62 + rng.random() * 0.48,
+            "y": 43.58 + rng.random() * 0.28,
+            "address": f"{rng.randint(1, 4000)} Example Ave  ",
+            "website": f"https://www.toronto.ca/explore-enjoy/parks-recreation/places-spaces/parks-and-recreation-facilities/location/?id={locationid}",
+            "show_on_map": "Yes",
+            "activity_type": "Lane Swim, Leisure Swim, Aquatic Fitness: Shallow",
+            "globalid": f"00000000-0000-0000-0000-{locationid:012d}",
+            "amenities": "Universal Change Room",
+            "created_date": 1651850979759,
+            "created_user": "gccagol",
+            "last_edited_date": 1730837911000,
+            "last_edited_user": "gccagol",
+            "swim_data": sessions,
+            "pool_type": "Outdoor" if outdoor else "Indoor",
+            "pool_length": length,
+        })
+    return pools
+
+
+def measure(fn, repeat=5, number=1):
+    """Median and min milliseconds per call of fn() over `repeat` rounds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) * 1000 / number)
+    return statistics.median(timings), min(timings)
+
+
+def micro_benchmarks(pools, weeks):
+    """[(name, median_ms, min_ms, note)] for one dataset."""
+    results = []
+    big = len(pools) * weeks > 10_000
+    snapshot = None
+
+    def build():
+        nonlocal snapshot
+        snapshot = pool_store.PoolSnapshot(pools)
+    results.append(("snapshot build",) + measure(build, repeat=1 if big else 3) + ("",))
+
+    day = (MONDAY + timedelta(days=2), MONDAY + timedelta(days=2, hours=23, minutes=59, seconds=59))
+    week = (MONDAY, MONDAY + timedelta(days=6, hours=23, minutes=59, seconds=59))
+    for label, (start, end) in (("day", day), ("week", week)):
+        matched = snapshot.match(start, end)
+        results.append((f"filter {label}",) + measure(lambda: snapshot.match(start, end), number=20) + (f"{len(matched)} pools",))
+
+    start, end = day
+    ranked = [(None, i) for i in snapshot.match(start, end)]
+    simple = list(pool_store.iter_rows(snapshot, ranked, start, end, simple=True))
+    full = list(pool_store.iter_rows(snapshot, ranked, start, end))
+    simple_ms = measure(lambda: list(pool_store.iter_rows(snapshot, ranked, start, end, simple=True)), number=5)
+    compact_ms = measure(lambda: pool_store.compact_view(snapshot, ranked, start, end), number=5)
+    results.append(("simple view day",) + simple_ms + ("",))
+    # format=compact is the frontend's default: it must not cost more than simple
+    # (compared on the best rounds, with COMPACT_TOLERANCE for timer noise).
+    slower = compact_ms[1] > simple_ms[1] * COMPACT_TOLERANCE
+    results.append(("compact view day",) + compact_ms + ("SLOWER THAN SIMPLE" if slower else "",))
+
+    def stdlib(content):
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    compact = pool_store.compact_view(snapshot, ranked, start, end)
+    for label, content in (("simple", simple), ("full", full), ("compact", compact)):
+        size = len(encode_json(content))
+        results.append((f"json.dumps {label} day",) + measure(lambda: stdlib(content), number=3) + (f"{size} bytes",))
+        results.append((f"encode_json {label} day",) + measure(lambda: encode_json(content), number=3) + ("orjson" if orjson else "json fallback",))
+    return results
+
+
+def _percentile(sorted_values, p):
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+async def _drive(app, paths, concurrency):
+    import httpx
+    latencies = []
+    queue = list(reversed(paths))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            while queue:
+                path = queue.pop()
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {path} -> {response.status_code}: {response.text[:200]}")
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return sorted(latencies), elapsed
+
+
+def query_mix(weeks, count, seed=0):
+    """Paths like the frontend's: day windows (mostly simple/compact), some
+    near-me queries, /pools/next and single-pool lookups."""
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        day = MONDAY + timedelta(days=rng.randint(0, 7 * weeks - 1))
+        window = f"start_date={day.strftime(FMT)}&end_date={day.replace(hour=23, minute=59, second=59).strftime(FMT)}"
+        kind = rng.random()
+        if kind < 0.45:
+            paths.append(f"/pools?{window}&simple=true")
+        elif kind < 0.7:
+            paths.append(f"/pools?{window}&format=compact")
+        elif kind < 0.85:
+            paths.append(f"/pools?{window}&simple=true&lat=43.65&lng=-79.38&radius_km=5")
+        elif kind < 0.95:
+            paths.append(f"/pools/next?time={(day + timedelta(hours=rng.randint(6, 20))).strftime(FMT)}&lat=43.7&lng=-79.4&limit=5")
+        else:
+            paths.append(f"/pools/{100 + rng.randint(0, TORONTO_POOLS - 1)}?simple=true&{window}")
+    return paths
+
+
+def load_test(pools, weeks, requests=500, concurrency=16):
+    """[(name, p50, p95, p99, req/s)] driving get_pools.app from a temporary
+    cache file (cold response cache first, then the same mix warm)."""
+    import get_pools
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "good_list_cache.json")
+        with open(path, "w") as f:
+            json.dump(pools, f)
+        compact_path = compact_cache.write(pools, os.path.join(tmp, "good_list_cache.bin"))
+        store = pool_store.SnapshotStore(path, pool_store.PoolSnapshot)
+        saved = pool_store.pools_store, compact_cache.compact_store, get_pools.response_cache
+        pool_store.pools_store, compact_cache.compact_store, get_pools.response_cache = (
+            store, compact_cache.CompactStore(compact_path), ResponseCache())
+        try:
+            store.refresh(wait=True)
+            paths = query_mix(weeks, requests)
+            results = []
+            for label in ("cold", "warm"):
+                latencies, elapsed = asyncio.run(_drive(get_pools.app, paths, concurrency))
+                results.append((f"load {label} c={concurrency}", _percentile(latencies, 50), _percentile(latencies, 95),
+                                _percentile(latencies, 99), len(latencies) / elapsed))
+            return results
+        finally:
+            pool_store.pools_store, compact_cache.compact_store, get_pools.response_cache = saved
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(scales=SCALES, horizons=HORIZONS, output=BENCH_OUTPUT_FILE, requests=500, concurrency=16,
+         max_sessions=MAX_SESSIONS, load=True):
+    estimates = {(scale, weeks): TORONTO_POOLS * scale * weeks * SESSIONS_PER_WEEK
+                 for scale in scales for weeks in horizons}
+    skipped = [f"{scale}x/{weeks}w" for (scale, weeks), estimate in estimates.items() if estimate > max_sessions]
+    lines = [
+        f"# lane-duck bench  commit {_commit()}  {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        f"# python {platform.python_version()}  encoder {'orjson' if orjson else 'json'}  "
+        f"load: {requests} requests, concurrency {concurrency}",
+    ]
+    if skipped:
+        lines.append(f"# INCOMPLETE: skipped {', '.join(skipped)} (over --max-sessions {max_sessions})")
+    lines.append("")
+
+    def emit(line):
+        lines.append(line)
+        print(line, flush=True)
+
+    for scale in scales:
+        for weeks in horizons:
+            estimate = estimates[scale, weeks]
+            name = f"{scale}x/{weeks}w"
+            if estimate > max_sessions:
+                emit(f"[{name}] skipped: ~{estimate} sessions > --max-sessions {max_sessions}")
+                continue
+            pools = synthetic_cache(scale, weeks)
+            sessions = sum(len(p["swim_data"]) for p in pools)
+            emit(f"[{name}] {len(pools)} pools, {sessions} sessions")
+            emit(f"  {'benchmark':<26}{'median ms':>12}{'min ms':>12}  note")
+            for label, median, best, note in micro_benchmarks(pools, weeks):
+                emit(f"  {label:<26}{median:>12.3f}{best:>12.3f}  {note}")
+            if load:
+                emit(f"  {'load':<26}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'req/s':>12}")
+                for label, p50, p95, p99, rate in load_test(pools, weeks, requests, concurrency):
+                    emit(f"  {label:<26}{p50:>12.3f}{p95:>12.3f}{p99:>12.3f}{rate:>12.1f}")
+            emit("")
+
+    with open(output, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"Wrote {output}", file=sys.stderr)
+    if skipped:
+        print(f"Skipped {', '.join(skipped)}: over --max-sessions {max_sessions}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the /pools hot paths on synthetic data.")
+    parser.add_argument("--scales", type=_int_list, default=list(SCALES),
+                        help="multiples of Toronto's pool count (default 1,10,100)")
+    parser.add_argument("--weeks", type=_int_list, default=list(HORIZONS),
+                        help="schedule horizons in weeks (default 2,8,26)")
+    parser.add_argument("--requests", type=int, default=500, help="requests per load run (default 500)")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients (default 16)")
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS,
+                        help=f"skip datasets larger than this (default {MAX_SESSIONS})")
+    parser.add_argument("--no-load", action="store_true", help="micro-benchmarks only")
+    parser.add_argument("--output", default=BENCH_OUTPUT_FILE, help=f"results file (default {BENCH_OUTPUT_FILE})")
+    args = parser.parse_args()
+    main(args.scales, args.weeks, args.output, args.requests, args.concurrency, args.max_sessions, not args.no_load)
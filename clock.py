@@ -0,0 +1,27 @@
+"""Toronto wall-clock time, shared by the scraper, the prerender and the API.
+
+Kept apart from scrape.py so the API can read the clock without importing the
+scraper (requests, tqdm and the whole pipeline).
+"""
+from datetime import datetime
+
+
+def now_toronto():
+    """Current date/time in Toronto. The pools and users are all in Toronto, so
+    the "current week" must be anchored to Toronto's calendar, not the server's
+    UTC clock — otherwise, when the server (UTC) crosses midnight into a new week
+    before Toronto does (e.g. Sunday ~8pm-midnight ET), the scraper drops the day
+    users still consider "today" and the site shows no pools for it.
+
+    Uses the stdlib zoneinfo (Python 3.9+), or the backports.zoneinfo shim on the
+    VM's Python 3.8. The tzdata pip package is pinned in requirements.txt so the
+    IANA database is guaranteed present regardless of the OS.
+
+    Deliberately does NOT fall back to naive UTC on error: silently using the
+    wrong timezone reintroduces that exact bug with no signal. A missing tz
+    database therefore raises loudly (ZoneInfoNotFoundError) instead."""
+    try:
+        from zoneinfo import ZoneInfo          # Python 3.9+
+    except ImportError:                          # Python 3.8 (production VM)
+        from backports.zoneinfo import ZoneInfo  # provided by backports.zoneinfo
+    return datetime.now(ZoneInfo("America/Toronto"))
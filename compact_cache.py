@@ -0,0 +1,362 @@
+"""Compact binary snapshot of the pool cache, memory-mapped by the API.
+
+good_list_cache.json stays the human-readable export, but it is pretty-printed
+and carries every ArcGIS attribute plus ISO strings for every session. The
+scraper also writes tmp/good_list_cache.bin, which holds only what the simple
+/pools view serves:
+
+    offset 0   magic b"LDCK"
+           4   format version (uint16, little-endian)
+           6   reserved (uint16)
+           8   header length H (uint32, little-endian)
+          12   header: H bytes of UTF-8 JSON — the pool table (the served
+               fields), the length-code dictionary, and where each array is
+    aligned    arrays, each starting on an 8-byte boundary, native byte order:
+                 pool_offsets  int32[P+1]  pool i owns sessions [o[i], o[i+1])
+                 start, end    int32[N]    minutes since 1970-01-01 (naive,
+                                           Toronto wall clock), stored order
+                 length_code   uint8[N]    index into header["lengths"]
+                 pool_of       int32[N]    owning pool of each session
+                 by_start      int32[N]    session ids sorted by start
+                 sorted_start  int32[N]    start[by_start[k]], for bisect
+
+A reader mmaps the file and wraps each array in a memoryview cast, so queries
+read the page cache directly without copying or parsing anything. Readers
+refuse files with a newer format version (or another byte order) instead of
+misreading them. Sessions are stored at minute precision, which is all the
+schedule has.
+
+Next to it, tmp/good_list_cache.gen holds the generation counter (uint64,
+little-endian), bumped in place after each new .bin is renamed into place.
+Every API worker maps that counter once and reads it per request. When it
+moves, the worker maps the new .bin and swaps one reference (CompactStore), so
+a reload costs no parse of the sessions. The data lives once in the page cache,
+however many workers attach.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from atomic_io import write_atomic
+from geo import GridIndex, pool_coordinates
+from pool_store import EPOCH, PoolSnapshot, parse_iso, simple_pool, to_minutes
+
+logger = logging.getLogger(__name__)
+
+COMPACT_FILE = "tmp/good_list_cache.bin"
+MAGIC = b"LDCK"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<4sHHI")
+_COUNTER = struct.Struct("<Q")
+_ALIGN = 8
+
+
+class UnsupportedFormat(ValueError):
+    """The file is not a compact snapshot this code can read."""
+
+
+def to_iso(minutes):
+    return (EPOCH + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _ceil_minutes(dt):
+    return -((EPOCH - dt) // timedelta(minutes=1))
+
+
+def encode(pools, generation=0):
+    """Serialize the cache's pool list into the compact format (bytes)."""
+    lengths = []
+    length_codes = {}
+    table = []
+    offsets = array("i", [0])
+    start, end, length_code, pool_of = array("i"), array("i"), array("B"), array("i")
+    max_overrun = 0
+    for i, pool in enumerate(pools):
+        row = simple_pool(pool, [])
+        del row["times"]
+        row["locationid"] = pool.get("locationid")
+        table.append(row)
+        for swim_data in pool.get("swim_data", []):
+            try:
+                s, e = to_minutes(parse_iso(swim_data["start_time"])), to_minutes(parse_iso(swim_data["end_time"]))
+            except (KeyError, TypeError, ValueError):
+                continue  # same sessions PoolSnapshot leaves out
+            length = swim_data.get("pool_length", "Unknown")
+            if length not in length_codes:
+                length_codes[length] = len(lengths)
+                lengths.append(length)
+            start.append(s)
+            end.append(e)
+            length_code.append(length_codes[length])
+            pool_of.append(i)
+            max_overrun = max(max_overrun, s - e)
+        offsets.append(len(start))
+
+    by_start = array("i", sorted(range(len(start)), key=lambda j: (start[j], j)))
+    sorted_start = array("i", (start[j] for j in by_start))
+
+    arrays = [("pool_offsets", offsets), ("start", start), ("end", end), ("length_code", length_code),
+              ("pool_of", pool_of), ("by_start", by_start), ("sorted_start", sorted_start)]
+    header = {
+        "generation": generation,
+        "byteorder": sys.byteorder,
+        "pool_count": len(table),
+        "session_count": len(start),
+        "max_overrun": max_overrun,
+        "lengths": lengths,
+        "pools": table,
+        "arrays": {},
+    }
+    # Offsets depend on the header's size, which depends on the offsets' digits:
+    # lay out against a generous fixed-width placeholder, then pad the header.
+    for name, arr in arrays:
+        header["arrays"][name] = [0, arr.typecode, len(arr)]
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    budget = len(header_bytes) + 16 * len(arrays)
+    position = _aligned(_PREAMBLE.size + budget)
+    for name, arr in arrays:
+        header["arrays"][name] = [position, arr.typecode, len(arr)]
+        position = _aligned(position + len(arr) * arr.itemsize)
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (budget - len(header_bytes))
+
+    out = bytearray(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header_bytes)))
+    out += header_bytes
+    for name, arr in arrays:
+        out += b"\0" * (header["arrays"][name][0] - len(out))
+        out += arr.tobytes()
+    return bytes(out)
+
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def generation_file(path=COMPACT_FILE):
+    """The generation counter file next to a compact snapshot."""
+    return os.path.splitext(path)[0] + ".gen"
+
+
+def read_generation(path=COMPACT_FILE):
+    """The last published generation of the snapshot at `path` (0 if none)."""
+    try:
+        with open(generation_file(path), "rb") as f:
+            data = f.read(_COUNTER.size)
+    except FileNotFoundError:
+        return 0
+    return _COUNTER.unpack(data)[0] if len(data) == _COUNTER.size else 0
+
+
+def write(pools, path=COMPACT_FILE, generation=None):
+    """Write the compact snapshot atomically (temp file + rename), then
+    publish its generation (by default the last one + 1) to the counter."""
+    if generation is None:
+        generation = read_generation(path) + 1
+    write_atomic(path, encode(pools, generation))
+    _publish_generation(generation_file(path), generation)
+    return path
+
+
+def _publish_generation(path, generation):
+    # Rewritten in place (one aligned 8-byte write), never renamed: readers map
+    # this file once and must keep seeing the same inode.
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except FileNotFoundError:
+        write_atomic(path, _COUNTER.pack(generation))
+        return
+    try:
+        os.pwrite(fd, _COUNTER.pack(generation), 0)
+    finally:
+        os.close(fd)
+
+
+class CompactSnapshot:
+    """Read-only, zero-copy view of a compact snapshot file.
+
+    Answers the same questions as pool_store.PoolSnapshot — `match` (pools
+    with a session inside the window) and `times` (sessions overlapping it) —
+    and renders the simple /pools view, identical to the JSON path's."""
+
+    def __init__(self, buffer, owner=None):
+        self._owner = owner
+        self._buffer = memoryview(buffer)
+        if len(self._buffer) < _PREAMBLE.size:
+            raise UnsupportedFormat("file too short for a compact snapshot")
+        magic, version, _, header_len = _PREAMBLE.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise UnsupportedFormat(f"not a compact snapshot (magic {magic!r})")
+        if version > FORMAT_VERSION:
+            raise UnsupportedFormat(f"compact snapshot format v{version} is newer than this reader (v{FORMAT_VERSION})")
+        header = json.loads(bytes(self._buffer[_PREAMBLE.size:_PREAMBLE.size + header_len]))
+        if header["byteorder"] != sys.byteorder:
+            raise UnsupportedFormat(f"compact snapshot was written {header['byteorder']}-endian")
+        self.version = version
+        self.generation = header["generation"]
+        self.pools = header["pools"]
+        self.lengths = header["lengths"]
+        self.session_count = header["session_count"]
+        self.max_overrun = header["max_overrun"]
+        for name, (offset, typecode, count) in header["arrays"].items():
+            size = array(typecode).itemsize
+            setattr(self, name, self._buffer[offset:offset + count * size].cast(typecode))
+        self.geo = GridIndex([pool_coordinates(pool["coordinates"]) for pool in self.pools])
+        self._pool_rows = [None] * len(self.pools)
+        self.mtime = None  # of the file, set by CompactStore
+
+    @classmethod
+    def open(cls, path=COMPACT_FILE):
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, owner=mapped)
+
+    def close(self):
+        """Release the views and the mapping. Only safe once no request is
+        still reading from this snapshot."""
+        for name in ("pool_offsets", "start", "end", "length_code", "pool_of", "by_start", "sorted_start"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._buffer.release()
+        if self._owner is not None:
+            self._owner.close()
+
+    def match(self, start_date=None, end_date=None):
+        """Indices of pools with a session starting at/after start_date and
+        ending at/before end_date, in stored order, one per locationid."""
+        if start_date is None and end_date is None:
+            candidates = {i for i in range(len(self.pools)) if self.pool_offsets[i + 1] > self.pool_offsets[i]}
+        else:
+            lo = 0 if start_date is None else bisect_left(self.sorted_start, _ceil_minutes(start_date))
+            if end_date is None:
+                hi, end_limit = len(self.sorted_start), None
+            else:
+                end_limit = to_minutes(end_date)
+                hi = bisect_right(self.sorted_start, end_limit + self.max_overrun)
+            by_start, end, pool_of = self.by_start, self.end, self.pool_of
+            candidates = set()
+            for k in range(lo, hi):
+                j = by_start[k]
+                if end_limit is None or end[j] <= end_limit:
+                    candidates.add(pool_of[j])
+        matched = []
+        seen_ids = set()
+        for i in sorted(candidates):
+            locationid = self.pools[i]["locationid"]
+            if locationid not in seen_ids:
+                matched.append(i)
+                seen_ids.add(locationid)
+        return matched
+
+    def times(self, i, start_date=None, end_date=None):
+        """Session ids of pool i overlapping the window, in stored order."""
+        lo_end = None if start_date is None else _ceil_minutes(start_date)
+        hi_start = None if end_date is None else to_minutes(end_date)
+        start, end = self.start, self.end
+        return [
+            j for j in range(self.pool_offsets[i], self.pool_offsets[i + 1])
+            if (lo_end is None or end[j] >= lo_end) and (hi_start is None or start[j] <= hi_start)
+        ]
+
+    def session(self, j):
+        return {
+            "start_time": to_iso(self.start[j]),
+            "end_time": to_iso(self.end[j]),
+            "pool_length": self.lengths[self.length_code[j]],
+        }
+
+    near = PoolSnapshot.near
+
+    def pool_row(self, i):
+        """Pool i's simple view without "times" (the compact pool table).
+        Built once per snapshot and shared: callers must not modify it."""
+        row = self._pool_rows[i]
+        if row is None:
+            row = self._pool_rows[i] = {k: v for k, v in self.pools[i].items() if k != "locationid"}
+        return row
+
+    def simple_row(self, i, start_date=None, end_date=None):
+        """Pool i's simple view, listing its sessions in the window."""
+        row = dict(self.pool_row(i))
+        row["times"] = [self.session(j) for j in self.times(i, start_date, end_date)]
+        return row
+
+    def session_minutes(self, i, start_date=None, end_date=None):
+        """(start, end, pool_length) of pool i's sessions in the window, in
+        stored order, with the times in minutes since 1970-01-01."""
+        start, end, codes, lengths = self.start, self.end, self.length_code, self.lengths
+        return [(start[j], end[j], lengths[codes[j]]) for j in self.times(i, start_date, end_date)]
+
+    def simple_view(self, start_date=None, end_date=None):
+        """The simple=true /pools response for the window."""
+        return [self.simple_row(i, start_date, end_date) for i in self.match(start_date, end_date)]
+
+
+class CompactStore:
+    """This process's live CompactSnapshot of the shared file.
+
+    current() reads the mapped generation counter, 8 bytes, with no syscall.
+    Only when the counter has moved does it map the new file and swap the
+    reference. A replaced snapshot is unmapped once the last request using it
+    drops it. Returns None until a snapshot has been published (until then,
+    the counter file is looked for at most once per check_interval)."""
+
+    def __init__(self, path=COMPACT_FILE, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.generation = 0  # counter value the live snapshot was opened at
+        self._snapshot = None
+        self._counter = None
+        self._last_attach = 0.0
+        self._lock = threading.Lock()
+
+    def published(self):
+        """The generation the writer last published, or None if there is none yet."""
+        if self._counter is None:
+            if time.monotonic() - self._last_attach < self.check_interval:
+                return None
+            self._last_attach = time.monotonic()
+            try:
+                with open(generation_file(self.path), "rb") as f:
+                    self._counter = mmap.mmap(f.fileno(), _COUNTER.size, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None
+        return _COUNTER.unpack_from(self._counter, 0)[0]
+
+    def current(self):
+        published = self.published()
+        if published is not None and published != self.generation:
+            # One request maps the new file; the others keep the old snapshot
+            # meanwhile instead of queueing (unless there is none yet).
+            if self._lock.acquire(blocking=self._snapshot is None):
+                try:
+                    if published != self.generation:
+                        self._open(published)
+                finally:
+                    self._lock.release()
+        return self._snapshot
+
+    def _open(self, published):
+        try:
+            with open(self.path, "rb") as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            snapshot = CompactSnapshot(mapped, owner=mapped)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not map {self.path} ({e}); keeping the current snapshot")
+        else:
+            snapshot.mtime = mtime
+            self._snapshot = snapshot
+            logger.info(f"Mapped {self.path} (generation {published})")
+        self.generation = published  # on failure too: retry at the next publish, not every request
+
+
+compact_store = CompactStore()
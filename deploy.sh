@@ -37,7 +37,10 @@ echo -e "${YELLOW}📦 Step 1: Uploading assets to server...${NC}"
 
 # Upload Python files
 echo "Uploading Python backend files..."
-gcloud compute scp get_pools.py scrape.py prerender.py obs.py beaches.py pool_lengths.json "$SERVER:$REMOTE_DIR/" \
+gcloud compute scp get_pools.py scrape.py prerender.py obs.py beaches.py clock.py pool_lengths.json \
+    pool_store.py session_index.py geo.py response_cache.py scheduler.py \
+    http_client.py raw_cache.py compact_cache.py scrape_stats.py export.py archive.py availability.py atomic_io.py \
+    "$SERVER:$REMOTE_DIR/" \
     --zone "$ZONE" --project "$PROJECT"
 
 # Upload frontend
@@ -52,11 +55,18 @@ gcloud compute scp README.md CLAUDE.md TODOS.md "$SERVER:$REMOTE_DIR/" \
 
 # Upload configuration files
 echo "Uploading configuration files..."
-gcloud compute scp .gitignore openapi.yaml sitemap.xml og-image.png requirements.txt .env.example "$SERVER:$REMOTE_DIR/" \
+gcloud compute scp .gitignore openapi.yaml og-image.png requirements.txt .env.example "$SERVER:$REMOTE_DIR/" \
     --zone "$ZONE" --project "$PROJECT"
 
 echo -e "${GREEN}✅ Assets uploaded successfully${NC}"
 
+# Rebuild the prerendered pages on the server. pool_schedules.html, pools/ and
+# sitemap.xml are generated from the server's cache (and its prerender
+# manifest), not tracked here, so the sitemap only lists pages that exist there.
+echo "Rebuilding prerendered pool pages and sitemap..."
+gcloud compute ssh "$SERVER" --zone "$ZONE" --project "$PROJECT" \
+    --command "cd $REMOTE_DIR && python3 prerender.py"
+
 # Step 1.5: Restart PM2 service
 echo -e "${YELLOW}🔄 Restarting PM2 service...${NC}"
 gcloud compute ssh "$SERVER" --zone "$ZONE" --project "$PROJECT" \
@@ -77,6 +87,17 @@ else
     exit 1
 fi
 
+# Test prerendered schedule pages
+echo "Testing schedule pages at www.connorladly.com/lane-duck/pools..."
+PAGES_STATUS=$(curl -s -o /dev/null -w "%{http_code}" "https://www.connorladly.com/lane-duck/pools" || echo "000")
+
+if [ "$PAGES_STATUS" = "200" ]; then
+    echo -e "${GREEN}✅ Schedule pages responding (200)${NC}"
+else
+    echo -e "${RED}❌ Schedule pages failed (HTTP $PAGES_STATUS)${NC}"
+    exit 1
+fi
+
 # Test API
 echo "Testing API at www.connorladly.com/api/toronto-pools/pools..."
 API_STATUS=$(curl -s -o /dev/null -w "%{http_code}" "https://www.connorladly.com/api/toronto-pools/pools" || echo "000")
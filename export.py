@@ -0,0 +1,56 @@
+"""Bulk export of the pool cache as NDJSON (one pool per line).
+
+The offline counterpart of `/pools?format=ndjson`: the same rows, selected and
+shaped by the same code (pool_store.iter_rows), written straight from the
+scraped cache without going through the API. Each line is encoded and written
+as it is produced, so the output never sits in memory as one document.
+
+    python export.py                                   # every pool, full records, to stdout
+    python export.py --start-date 2026-07-06T00:00:00 --end-date 2026-07-12T23:59:59 --simple -o week.ndjson
+    python export.py --fields locationid,complexname,x,y,swim_data
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+import pool_store
+from atomic_io import atomic_open
+from response_cache import encode_json
+
+
+def export(out, cache_file=pool_store.POOLS_CACHE_FILE, start_date=None, end_date=None, simple=False, fields=None):
+    """Write the matching pools to the binary stream `out`; returns how many."""
+    with open(cache_file, "r") as f:
+        snapshot = pool_store.PoolSnapshot(json.load(f))
+    ranked = [(None, i) for i in snapshot.match(start_date, end_date)]
+    count = 0
+    for row in pool_store.iter_rows(snapshot, ranked, start_date, end_date, simple, fields=pool_store.parse_fields(fields)):
+        out.write(encode_json(row) + b"\n")
+        count += 1
+    return count
+
+
+def _datetime(value):
+    return datetime.strptime(value, pool_store.ISO_FORMAT)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the scraped pool cache as NDJSON, one pool per line.")
+    parser.add_argument("--cache", default=pool_store.POOLS_CACHE_FILE,
+                        help=f"cache file to read (default {pool_store.POOLS_CACHE_FILE})")
+    parser.add_argument("--start-date", type=_datetime, help="like /pools start_date (YYYY-MM-DDTHH:MM:SS)")
+    parser.add_argument("--end-date", type=_datetime, help="like /pools end_date (YYYY-MM-DDTHH:MM:SS)")
+    parser.add_argument("--simple", action="store_true", help="the simple=true view instead of full records")
+    parser.add_argument("--fields", help="comma-separated fields to keep, like /pools fields=")
+    parser.add_argument("-o", "--output", help="write here (atomically) instead of stdout")
+    args = parser.parse_args()
+
+    options = dict(cache_file=args.cache, start_date=args.start_date, end_date=args.end_date,
+                   simple=args.simple, fields=args.fields)
+    if args.output is None:
+        count = export(sys.stdout.buffer, **options)
+    else:
+        with atomic_open(args.output) as f:
+            count = export(f, **options)
+    print(f"Exported {count} pools", file=sys.stderr)
@@ -0,0 +1,322 @@
+"""Local stand-in for the City's endpoints, for testing and benchmarking the
+scraper offline.
+
+Fixtures are raw response bodies stored under fixtures/ by URL path, e.g.
+
+    fixtures/b9WvedVPoizGfvfD/arcgis/rest/services/V_Swim_Locations_2022/FeatureServer/0/query
+    fixtures/data/parks/live/locations/272/swim/week1.json     (UTF-16, junk prefix and all)
+    fixtures/opendata/adv/beach_list/v1
+    fixtures/opendata/adv/beach_results/v1
+
+A path with no fixture is a 404, exactly like a location without a week2 file
+upstream. Query strings are ignored.
+
+    python fixture_server.py synthesize               # generate a Toronto-sized city
+    python fixture_server.py record                   # capture a real run (hits the live City endpoints)
+    python fixture_server.py serve --latency-ms 80 --error-rate 0.02
+    python fixture_server.py bench --workers 1,4,8,16 --latency-ms 80
+
+Point the scraper at a running server with
+LANEDUCK_ARCGIS_URL, LANEDUCK_TORONTO_URL and LANEDUCK_OPENDATA_URL (see
+scrape.py / beaches.py), all set to its base URL. `serve` can inject latency
+(with jitter), 503 errors, 404s on schedule files and occasional slow
+responses, each at a configurable rate. `bench` runs the scraper's fetch/parse
+pipeline in-process against a local server at several worker counts and reports
+wall time and requests/second.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+FIXTURES_DIR = "fixtures"
+DEFAULT_PORT = 8765
+SCHEDULE_PATH = re.compile(r"^/data/parks/live/locations/\d+/swim/week\d+\.json$")
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def fixture_path(root, url_path):
+    """The fixture file for a request path, or None if it would escape root."""
+    root = os.path.abspath(root)
+    path = os.path.abspath(os.path.join(root, url_path.lstrip("/")))
+    return path if path.startswith(root + os.sep) else None
+
+
+class Faults:
+    """What the server does wrong, and how often. Rates are probabilities per
+    request; latency is added to every response."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, not_found_rate=0.0,
+                 slow_rate=0.0, slow_ms=5000.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def roll(self):
+        """(delay seconds, forced status or None) for one request."""
+        with self._lock:
+            delay = self.latency_ms + (self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+            if self.slow_rate and self._rng.random() < self.slow_rate:
+                delay += self.slow_ms
+            status = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                status = 503
+            elif self.not_found_rate and self._rng.random() < self.not_found_rate:
+                status = 404
+        return max(delay, 0) / 1000, status
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real hosts
+
+    def do_GET(self):
+        server = self.server
+        delay, status = server.faults.roll()
+        if delay:
+            time.sleep(delay)
+        path = urlsplit(self.path).path
+        body = b""
+        if status == 404 and not SCHEDULE_PATH.match(path):
+            status = None  # injected 404s only make sense for schedule files
+        if status is None:
+            file_path = fixture_path(server.root, path)
+            if file_path is not None and os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    body = f.read()
+                status = 200
+            else:
+                status = 404
+        if status != 200:
+            body = f"<html><body>{status}</body></html>".encode("utf-8")
+        with server.stats_lock:
+            server.stats[status] += 1
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if status == 200 else "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per request drowns everything else out
+
+
+def start(root=FIXTURES_DIR, host="127.0.0.1", port=0, faults=None):
+    """Serve `root` on a background thread. Returns (server, base_url); stop
+    it with server.shutdown(). port=0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), FixtureHandler)
+    server.daemon_threads = True
+    server.root = root
+    server.faults = faults or Faults()
+    server.stats = Counter()
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def _write(root, url_path, body):
+    path = fixture_path(root, url_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(body)
+
+
+def week_file(days):
+    """A week{N}.json body the way toronto.ca serves it: UTF-16 with a BOM and
+    junk ahead of the JSON (which parse_week_file strips)."""
+    return ("\u0000\u0003)]}'\n" + json.dumps({"programs": [{"program": "Swim - Drop-In", "days": days}]})).encode("utf-16")
+
+
+def _clock(minutes):
+    hour, minute = divmod(minutes, 60)
+    return f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def synthesize(root=FIXTURES_DIR, locations=83, seed=0):
+    """Write a synthetic city: the ArcGIS locations layer, two schedule weeks
+    for most locations (some without a week2, some without any lane swims),
+    and the beach feeds. Returns the number of schedule files written."""
+    import scrape
+    rng = random.Random(seed)
+    features = []
+    files = 0
+    for n in range(locations):
+        locationid = 100 + n
+        outdoor = rng.random() < 0.2
+        features.append({
+            "attributes": {
+                "objectid": n + 1,
+                "locationid": locationid,
+                "complexname": f"{'Outdoor ' if outdoor else ''}Synthetic Recreation Centre {n}",
+                "location_type": "Outdoor Pool" if outdoor else "Indoor Pool",
+                "x": -79.62 + rng.random() * 0.48,
+                "y": 43.58 + rng.random() * 0.28,
+                "address": f"{rng.randint(1, 4000)} Example Ave  ",
+                "website": f"https://www.toronto.ca/explore-enjoy/parks-recreation/places-spaces/parks-and-recreation-facilities/location/?id={locationid}",
+                "show_on_map": "Yes",
+                "activity_type": "Lane Swim, Leisure Swim",
+            },
+            "geometry": {"x": -8835000 + rng.random() * 50000, "y": 5400000 + rng.random() * 40000},
+        })
+        weeks = 2 if rng.random() < 0.85 else 1
+        for week_num in range(1, weeks + 1):
+            title = rng.choice(["Lane Swim", "Lane Swim", "Lane Swim: Long Course (50m)", "Lane Swim (Women)"])
+            times = []
+            for _ in range(rng.randint(0, 20)):
+                start = 15 * rng.randint(24, 84)
+                times.append({
+                    "id": rng.randint(1, 9),
+                    "day": rng.choice(DAY_NAMES),
+                    "title": f"{_clock(start)} - {_clock(start + rng.choice([45, 60, 90]))}",
+                    "status": "active" if rng.random() < 0.95 else "cancelled",
+                })
+            days = [{"title": title, "status": "active", "times": times},
+                    {"title": "Leisure Swim", "status": "active", "times": []}]
+            _write(root, urlsplit(scrape.schedule_url(locationid, week_num)).path, week_file(days))
+            files += 1
+    _write(root, urlsplit(scrape.LOCATIONS_PATH).path, json.dumps({"features": features}).encode("utf-8"))
+
+    today = date.today()
+    beach_list = [{"beachId": i, "beachName": f"Synthetic Beach {i}", "address": f"{i} Lakeshore Blvd W",
+                   "blueFlag": "Y" if i % 3 == 0 else "N", "lat": 43.63 + i * 0.002, "lon": -79.45 + i * 0.01}
+                  for i in range(1, 11)]
+    beach_results = [{"CollectionDate": (today - timedelta(days=d)).isoformat(),
+                      "data": [{"beachId": i, "eColi": rng.randint(5, 400), "advisory": "",
+                                "statusFlag": rng.choice(["SAFE", "SAFE", "UNSAFE"])} for i in range(1, 11)]}
+                     for d in range(5)]
+    _write(root, "/opendata/adv/beach_list/v1", json.dumps(beach_list).encode("utf-8"))
+    _write(root, "/opendata/adv/beach_results/v1", json.dumps(beach_results).encode("utf-8"))
+    return files
+
+
+def record(root=FIXTURES_DIR, workers=4, rate=4.0):
+    """Capture a real scrape's responses into fixtures: every 200 the shared
+    HTTP client receives while fetching locations, schedules and beach feeds
+    is written under its URL path. Hits the live City endpoints. Returns the
+    number of files written."""
+    import beaches
+    import http_client
+    import scrape
+    from raw_cache import RawCache
+    written = []
+
+    def capture(url, response, elapsed):
+        if response.status_code == 200:
+            _write(root, urlsplit(url).path, response.content)
+            written.append(url)
+
+    http_client.add_listener(capture)
+    try:
+        locations = scrape.process_locations(scrape.fetch_locations_with_retries())
+        with tempfile.TemporaryDirectory() as tmp:
+            # A fresh cache: no conditional requests, so every body comes back.
+            scrape.build_pool_data(locations, workers=workers, rate=rate, cache=RawCache(tmp))
+            beaches.build(output_file=os.path.join(tmp, "beaches_cache.json"),
+                          history_file=os.path.join(tmp, "beach_history.json"))
+    finally:
+        http_client.remove_listener(capture)
+    return len(written)
+
+
+def point_scraper_at(base_url):
+    """Aim scrape.py and beaches.py (in this process) at `base_url`."""
+    import beaches
+    import scrape
+    scrape.ARCGIS_BASE_URL = base_url
+    scrape.TORONTO_BASE_URL = base_url
+    beaches.OPENDATA_BASE_URL = base_url
+    beaches.BEACH_LIST_URL = base_url + "/opendata/adv/beach_list/v1?format=json"
+    beaches.BEACH_RESULTS_URL = base_url + "/opendata/adv/beach_results/v1?format=json&startDate={start}&endDate={end}"
+
+
+def bench_scrape(root=FIXTURES_DIR, workers_list=(1, 4, 8, 16), rate=1000.0, faults=None):
+    """Run the scraper's fetch/parse pipeline against a local server once per
+    worker count. Returns [(workers, seconds, requests, requests/s, pools, statuses)]."""
+    import http_client
+    import scrape
+    from raw_cache import RawCache
+    server, base_url = start(root, faults=faults)
+    point_scraper_at(base_url)
+    results = []
+    try:
+        for workers in workers_list:
+            server.stats.clear()
+            started = time.perf_counter()
+            locations = scrape.process_locations(scrape.fetch_locations_with_retries())
+            with tempfile.TemporaryDirectory() as tmp:
+                pool_data, _, _ = scrape.build_pool_data(locations, workers=workers, rate=rate, cache=RawCache(tmp))
+            elapsed = time.perf_counter() - started
+            requests = sum(server.stats.values())
+            results.append((workers, elapsed, requests, requests / elapsed, len(pool_data), dict(server.stats)))
+    finally:
+        server.shutdown()
+        http_client.session().close()
+    return results
+
+
+def _fault_args(parser):
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help=f"fixture directory (default {FIXTURES_DIR})")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="+/- uniform jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="fraction of schedule requests answered 404")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of responses delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=5000.0, help="extra delay of a slow response (default 5000)")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def _faults(args):
+    return Faults(args.latency_ms, args.jitter_ms, args.error_rate, args.not_found_rate,
+                  args.slow_rate, args.slow_ms, args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve recorded or synthetic City endpoints locally.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="serve the fixtures")
+    _fault_args(serve)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    synth = commands.add_parser("synthesize", help="generate a synthetic city into the fixtures")
+    synth.add_argument("--fixtures", default=FIXTURES_DIR)
+    synth.add_argument("--locations", type=int, default=83)
+    synth.add_argument("--seed", type=int, default=0)
+    rec = commands.add_parser("record", help="capture a live run into the fixtures")
+    rec.add_argument("--fixtures", default=FIXTURES_DIR)
+    bench = commands.add_parser("bench", help="benchmark the scraper against the fixtures")
+    _fault_args(bench)
+    bench.add_argument("--workers", default="1,4,8,16", help="comma-separated worker counts (default 1,4,8,16)")
+    bench.add_argument("--rate", type=float, default=1000.0,
+                       help="rate limit during the benchmark (default 1000, i.e. effectively off)")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server, base_url = start(args.fixtures, args.host, args.port, _faults(args))
+        print(f"Serving {args.fixtures} at {base_url}; scrape with "
+              f"LANEDUCK_ARCGIS_URL={base_url} LANEDUCK_TORONTO_URL={base_url} LANEDUCK_OPENDATA_URL={base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif args.command == "synthesize":
+        print(f"Wrote {synthesize(args.fixtures, args.locations, args.seed)} schedule files to {args.fixtures}")
+    elif args.command == "record":
+        print(f"Recorded {record(args.fixtures)} responses to {args.fixtures}")
+    else:
+        workers_list = [int(w) for w in args.workers.split(",") if w.strip()]
+        print(f"{'workers':>8}{'seconds':>10}{'requests':>10}{'req/s':>10}{'pools':>8}  statuses")
+        for workers, elapsed, requests, rate, pools, statuses in bench_scrape(args.fixtures, workers_list, args.rate, _faults(args)):
+            print(f"{workers:>8}{elapsed:>10.2f}{requests:>10}{rate:>10.1f}{pools:>8}  {statuses}")
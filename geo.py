@@ -0,0 +1,102 @@
+"""Spatial index over pool coordinates for radius and nearest-k queries.
+
+Pools carry `x` (longitude) and `y` (latitude) in degrees. The index buckets
+them into a uniform lat/lng grid once per snapshot; a query walks rings of cells
+outward from the query point, computes the exact haversine distance only for
+pools in those cells, and stops as soon as no unvisited cell can hold anything
+closer (or within the radius). For a city-sized set of pools that touches a
+handful of cells instead of every pool.
+"""
+import math
+from collections import defaultdict
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180  # ~111.2 km
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km (same formula as the frontend's)."""
+    d_lat = math.radians(lat2 - lat1)
+    d_lng = math.radians(lng2 - lng1)
+    a = (math.sin(d_lat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(d_lng / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def pool_coordinates(pool):
+    """(lat, lng) of a cache pool record, or None if it has no usable location."""
+    lat, lng = pool.get("y"), pool.get("x")
+    if not isinstance(lat, (int, float)) or not isinstance(lng, (int, float)) or (lat == 0 and lng == 0):
+        return None
+    return float(lat), float(lng)
+
+
+class GridIndex:
+    """Uniform grid over `points`, a list of (lat, lng) or None (unlocated);
+    results refer to positions in that list. `cell_deg` is the cell edge in
+    degrees (0.02 is ~2.2 km north-south at Toronto's latitude)."""
+
+    def __init__(self, points, cell_deg=0.02):
+        self.cell_deg = cell_deg
+        self.points = points
+        self.cells = defaultdict(list)
+        located = [(i, p) for i, p in enumerate(points) if p is not None]
+        for i, (lat, lng) in located:
+            self.cells[self._cell(lat, lng)].append(i)
+        if self.cells:
+            rows = [c[0] for c in self.cells]
+            cols = [c[1] for c in self.cells]
+            self._bounds = (min(rows), max(rows), min(cols), max(cols))
+            self._max_abs_lat = max(abs(lat) for _, (lat, _) in located)
+        else:
+            self._bounds = None
+
+    def _cell(self, lat, lng):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def _max_ring(self, row, col):
+        min_row, max_row, min_col, max_col = self._bounds
+        return max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+
+    def _ring(self, row, col, r):
+        if r == 0:
+            yield row, col
+            return
+        for c in range(col - r, col + r + 1):
+            yield row - r, c
+            yield row + r, c
+        for rr in range(row - r + 1, row + r):
+            yield rr, col - r
+            yield rr, col + r
+
+    def nearest(self, lat, lng, k=None, radius_km=None, allowed=None):
+        """[(distance_km, i), ...] sorted by distance (ties by position), for
+        located points within `radius_km` (if given), restricted to positions
+        in `allowed` (if given), at most `k` of them (if given)."""
+        if self._bounds is None or k == 0:
+            return []
+        row, col = self._cell(lat, lng)
+        # A cell's east-west extent shrinks with latitude; the narrowest one
+        # between the query and the points bounds "distance to the next ring".
+        widest_lat = min(89.0, max(self._max_abs_lat, abs(lat)) + self.cell_deg)
+        ring_km = self.cell_deg * KM_PER_DEGREE_LAT * math.cos(math.radians(widest_lat))
+        found = []
+        for r in range(self._max_ring(row, col) + 1):
+            # Everything in ring r or beyond is at least (r - 1) cells away.
+            bound = max(0, r - 1) * ring_km
+            if radius_km is not None and bound > radius_km:
+                break
+            if k is not None and len(found) >= k:
+                found.sort()
+                if found[k - 1][0] < bound:
+                    break
+            for cell in self._ring(row, col, r):
+                for i in self.cells.get(cell, ()):
+                    if allowed is not None and i not in allowed:
+                        continue
+                    p_lat, p_lng = self.points[i]
+                    d = haversine_km(lat, lng, p_lat, p_lng)
+                    if radius_km is None or d <= radius_km:
+                        found.append((d, i))
+        found.sort()
+        return found if k is None else found[:k]
@@ -33,16 +33,23 @@
     #     ]
     # }]
 
-from fastapi import FastAPI, Query, BackgroundTasks
-from fastapi.responses import Response
+from fastapi import FastAPI, Query, Request, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import datetime
-from typing import List, Optional
-import json
-import os
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+import time
 import yaml
 
+import archive
+import availability
+import clock
+import compact_cache
+import pool_store
+import scheduler
+from response_cache import ResponseCache, encode_json, etag_matches
+
 # Observability: load secrets from .env and start Sentry if configured.
 # No-op (never raises) when SENTRY_DSN is unset or sentry_sdk is not installed,
 # so the API keeps running regardless.
@@ -61,81 +68,208 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Request latency/size/status for every route, exported at /metrics (see obs.py).
+app.add_middleware(obs.MetricsMiddleware)
+
+# Encoded /pools bodies for the live snapshot generation (see response_cache.py).
+response_cache = ResponseCache()
+
+# /pools rounds lat, lng and radius_km to this many decimals (about 100 m)
+# before filtering and keying the response cache. Clients send the user's exact
+# position, so unrounded near-me queries would almost never hit the cache and
+# would evict the hot entries.
+GEO_DECIMALS = 3
+
+
+def _snapshot_gauge(store, value):
+    def read():
+        snapshot = store.peek()
+        return None if snapshot is None else value(store, snapshot)
+    return read
+
+
+obs.metrics.gauge("laneduck_response_cache_hits_total", "/pools responses served from the response cache",
+                  lambda: response_cache.hits, kind="counter")
+obs.metrics.gauge("laneduck_response_cache_misses_total", "/pools responses built and encoded",
+                  lambda: response_cache.misses, kind="counter")
+obs.metrics.gauge("laneduck_response_cache_entries", "Encoded responses held for the live generation",
+                  lambda: len(response_cache))
+obs.metrics.gauge("laneduck_snapshot_age_seconds", "Seconds since the scraper wrote the served pool cache",
+                  _snapshot_gauge(pool_store.pools_store, lambda store, _: time.time() - store.mtime))
+obs.metrics.gauge("laneduck_snapshot_generation", "Pool cache reloads since the worker started",
+                  _snapshot_gauge(pool_store.pools_store, lambda store, _: store.generation))
+obs.metrics.gauge("laneduck_snapshot_pools", "Pools in the served snapshot",
+                  _snapshot_gauge(pool_store.pools_store, lambda _, snapshot: len(snapshot.pools)))
+obs.metrics.gauge("laneduck_snapshot_sessions", "Swim sessions in the served snapshot",
+                  _snapshot_gauge(pool_store.pools_store, lambda _, snapshot: snapshot.session_count))
+obs.metrics.gauge("laneduck_shared_snapshot_generation", "Generation of the mapped compact snapshot (0: none)",
+                  lambda: compact_cache.compact_store.generation)
+obs.metrics.counter("laneduck_beaches_cache_missing_total", "/beaches requests answered empty for lack of a cache")
+
 
 def get_pools(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[dict]:
-    ## Create the tmp directory if it doesn't exist
-    if not os.path.exists('tmp'):
-        os.makedirs('tmp')
-    with open('tmp/good_list_cache.json', 'r') as file:
-        good_list = json.load(file)
-    matched_pools = []
-    matched_pool_ids = set()
-    for pool in good_list:
-        for swim_data in pool['swim_data']:
-            start_time = datetime.strptime(swim_data['start_time'], "%Y-%m-%dT%H:%M:%S")
-            end_time = datetime.strptime(swim_data['end_time'], "%Y-%m-%dT%H:%M:%S")
-            # Filter by start_date and end_date if provided
-            if start_date and start_time < start_date:
-                continue
-            if end_date and end_time > end_date:
-                continue
-            if pool["locationid"] not in matched_pool_ids:
-                matched_pools.append(pool)
-                matched_pool_ids.add(pool["locationid"])
-                # This pool already qualifies; no need to check its other sessions
-                break
-    return matched_pools
+    snapshot = pool_store.pools_store.current()
+    return [snapshot.pools[i] for i in snapshot.match(start_date, end_date)]
 
 @app.get("/pools", response_model=List[dict])
 async def pools(
+    request: Request,
     start_date: Optional[str] = Query(None, description="Filter pools starting from this datetime (YYYY-MM-DDTHH:MM:SS)"),
     end_date: Optional[str] = Query(None, description="Filter pools ending before this datetime (YYYY-MM-DDTHH:MM:SS)"),
-    simple: Optional[bool] = Query(False, description="Return a simplified response with pool name and times")
+    simple: Optional[bool] = Query(False, description="Return a simplified response with pool name and times"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude to sort by distance from (requires lng)"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude to sort by distance from (requires lat)"),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only pools within this many km of lat/lng"),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many pools"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return for each pool, e.g. pool_name,coordinates,times"),
+    format: Literal["json", "compact", "ndjson"] = Query("json", description="'compact': the simple view as a columnar pool table plus session arrays; 'ndjson': stream one pool per line"),
 ):
     """
     Endpoint to get a list of pools with lane swims today at or after the current time.
     Supports filtering by start_date and end_date with hour, minute, and second precision,
-    and a simplified response format.
+    and a simplified response format. Responses carry a strong ETag and answer
+    If-None-Match with 304 Not Modified until the next scrape.
+
+    With lat and lng the pools come back nearest first, each with a "distance_km";
+    radius_km drops pools farther away (and pools without coordinates), and
+    limit keeps only the first results. lat, lng and radius_km are rounded to
+    3 decimals first. fields keeps only the named fields of
+    each pool (fields a pool lacks are left out).
+
+    format=compact returns the simple view columnar: {"window_start", "lengths",
+    "pools", "offsets", "start", "end", "length"}, where pool i's sessions are
+    offsets[i]..offsets[i+1] of the parallel arrays, start/end are minutes since
+    window_start and length indexes into lengths (see pool_store.compact_view).
+    fields then selects the pool table's columns.
+
+    format=ndjson streams the same rows as the JSON list, one per line, without
+    building the whole response (and without an ETag) — for full-data mirrors.
     """
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    if radius_km is not None and lat is None:
+        raise HTTPException(status_code=400, detail="radius_km requires lat and lng")
+    if lat is not None:
+        lat, lng = round(lat, GEO_DECIMALS), round(lng, GEO_DECIMALS)
+    if radius_km is not None:
+        radius_km = round(radius_km, GEO_DECIMALS)
+
     # Parse start_date and end_date if provided
     start_date_parsed = datetime.strptime(start_date, "%Y-%m-%dT%H:%M:%S") if start_date else None
     end_date_parsed = datetime.strptime(end_date, "%Y-%m-%dT%H:%M:%S") if end_date else None
 
-    # Get filtered pools
-    matched_pools = get_pools(start_date=start_date_parsed, end_date=end_date_parsed)
+    field_names = pool_store.parse_fields(fields)
+    simple = simple or format == "compact"
+    shared = compact_cache.compact_store.current() if simple else None
+    json_mtime = pool_store.pools_store.file_mtime()
+    if shared is not None and (json_mtime is None or shared.mtime >= json_mtime):
+        # The simple view straight from the memory-mapped snapshot all workers
+        # share (see compact_cache.py), unless it lags the JSON cache because
+        # the compact sink failed. The JSON snapshot is not even loaded then.
+        snapshot = shared
+    else:
+        snapshot = pool_store.pools_store.current()
+    generation = (pool_store.pools_store.generation, compact_cache.compact_store.generation)
+
+    def ranked():
+        matched = snapshot.match(start_date_parsed, end_date_parsed)
+        if lat is not None:
+            return snapshot.near(matched, lat, lng, radius_km=radius_km, limit=limit)
+        return [(None, i) for i in matched[:limit]]
+
+    if format == "ndjson":
+        # One pool per line, encoded as it is sent: memory stays flat however
+        # many pools and weeks of sessions the dump covers.
+        rows = pool_store.iter_rows(snapshot, ranked(), start_date_parsed, end_date_parsed, simple,
+                                    with_distance=lat is not None, fields=field_names)
+        return StreamingResponse((encode_json(row) + b"\n" for row in rows), media_type="application/x-ndjson",
+                                 headers={"Cache-Control": "no-cache"})
+
+    # Serve the ready-encoded body for this query and snapshot generation when
+    # we have it; the data only changes once per scrape.
+    key = (start_date_parsed, end_date_parsed, bool(simple), lat, lng, radius_km, limit, field_names, format)
+    cached = response_cache.get(generation, key)
+    if cached is None:
+        if format == "compact":
+            content = pool_store.compact_view(snapshot, ranked(), start_date_parsed, end_date_parsed,
+                                              with_distance=lat is not None)
+            if field_names is not None:
+                project = pool_store.projection(field_names)
+                content["pools"] = [project(pool) for pool in content["pools"]]
+        else:
+            content = list(pool_store.iter_rows(snapshot, ranked(), start_date_parsed, end_date_parsed, simple,
+                                                with_distance=lat is not None, fields=field_names))
+        cached = response_cache.put(generation, key, encode_json(content))
 
-    # If simple is True, return a simplified response
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+@app.get("/pools/next", response_model=List[dict])
+async def next_swims(
+    at: Optional[str] = Query(None, alias="time", description="Look for sessions at/after this datetime (YYYY-MM-DDTHH:MM:SS); defaults to now in Toronto"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude of the swimmer (requires lng)"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude of the swimmer (requires lat)"),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only pools within this many km of lat/lng"),
+    limit: int = Query(10, ge=1, le=100, description="Return at most this many pools"),
+    rank: Literal["time", "score"] = Query("time", description="'time': soonest first; 'score': waiting plus travel distance (needs lat/lng)"),
+):
+    """
+    Where can I swim next? For each pool, the session that is in progress or
+    starts soonest after `time`, best `limit` first. Each result is the simple
+    pool view with that one session in "times", plus "in_progress",
+    "minutes_until_start" (0 while in progress) and, with lat/lng, "distance_km".
+    """
+    if (lat is None) != (lng is None):
+        raise HTTPException(status_code=400, detail="lat and lng must be given together")
+    if lat is None and (radius_km is not None or rank == "score"):
+        raise HTTPException(status_code=400, detail="radius_km and rank=score require lat and lng")
+
+    if at:
+        at = _parse_iso(at)
+    else:
+        at = clock.now_toronto().replace(tzinfo=None)
+
+    snapshot = pool_store.pools_store.current()
+    content = []
+    for i, start, end, swim_data, distance in snapshot.upcoming(at, limit, lat, lng, radius_km, rank):
+        row = pool_store.simple_pool(snapshot.pools[i], [swim_data])
+        row["in_progress"] = start <= at
+        row["minutes_until_start"] = max(-((at - start) // timedelta(minutes=1)), 0)
+        if lat is not None:
+            row["distance_km"] = None if distance is None else round(distance, 3)
+        content.append(row)
+    return Response(content=encode_json(content), media_type="application/json")
+
+
+@app.get("/pools/{locationid}", response_model=dict)
+async def pool(
+    locationid: int,
+    start_date: Optional[str] = Query(None, description="With simple, list sessions ending at/after this datetime (YYYY-MM-DDTHH:MM:SS)"),
+    end_date: Optional[str] = Query(None, description="With simple, list sessions starting at/before this datetime (YYYY-MM-DDTHH:MM:SS)"),
+    simple: Optional[bool] = Query(False, description="Return the simplified view with pool name and times"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. pool_name,coordinates,times"),
+):
+    """
+    One pool by its locationid: the full cache record, or with simple=true the
+    simplified view listing the sessions that overlap start_date..end_date.
+    """
+    start_date_parsed = _parse_iso(start_date or None)
+    end_date_parsed = _parse_iso(end_date or None)
+    snapshot = pool_store.pools_store.current()
+    i = snapshot.find(locationid)
+    if i is None:
+        raise HTTPException(status_code=404, detail=f"No pool with locationid {locationid}")
     if simple:
-        return [
-            {
-                "pool_name": pool["complexname"],
-                "website": pool.get("website", ""),
-                "address": pool.get("address", "").strip(),
-                "coordinates": {"x": pool.get("x", 0), "y": pool.get("y", 0)},
-                "pool_type": pool.get("pool_type") or (
-                    "Outdoor"
-                    if "outdoor" in (pool.get("location_type", "") + pool.get("complexname", "")).lower()
-                    else "Indoor"
-                ),
-                "pool_length": pool.get("pool_length", "Unknown"),
-                "times": [
-                    {
-                        "start_time": swim_data["start_time"],
-                        "end_time": swim_data["end_time"],
-                        "pool_length": swim_data.get("pool_length", "Unknown")
-                    }
-                    for swim_data in pool["swim_data"]
-                    if (
-                        (start_date_parsed is None or datetime.strptime(swim_data["end_time"], "%Y-%m-%dT%H:%M:%S") >= start_date_parsed) and
-                        (end_date_parsed is None or datetime.strptime(swim_data["start_time"], "%Y-%m-%dT%H:%M:%S") <= end_date_parsed)
-                    )
-                ]
-            }
-            for pool in matched_pools
-        ]
-
-    # Return the full pool objects
-    return matched_pools
+        content = pool_store.simple_pool(snapshot.pools[i], snapshot.times(i, start_date_parsed, end_date_parsed))
+    else:
+        content = snapshot.pools[i]
+    field_names = pool_store.parse_fields(fields)
+    if field_names is not None:
+        content = pool_store.projection(field_names)(content)
+    return Response(content=encode_json(content), media_type="application/json")
 
 
 @app.get("/beaches", response_model=List[dict])
@@ -143,15 +277,156 @@ async def beaches():
     """Toronto supervised beaches with the latest water-quality advisory
     (SAFE/UNSAFE), E. coli, sample date, coordinates, and Blue Flag status.
     Served from tmp/beaches_cache.json, refreshed by the daily scrape."""
-    try:
-        with open("tmp/beaches_cache.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
+    beaches = pool_store.beaches_store.current()
+    if beaches is None:
+        obs.metrics.inc("laneduck_beaches_cache_missing_total")
         return []
+    return beaches
+
+
+@app.get("/beaches/{beach_id}/history", response_model=List[dict])
+async def beach_history(
+    beach_id: int,
+    start_date: Optional[str] = Query(None, description="Samples on or after this date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Samples on or before this date (YYYY-MM-DD)"),
+):
+    """Every water-quality sample kept for one beach, oldest first: sample_date,
+    status (SAFE/UNSAFE, or "" when none was posted), ecoli and advisory.
+    Served from tmp/beach_history.json, which each scrape extends."""
+    for value in (start_date, end_date):
+        if value is not None:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Dates must be YYYY-MM-DD, got {value!r}")
+    history = pool_store.beach_history_store.current()
+    samples = None if history is None else history.between(beach_id, start_date, end_date)
+    if samples is None:
+        raise HTTPException(status_code=404, detail=f"No history for beach {beach_id}")
+    return Response(content=encode_json(samples), media_type="application/json")
+
+
+@app.get("/stats/availability", response_model=dict)
+async def availability_stats(
+    pool_type: Optional[Literal["Indoor", "Outdoor"]] = Query(None, description="Only indoor or outdoor pools"),
+    pool_length: Optional[str] = Query(None, description="Only sessions of this length, e.g. 25m, 50m, Unknown"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude of the centre (with lng and radius_km)"),
+    lng: Optional[float] = Query(None, ge=-180, le=180, description="Longitude of the centre (with lat and radius_km)"),
+    radius_km: Optional[float] = Query(None, gt=0, description="Only pools in grid cells within this many km"),
+    group_by: Optional[Literal["pool_type", "pool_length", "cell"]] = Query(None, description="Also break the counts down by this"),
+):
+    """
+    Lane swims open in each hour of the week across the scraped weeks:
+    "hour_of_week" has 168 counts, index 0 being Monday 00:00-01:00 Toronto
+    time, with the busiest slots in "peak". Precomputed at scrape time per
+    0.02-degree grid cell, pool type and length (see availability.py). The
+    radius is applied per cell, so it is accurate to about 2 km.
+    """
+    if (lat is None) != (lng is None) or (lat is None) != (radius_km is None):
+        raise HTTPException(status_code=400, detail="lat, lng and radius_km must be given together")
+    stats = availability.availability_store.current()
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Availability stats have not been computed yet")
+    result = stats.query(pool_type, pool_length, lat, lng, radius_km, group_by)
+    meta = {k: stats.data.get(k) for k in ("generated_at", "window_start", "window_end", "weeks")}
+    return dict(meta, **result, peak=availability.peak_hours(result["hour_of_week"]))
+
+
+# The /history endpoints are plain def: FastAPI runs them in its threadpool, so
+# SQLite reads never block the event loop.
+@app.get("/history/pools/{locationid}", response_model=List[dict])
+def pool_history(
+    locationid: int,
+    start_date: Optional[str] = Query(None, description="Sessions starting at/after this datetime (YYYY-MM-DDTHH:MM:SS)"),
+    end_date: Optional[str] = Query(None, description="Sessions starting at/before this datetime (YYYY-MM-DDTHH:MM:SS)"),
+):
+    """
+    A pool's past schedule from the scrape archive: every session it ever
+    published in the window, oldest first, with first_seen/last_seen (the
+    scrapes that listed it) and removed_at (the scrape that found it gone,
+    null if it never was).
+    """
+    start_date, end_date = _iso_window(start_date, end_date)
+    conn = archive.reader()
+    sessions = None if conn is None else archive.pool_history(conn, locationid, start_date, end_date)
+    if sessions is None:
+        raise HTTPException(status_code=404, detail=f"No archived schedule for locationid {locationid}")
+    return Response(content=encode_json(sessions), media_type="application/json")
+
+
+@app.get("/history/removed", response_model=List[dict])
+def removed_sessions(
+    start_date: Optional[str] = Query(None, description="Sessions starting at/after this datetime (YYYY-MM-DDTHH:MM:SS)"),
+    end_date: Optional[str] = Query(None, description="Sessions starting at/before this datetime (YYYY-MM-DDTHH:MM:SS)"),
+    locationid: Optional[int] = Query(None, description="Only this pool"),
+):
+    """
+    Sessions that disappeared from the published schedule between two scrapes
+    while still inside its window (cancellations, closures), oldest first,
+    with the pool's name and removed_at.
+    """
+    start_date, end_date = _iso_window(start_date, end_date)
+    conn = archive.reader()
+    sessions = [] if conn is None else archive.removed_sessions(conn, start_date, end_date, locationid)
+    return Response(content=encode_json(sessions), media_type="application/json")
+
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _parse_iso(value):
+    """Parse a YYYY-MM-DDTHH:MM:SS query parameter (None stays None); a
+    malformed one is the client's error, a 400."""
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, ISO_FORMAT)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Dates must be YYYY-MM-DDTHH:MM:SS, got {value!r}")
+
+
+def _iso_window(start_date, end_date):
+    """Validate YYYY-MM-DDTHH:MM:SS bounds and return them normalized (the
+    archive compares them as text)."""
+    return tuple(None if value is None else _parse_iso(value).strftime(ISO_FORMAT)
+                 for value in (start_date, end_date))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this worker's metrics (see obs.py)."""
+    return Response(content=obs.metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+refresh_scheduler = scheduler.RefreshScheduler()
 
 # Generate OpenAPI schema and save it to openapi.yaml
 @app.on_event("startup")
 async def startup_event():
+    # Load the caches once and watch them for the scraper's rewrites, so requests
+    # are served from memory instead of re-reading the JSON every time.
+    for store in (pool_store.beaches_store, pool_store.beach_history_store, availability.availability_store):
+        try:
+            store.refresh(wait=True)
+        except Exception as e:
+            obs.capture_exception(e)
+        store.start_watcher()
+
+    # The simple and compact /pools views come from the shared compact snapshot,
+    # so the full JSON snapshot is only loaded (and then watched) by a worker
+    # once it serves full records, /pools/next or /pools/{locationid}. Without
+    # a compact snapshot to serve from, it is loaded right away.
+    shared = compact_cache.compact_store.current()
+    if shared is None:
+        try:
+            pool_store.pools_store.refresh(wait=True)
+        except Exception as e:
+            obs.capture_exception(e)
+    pool_store.pools_store.start_watcher(lazy=True)
+
+    # Re-scrape on a jittered daily interval in a child process; only one worker
+    # scrapes per period and the watchers above pick up the published cache.
+    refresh_scheduler.start()
+
     # Generate OpenAPI schema
     openapi_schema = get_openapi(
         title="Toronto Swim Lane Tracker API",
@@ -0,0 +1,92 @@
+"""Shared HTTP client for every upstream fetch: the ArcGIS locations layer, the
+toronto.ca per-location schedule files and the beach water-quality feeds.
+
+One requests.Session per process keeps a pool of keep-alive connections per
+host, so the hundreds of week{N}.json downloads reuse a handful of TCP+TLS
+connections instead of handshaking for each file. Timeouts and the retry /
+backoff policy live here, once, rather than in hand-rolled loops at each call
+site, and no request can hang forever on a dead socket.
+
+Every request is timed; the timing is logged at DEBUG and handed to any
+listeners registered with add_listener (used for scrape stats).
+"""
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 5    # seconds to establish a connection
+READ_TIMEOUT = 30      # seconds between bytes once connected
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Transient failures worth retrying: connection errors, read timeouts and
+# these statuses. 404 is a real answer (location has no schedule) and is not
+# retried. Backoff sleeps 0.5s, 1s, 2s between attempts, honouring Retry-After.
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+POOL_CONNECTIONS = 4   # distinct hosts kept warm
+POOL_MAXSIZE = 16      # connections per host; must cover the scraper's workers
+
+_session = None
+_session_lock = threading.Lock()
+_listeners = []
+
+
+def _build_session():
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,  # hand back the last response; callers raise_for_status
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def session():
+    """The process-wide pooled session (created on first use)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def add_listener(fn):
+    """Call fn(url, response, elapsed_seconds) after every completed request."""
+    _listeners.append(fn)
+
+
+def remove_listener(fn):
+    if fn in _listeners:
+        _listeners.remove(fn)
+
+
+def get(url, timeout=TIMEOUT, **kwargs):
+    """GET through the shared session with the standard timeouts and retries.
+    Raises requests exceptions for connection-level failures once retries are
+    exhausted; HTTP error statuses are returned for the caller to handle."""
+    start = time.monotonic()
+    response = session().get(url, timeout=timeout, **kwargs)
+    elapsed = time.monotonic() - start
+    logger.debug(f"GET {url} -> {response.status_code} in {elapsed * 1000:.0f} ms ({len(response.content)} bytes)")
+    for fn in list(_listeners):
+        try:
+            fn(url, response, elapsed)
+        except Exception as e:
+            logger.error(f"HTTP listener failed (ignored): {e}")
+    return response
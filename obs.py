@@ -1,12 +1,21 @@
-"""Lightweight observability helpers: .env loading, optional Sentry, and
-Healthchecks.io pings. Everything degrades to a clean no-op when a piece is
-absent (no DSN, sentry_sdk not installed, no ping URL), so monitoring can never
-break the app or the scrape.
+"""Lightweight observability helpers: .env loading, optional Sentry,
+Healthchecks.io pings, and in-process metrics. Everything degrades to a clean
+no-op when a piece is absent (no DSN, sentry_sdk not installed, no ping URL), so
+monitoring can never break the app or the scrape.
 
 Secrets are read from the environment only — populate a gitignored
 `.env` next to this file (KEY=VALUE lines) on the server; never commit them.
+
+Metrics (`metrics`, below) are counters and histograms recorded per thread —
+each thread only ever writes its own shard, so recording takes no lock — and
+gauges computed by callbacks when scraped. `metrics.render()` merges the shards
+into the Prometheus text format; the API serves it at /metrics and records
+every request through MetricsMiddleware.
 """
 import os
+import threading
+import time
+from bisect import bisect_left
 
 
 def load_dotenv(path=None):
@@ -77,3 +86,159 @@ def ping_healthchecks(success=True):
         requests.get(target, timeout=10)
     except Exception:
         pass
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Counters, histograms and callback gauges, exported as Prometheus text.
+
+    Declare each metric once (counter / histogram / gauge), then record with
+    inc() and observe(). Recording touches only the calling thread's shard; a
+    render() adds the shards up (a scrape may miss a value recorded at that
+    instant, never corrupt one)."""
+
+    def __init__(self):
+        self._meta = {}        # name -> (kind, help, buckets)
+        self._gauges = {}      # name -> callback
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._local = threading.local()
+
+    def counter(self, name, help):
+        self._meta[name] = ("counter", help, None)
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help, tuple(buckets))
+
+    def gauge(self, name, help, fn, kind="gauge"):
+        """fn() -> a number, or {labels dict as a tuple of pairs: number}, read
+        at render time. A callback that raises or returns None is left out.
+        kind="counter" exports a monotonically growing value kept elsewhere."""
+        self._meta[name] = (kind, help, None)
+        self._gauges[name] = fn
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=None, value=1):
+        shard = self._shard()
+        key = (name, _labels(labels))
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        shard = self._shard()
+        key = (name, _labels(labels))
+        hist = shard.get(key)
+        if hist is None:
+            hist = shard[key] = [0] * (len(self._meta[name][2]) + 1) + [0.0]
+        hist[bisect_left(self._meta[name][2], value)] += 1
+        hist[-1] += value
+
+    def collect(self):
+        """{(name, labels): total} for counters and histograms, merged."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            for key, value in shard.copy().items():
+                if isinstance(value, list):
+                    merged = totals.setdefault(key, [0] * len(value))
+                    for i, v in enumerate(value):
+                        merged[i] += v
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self):
+        totals = self.collect()
+        lines = []
+        for name, (kind, help, buckets) in sorted(self._meta.items()):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            if name in self._gauges:
+                try:
+                    value = self._gauges[name]()
+                except Exception:
+                    value = None
+                if value is None:
+                    continue
+                for labels, v in (value.items() if isinstance(value, dict) else [((), value)]):
+                    if v is not None:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(v)}")
+                continue
+            for (metric, labels), value in sorted(totals.items()):
+                if metric != name:
+                    continue
+                if kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), value[:-1]):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else _format_value(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.histogram("laneduck_request_duration_seconds", "HTTP request latency by route, until the last body byte")
+metrics.histogram("laneduck_response_size_bytes", "HTTP response body size by route", SIZE_BUCKETS)
+metrics.counter("laneduck_requests_total", "HTTP requests by route, method and status")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request into `metrics`. Routes
+    are labelled by their template (/pools/{locationid}), never by the raw
+    path, so label cardinality stays bounded; unrouted paths share one label."""
+
+    def __init__(self, app, metrics=metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        state = {"status": 500, "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            labels = {"route": getattr(route, "path", None) or "unmatched"}
+            self.metrics.observe("laneduck_request_duration_seconds", time.perf_counter() - started, labels)
+            self.metrics.observe("laneduck_response_size_bytes", state["size"], labels)
+            self.metrics.inc("laneduck_requests_total", dict(labels, method=scope["method"], status=state["status"]))
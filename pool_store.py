@@ -0,0 +1,476 @@
+"""Process-resident snapshots of the scraped caches served by the API.
+
+The scraper rewrites tmp/good_list_cache.json (and the beach caches) once
+a day, but the API used to open and json.load the whole file — and strptime every
+session — on every request. A SnapshotStore loads a cache once, keeps the parsed
+result in memory, and swaps in a new snapshot when the file on disk changes
+(inode / mtime / size watch).
+
+Readers only ever dereference `store.current()`, which is a single attribute
+read: a reload builds the new snapshot off to the side and publishes it with one
+assignment, so requests never block on a reload and never see a half-built
+snapshot. A file caught mid-write (size changes while reading, or it does not
+parse) is skipped and retried on the next check; the previous snapshot keeps
+serving in the meantime.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+from heapq import nsmallest
+from typing import List
+
+from geo import GridIndex, pool_coordinates
+from session_index import SessionIndex
+
+logger = logging.getLogger(__name__)
+
+POOLS_CACHE_FILE = "tmp/good_list_cache.json"
+BEACHES_CACHE_FILE = "tmp/beaches_cache.json"
+BEACH_HISTORY_FILE = "tmp/beach_history.json"
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+
+# rank="score" in /pools/next trades distance against waiting: each km away
+# counts like this many minutes of extra wait (a rough door-to-door travel time).
+MINUTES_PER_KM = 4.0
+
+
+def parse_iso(value):
+    return datetime.strptime(value, ISO_FORMAT)
+
+
+def to_minutes(dt):
+    """Minutes since 1970-01-01 (naive, Toronto wall clock), rounded down."""
+    return (dt - EPOCH) // MINUTE
+
+
+def pool_type(pool: dict) -> str:
+    """"Indoor" or "Outdoor": the scraper's pool_type, else guessed from the
+    location type and name."""
+    return pool.get("pool_type") or (
+        "Outdoor"
+        if "outdoor" in (pool.get("location_type", "") + pool.get("complexname", "")).lower()
+        else "Indoor"
+    )
+
+
+def simple_pool(pool: dict, times: List[dict]) -> dict:
+    """The simple=true view of one pool, listing only the given sessions."""
+    return {
+        "pool_name": pool["complexname"],
+        "website": pool.get("website", ""),
+        "address": pool.get("address", "").strip(),
+        "coordinates": {"x": pool.get("x", 0), "y": pool.get("y", 0)},
+        "pool_type": pool_type(pool),
+        "pool_length": pool.get("pool_length", "Unknown"),
+        "times": [
+            {
+                "start_time": swim_data["start_time"],
+                "end_time": swim_data["end_time"],
+                "pool_length": swim_data.get("pool_length", "Unknown")
+            }
+            for swim_data in times
+        ]
+    }
+
+
+def iter_rows(snapshot, ranked, start_date=None, end_date=None, simple=False, with_distance=False, fields=None):
+    """Yield the /pools response rows for `ranked`, [(distance_km, i), ...],
+    one at a time: the full record (shared, not copied, unless a distance is
+    added) or its simple view, with "distance_km" if with_distance, projected
+    onto `fields` (a tuple from parse_fields) if given."""
+    project = projection(fields) if fields is not None else None
+    for distance, i in ranked:
+        if simple:
+            row = snapshot.simple_row(i, start_date, end_date)
+        else:
+            row = snapshot.pools[i]
+        if with_distance:
+            row = dict(row, distance_km=None if distance is None else round(distance, 3))
+        yield row if project is None else project(row)
+
+
+COMPACT_VERSION = 1
+
+
+def compact_view(snapshot, ranked, start_date=None, end_date=None, with_distance=False):
+    """The format=compact form of the simple /pools response for `ranked`,
+    [(distance_km, i), ...]: the pool table without times, plus one set of
+    parallel session arrays — pool i owns sessions offsets[i]..offsets[i+1],
+    with start and end in minutes since window_start and pool_length as an
+    index into `lengths`. window_start is start_date, or the earliest listed
+    session without one, truncated to the minute (session times have no
+    seconds). Built from the snapshot's parsed session times (its
+    session_minutes), never from the ISO strings."""
+    pools, offsets, sessions = [], [0], []
+    for distance, i in ranked:
+        pool = snapshot.pool_row(i)
+        if with_distance:
+            pool = dict(pool, distance_km=None if distance is None else round(distance, 3))
+        pools.append(pool)
+        sessions.extend(snapshot.session_minutes(i, start_date, end_date))
+        offsets.append(len(sessions))
+    if start_date is not None:
+        base = to_minutes(start_date)
+    elif sessions:
+        base = min(s for s, _, _ in sessions)
+    else:
+        base = None
+    lengths, length_codes, length = [], {}, []
+    for _, _, pool_length in sessions:
+        code = length_codes.get(pool_length)
+        if code is None:
+            code = length_codes[pool_length] = len(lengths)
+            lengths.append(pool_length)
+        length.append(code)
+    return {
+        "format": "compact",
+        "version": COMPACT_VERSION,
+        "window_start": (EPOCH + base * MINUTE).strftime(ISO_FORMAT) if base is not None else None,
+        "lengths": lengths,
+        "pools": pools,
+        "offsets": offsets,
+        "start": [s - base for s, _, _ in sessions],
+        "end": [e - base for _, e, _ in sessions],
+        "length": length,
+    }
+
+
+def expand_compact_view(view):
+    """Inverse of compact_view: the simple /pools rows (what index.html's
+    decoder does too)."""
+    base = parse_iso(view["window_start"]) if view["window_start"] is not None else None
+    rows = []
+    for i, pool in enumerate(view["pools"]):
+        row = dict(pool)
+        row["times"] = [
+            {
+                "start_time": (base + timedelta(minutes=view["start"][j])).strftime(ISO_FORMAT),
+                "end_time": (base + timedelta(minutes=view["end"][j])).strftime(ISO_FORMAT),
+                "pool_length": view["lengths"][view["length"][j]],
+            }
+            for j in range(view["offsets"][i], view["offsets"][i + 1])
+        ]
+        rows.append(row)
+    return rows
+
+
+def parse_fields(fields):
+    """The field names in a comma-separated `fields=` value, in order, without
+    blanks or repeats, as a tuple (the projection cache key); None for None."""
+    if fields is None:
+        return None
+    names = []
+    for name in fields.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return tuple(names)
+
+
+@lru_cache(maxsize=256)
+def projection(fields):
+    """A function keeping only `fields` (a tuple from parse_fields) of a
+    response row, in that order; fields a row lacks are left out. Built once
+    per field set."""
+    def project(row):
+        return {name: row[name] for name in fields if name in row}
+    return project
+
+
+class PoolSnapshot:
+    """One immutable generation of good_list_cache.json.
+
+    `pools` is the list exactly as stored in the cache; `sessions[i]` holds
+    (start, end, swim_data) tuples for `pools[i]` with the datetimes parsed once
+    here instead of on every request (and `minutes[i]` the same sessions as
+    minutes, for format=compact), and `index` answers window queries over
+    them (see session_index.py); `geo` indexes the pools' coordinates (see
+    geo.py). Sessions whose times cannot be parsed are left
+    out (they could never match a window anyway)."""
+
+    def __init__(self, pools, generation=0):
+        self.pools = pools
+        self.generation = generation
+        self.loaded_at = time.time()
+        self.sessions = []
+        for pool in pools:
+            parsed = []
+            for swim_data in pool.get("swim_data", []):
+                try:
+                    parsed.append((parse_iso(swim_data["start_time"]), parse_iso(swim_data["end_time"]), swim_data))
+                except (KeyError, TypeError, ValueError):
+                    logger.warning(f"Skipping session with unparseable times in {pool.get('complexname')}: {swim_data}")
+            self.sessions.append(parsed)
+        # The same sessions as (start, end, pool_length) in minutes, for format=compact.
+        self.minutes = [
+            [(to_minutes(start), to_minutes(end), swim_data.get("pool_length", "Unknown"))
+             for start, end, swim_data in parsed]
+            for parsed in self.sessions
+        ]
+        self.index = SessionIndex(self.sessions)
+        self._pool_rows = [None] * len(pools)
+        self.geo = GridIndex([pool_coordinates(pool) for pool in pools])
+        # locationid -> index of its first record in the cache.
+        self.by_id = {}
+        # Pools with any session, first occurrence of each locationid (as match() keeps).
+        self._distinct = []
+        seen_ids = set()
+        for i, pool in enumerate(pools):
+            self.by_id.setdefault(pool.get("locationid"), i)
+            if self.sessions[i] and pool.get("locationid") not in seen_ids:
+                self._distinct.append(i)
+                seen_ids.add(pool.get("locationid"))
+
+    @property
+    def session_count(self):
+        return len(self.index.starts)
+
+    def match(self, start_date=None, end_date=None):
+        """Indices of pools with at least one session that starts at/after
+        start_date and ends at/before end_date (either bound optional), in cache
+        order. A locationid is only ever returned once."""
+        matched = []
+        seen_ids = set()
+        for i in self.index.contained(start_date, end_date):
+            locationid = self.pools[i]["locationid"]
+            if locationid not in seen_ids:
+                matched.append(i)
+                seen_ids.add(locationid)
+        return matched
+
+    def find(self, locationid):
+        """Index of the pool with this locationid, or None."""
+        return self.by_id.get(locationid)
+
+    def times(self, i, start_date=None, end_date=None):
+        """swim_data entries of pool i that overlap the window (end at/after
+        start_date, start at/before end_date), in stored order."""
+        return self.index.overlapping(i, start_date, end_date)
+
+    def simple_row(self, i, start_date=None, end_date=None):
+        """Pool i's simple view, listing its sessions in the window."""
+        return simple_pool(self.pools[i], self.times(i, start_date, end_date))
+
+    def pool_row(self, i):
+        """Pool i's simple view without "times" (the compact pool table).
+        Built once per snapshot and shared: callers must not modify it."""
+        row = self._pool_rows[i]
+        if row is None:
+            row = simple_pool(self.pools[i], [])
+            del row["times"]
+            self._pool_rows[i] = row
+        return row
+
+    def session_minutes(self, i, start_date=None, end_date=None):
+        """(start, end, pool_length) of pool i's sessions in the window, in
+        stored order, with the times as to_minutes()."""
+        minutes = self.minutes[i]
+        return [minutes[pos] for pos in self.index.overlapping_positions(i, start_date, end_date)]
+
+    def near(self, matched, lat, lng, radius_km=None, limit=None):
+        """Order the pool indices in `matched` by distance from (lat, lng):
+        [(distance_km, i), ...], nearest first. With radius_km only pools within
+        it are kept; with limit only the closest `limit`. Without a radius,
+        pools that have no coordinates follow the located ones with distance
+        None."""
+        ranked = self.geo.nearest(lat, lng, k=limit, radius_km=radius_km, allowed=set(matched))
+        if radius_km is None and (limit is None or len(ranked) < limit):
+            unlocated = [(None, i) for i in matched if self.geo.points[i] is None]
+            ranked += unlocated if limit is None else unlocated[:limit - len(ranked)]
+        return ranked
+
+    def upcoming(self, at, limit=10, lat=None, lng=None, radius_km=None, rank="time"):
+        """Each pool's next session at `at` (in progress or upcoming), best
+        `limit` first: [(i, start, end, swim_data, distance_km), ...].
+
+        rank="time" orders by session start (in-progress sessions first);
+        rank="score" by minutes of waiting plus MINUTES_PER_KM per km away and
+        needs lat/lng. With lat/lng every result carries its distance (None for
+        pools without coordinates, which radius_km drops)."""
+        if lat is None:
+            candidates = [(None, i) for i in self._distinct]
+        else:
+            candidates = self.near(self._distinct, lat, lng, radius_km=radius_km)
+        found = []
+        for distance, i in candidates:
+            session = self.index.next_session(i, at)
+            if session is not None:
+                found.append((i,) + session + (distance,))
+        if rank == "score":
+            def key(row):
+                wait = max((row[1] - at).total_seconds() / 60, 0.0)
+                return (wait + (MINUTES_PER_KM * row[4] if row[4] is not None else float("inf")), row[0])
+        else:
+            def key(row):
+                return (row[1], float("inf") if row[4] is None else row[4], row[0])
+        return nsmallest(limit, found, key=key)
+
+
+def _beaches_snapshot(beaches, generation=0):
+    return beaches
+
+
+class BeachHistory:
+    """tmp/beach_history.json (see beaches.py) indexed for date ranges: each
+    beach's samples sorted by sample_date, with the dates alongside to bisect."""
+
+    def __init__(self, data, generation=0):
+        self.generation = generation
+        self.samples = {}
+        self.dates = {}
+        for beach_id, samples in (data.get("beaches") or {}).items():
+            ordered = sorted(samples, key=lambda sample: sample["sample_date"])
+            self.samples[beach_id] = ordered
+            self.dates[beach_id] = [sample["sample_date"] for sample in ordered]
+
+    def between(self, beach_id, start_date=None, end_date=None):
+        """Samples of the beach dated start_date..end_date (ISO dates, both
+        inclusive and optional), oldest first; None for an unknown beach."""
+        dates = self.dates.get(str(beach_id))
+        if dates is None:
+            return None
+        lo = 0 if start_date is None else bisect_left(dates, start_date)
+        hi = len(dates) if end_date is None else bisect_right(dates, end_date)
+        return self.samples[str(beach_id)][lo:hi]
+
+
+class SnapshotStore:
+    """Hold the latest parsed snapshot of a JSON cache file.
+
+    `build(data, generation)` turns the decoded JSON into the snapshot object.
+    With `required=True`, current() raises FileNotFoundError while no snapshot
+    has ever been loaded (the cache has not been scraped yet); otherwise it
+    returns None. Once loaded, a snapshot keeps serving even if the file later
+    disappears."""
+
+    def __init__(self, path, build, required=True, check_interval=2.0):
+        self.path = path
+        self.build = build
+        self.required = required
+        self.check_interval = check_interval
+        self.generation = 0
+        self.mtime = None  # of the file the live snapshot was loaded from
+        self._snapshot = None
+        self._signature = None
+        self._last_check = 0.0
+        self._load_lock = threading.Lock()
+        self._watcher = None
+        self._watch_on_load = None  # watcher interval, for start_watcher(lazy=True)
+        self._watcher_lock = threading.Lock()
+        self._file_mtime = (None, 0.0)  # (st_mtime, monotonic time of the stat)
+
+    def current(self):
+        """Return the live snapshot. Without a watcher thread (scripts, tests)
+        the file is re-checked inline at most once per check_interval."""
+        if self._snapshot is None:
+            self.refresh(wait=True)
+            if self._watch_on_load is not None and self._snapshot is not None:
+                self.start_watcher(self._watch_on_load)
+        elif self._watcher is None and time.monotonic() - self._last_check >= self.check_interval:
+            self.refresh()
+        snapshot = self._snapshot
+        if snapshot is None and self.required:
+            raise FileNotFoundError(self.path)
+        return snapshot
+
+    def file_mtime(self):
+        """mtime of the file on disk (None while it does not exist), without
+        loading it. Stat'ed at most once per check_interval."""
+        mtime, checked = self._file_mtime
+        if time.monotonic() - checked >= self.check_interval:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                mtime = None
+            self._file_mtime = (mtime, time.monotonic())
+        return mtime
+
+    def peek(self):
+        """The live snapshot, or None before the first load, without touching
+        the file (for metrics)."""
+        return self._snapshot
+
+    def refresh(self, wait=False):
+        """Reload the file if it changed since the last load. Returns True when
+        a new snapshot was published. Concurrent callers do not pile up: unless
+        `wait` is set, a caller that finds a reload in progress returns False
+        and keeps using the current snapshot."""
+        self._last_check = time.monotonic()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (st.st_ino, st.st_mtime_ns, st.st_size) == self._signature:
+            return False
+        if not self._load_lock.acquire(blocking=wait):
+            return False
+        try:
+            return self._load()
+        finally:
+            self._load_lock.release()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                before = os.fstat(f.fileno())
+                raw = f.read()
+                after = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return False
+        signature = (before.st_ino, before.st_mtime_ns, before.st_size)
+        if signature == self._signature:
+            return False  # another thread published this version while we waited
+        if len(raw) != before.st_size or (after.st_mtime_ns, after.st_size) != (before.st_mtime_ns, before.st_size):
+            logger.info(f"{self.path} is still being written; keeping the current snapshot")
+            return False
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            logger.warning(f"{self.path} did not parse ({e}); keeping the current snapshot")
+            return False
+        snapshot = self.build(data, self.generation + 1)
+        self.generation += 1
+        self._snapshot = snapshot
+        self._signature = signature
+        self.mtime = before.st_mtime
+        logger.info(f"Loaded {self.path} (generation {self.generation})")
+        return True
+
+    def start_watcher(self, interval=None, lazy=False):
+        """Poll the file from a daemon thread so reloads happen off the request
+        path. Idempotent. With lazy, a store that has not loaded anything yet
+        starts watching only once current() first loads it, so a process that
+        never reads it neither holds nor re-parses it."""
+        interval = interval or self.check_interval
+        with self._watcher_lock:
+            if self._watcher is not None:
+                return self._watcher
+            if lazy and self._snapshot is None:
+                self._watch_on_load = interval
+                return None
+            return self._start_watcher(interval)
+
+    def _start_watcher(self, interval):
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Reloading {self.path} failed (keeping the current snapshot): {e}")
+
+        self._watcher = threading.Thread(target=watch, name=f"watch:{self.path}", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+
+pools_store = SnapshotStore(POOLS_CACHE_FILE, PoolSnapshot)
+beaches_store = SnapshotStore(BEACHES_CACHE_FILE, _beaches_snapshot, required=False)
+beach_history_store = SnapshotStore(BEACH_HISTORY_FILE, BeachHistory, required=False)
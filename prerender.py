@@ -1,68 +1,157 @@
-"""Prerender a static, crawlable HTML page of every pool and its lane swim
+"""Prerender static, crawlable HTML pages of every pool and its lane swim
 times from the scraped cache.
 
 The main app (index.html) renders the pool list client-side with Vue, so search
 engines see almost no content. This script reads tmp/good_list_cache.json and
-writes a fully static page (pool_schedules.html) listing each pool's name,
-address, indoor/outdoor, official link, and upcoming lane swim times — so the
-actual pool names and schedules are crawlable. It is regenerated on every scrape
-run (see scrape.py) so it stays fresh, and is served at /lane-duck/pools.
+writes fully static pages listing each pool's name, address, indoor/outdoor,
+official link, and upcoming lane swim times, so the actual pool names and
+schedules are crawlable:
+
+  * pool_schedules.html, every pool on one page, served at /lane-duck/pools
+  * pools/<slug>.html, one page per pool, served at /lane-duck/pools/<slug>
+
+It is regenerated on every scrape run (see scrape.py), incrementally. Each
+pool page is fingerprinted by what it shows and only re-rendered when that
+fingerprint changes. The fingerprints, and the day each page last changed, are
+kept in tmp/prerender_manifest.json. sitemap.xml is rebuilt from the manifest,
+so every URL's <lastmod> is the day its content really changed. Pages are
+written atomically (temp file + rename). When many pool pages changed at once,
+they are rendered in worker processes.
 """
+import hashlib
 import json
 import os
 import re
 import html
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from collections import defaultdict
 
+import clock
+from atomic_io import write_atomic, write_json_atomic
+from pool_store import parse_iso
+
 CACHE_FILE = "tmp/good_list_cache.json"
 OUTPUT_FILE = "pool_schedules.html"
+POOL_PAGES_DIR = "pools"
+MANIFEST_FILE = "tmp/prerender_manifest.json"
+SITEMAP_FILE = "sitemap.xml"
 SITE_URL = "https://www.connorladly.com/lane-duck"
+# Bump when the page templates change, so every page is re-rendered once.
+TEMPLATE_VERSION = 1
+# From this many changed pool pages on, render them in worker processes.
+PARALLEL_THRESHOLD = 200
+
+_STYLE = """\
+  * { margin:0; padding:0; box-sizing:border-box; }
+  body { font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif; color:#1C2B2A; background:#f4f7f7; line-height:1.55; padding:24px 16px 64px; }
+  .wrap { max-width:820px; margin:0 auto; }
+  header { background:linear-gradient(135deg,#1AA8A0 0%,#14837d 100%); color:#fff; border-radius:14px; padding:32px 28px; margin-bottom:24px; }
+  header h1 { font-size:1.9rem; margin-bottom:8px; }
+  header p { opacity:.95; }
+  header a { color:#fff; font-weight:600; }
+  .intro { background:#fff; border:1px solid #e2e8e8; border-radius:12px; padding:18px 20px; margin-bottom:24px; font-size:.96rem; }
+  .intro a { color:#12766f; font-weight:600; }
+  .pool { background:#fff; border:1px solid #e2e8e8; border-radius:12px; padding:18px 20px; margin-bottom:14px; }
+  .pool h2 { font-size:1.18rem; margin-bottom:2px; }
+  .pool h2 a { color:#12766f; text-decoration:none; }
+  .pool h2 a:hover { text-decoration:underline; }
+  .meta { color:#5b6b6a; font-size:.85rem; margin-bottom:10px; }
+  .times { list-style:none; display:flex; flex-direction:column; gap:4px; }
+  .times li { font-size:.9rem; }
+  .day { font-weight:600; color:#12766f; }
+  footer { margin-top:28px; color:#5b6b6a; font-size:.85rem; text-align:center; }
+  @media (prefers-color-scheme: dark) {
+    body { background:#0f1514; color:#e8efee; }
+    .intro,.pool { background:#151d1c; border-color:#25322f; }
+    .pool h2 a,.day { color:#2fc3ba; }
+    .meta,footer { color:#9fb0ae; }
+    .intro a { color:#2fc3ba; }
+  }
+"""
 
 
 def slugify(name):
     return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
 
 
-def fmt_time(iso):
-    return datetime.strptime(iso, "%Y-%m-%dT%H:%M:%S").strftime("%-I:%M %p")
+def fmt_time(dt):
+    return dt.strftime("%-I:%M %p")
 
 
-def fmt_day(iso):
-    return datetime.strptime(iso, "%Y-%m-%dT%H:%M:%S").strftime("%A, %B %-d")
+def fmt_day(dt):
+    return dt.strftime("%A, %B %-d")
 
 
-def stamp_sitemap(sitemap_file="sitemap.xml"):
-    """Update every <lastmod> in sitemap.xml to today's date (America/Toronto).
+def _today():
+    return clock.now_toronto().strftime("%Y-%m-%d")
 
-    The sitemap advertises changefreq=daily, so a stale lastmod is a weak SEO
-    signal. This is called on every scrape run so the served sitemap always
-    reflects the day the data was last refreshed. No-op (with a warning) if the
-    sitemap is missing, so it can never break the scrape."""
-    if not os.path.exists(sitemap_file):
-        print(f"stamp_sitemap: {sitemap_file} not found, skipping")
-        return None
-    from scrape import now_toronto
-    today = now_toronto().strftime("%Y-%m-%d")
-    with open(sitemap_file, "r", encoding="utf-8") as f:
-        xml = f.read()
-    new_xml, n = re.subn(r"<lastmod>[^<]*</lastmod>", f"<lastmod>{today}</lastmod>", xml)
-    if new_xml != xml:
-        with open(sitemap_file, "w", encoding="utf-8") as f:
-            f.write(new_xml)
-    print(f"stamp_sitemap: set {n} <lastmod> entries to {today}")
-    return today
-
-
-def build_beaches(cache_file="tmp/beaches_cache.json", html_file="beaches.html"):
+
+def _fingerprint(content):
+    data = json.dumps([TEMPLATE_VERSION, content], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:16]
+
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    """{url: {"kind", "file", "hash", "lastmod"}} of the pages rendered so far.
+    Empty (so everything re-renders) when missing or unreadable."""
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f).get("pages", {})
+    except (FileNotFoundError, ValueError, AttributeError):
+        return {}
+
+
+def _save_manifest(pages, manifest_file=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(manifest_file) or ".", exist_ok=True)
+    write_json_atomic(manifest_file, {"version": 1, "pages": pages}, indent=1)
+
+
+def write_sitemap(pages, sitemap_file=SITEMAP_FILE):
+    """Rebuild sitemap.xml from the manifest: the finder, the full schedule,
+    the beaches page and every pool page, each with the <lastmod> of its last
+    real content change. The finder shows the newest data, so it takes the
+    latest of them all. Only rewritten when something changed."""
+    def lastmod(url):
+        return pages.get(url, {}).get("lastmod")
+
+    newest = max((entry["lastmod"] for entry in pages.values() if entry.get("lastmod")), default=None)
+    urls = [(SITE_URL, newest, "1.0"),
+            (f"{SITE_URL}/pools", lastmod(f"{SITE_URL}/pools"), "0.8"),
+            (f"{SITE_URL}/beaches", lastmod(f"{SITE_URL}/beaches"), "0.8")]
+    urls += sorted((url, entry.get("lastmod"), "0.6") for url, entry in pages.items() if entry.get("kind") == "pool")
+    entries = []
+    for url, modified, priority in urls:
+        stamp = f"    <lastmod>{modified}</lastmod>\n" if modified else ""
+        entries.append(f"  <url>\n    <loc>{html.escape(url)}</loc>\n{stamp}"
+                       f"    <changefreq>daily</changefreq>\n    <priority>{priority}</priority>\n  </url>")
+    xml = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+           + "\n".join(entries) + "\n</urlset>\n")
+    try:
+        with open(sitemap_file, "r", encoding="utf-8") as f:
+            if f.read() == xml:
+                return sitemap_file
+    except FileNotFoundError:
+        pass
+    write_atomic(sitemap_file, xml)
+    print(f"write_sitemap: {len(urls)} URLs -> {sitemap_file}")
+    return sitemap_file
+
+
+def build_beaches(cache_file="tmp/beaches_cache.json", html_file="beaches.html", beaches=None,
+                  manifest_file=MANIFEST_FILE, sitemap_file=SITEMAP_FILE):
     """Inject a static, crawlable snapshot of current beach conditions into
     beaches.html (between the BEACHES_STATIC markers). Gives search engines real
     content and doubles as the fallback shown if the interactive app can't load.
-    Fully non-fatal: missing cache/markers/file just skips."""
+    `beaches` (the list beaches.build() just wrote) skips re-reading the cache.
+    The page is only rewritten (and its sitemap <lastmod> moved) when the
+    snapshot changed. Fully non-fatal: missing cache/markers/file just skips."""
     START, END = "<!-- BEACHES_STATIC_START -->", "<!-- BEACHES_STATIC_END -->"
     try:
-        with open(cache_file, "r", encoding="utf-8") as f:
-            beaches = json.load(f)
+        if beaches is None:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                beaches = json.load(f)
         with open(html_file, "r", encoding="utf-8") as f:
             page = f.read()
     except (FileNotFoundError, ValueError) as e:
@@ -110,103 +199,173 @@ def build_beaches(cache_file="tmp/beaches_cache.json", html_file="beaches.html")
     )
 
     new_page = page[:page.index(START) + len(START)] + snapshot + page[page.index(END):]
-    with open(html_file, "w", encoding="utf-8") as f:
-        f.write(new_page)
+    pages = load_manifest(manifest_file)
+    if new_page == page and f"{SITE_URL}/beaches" in pages:
+        print(f"build_beaches: snapshot unchanged for {len(beaches)} beaches")
+        return html_file
+    if new_page != page:
+        write_atomic(html_file, new_page)
+    pages[f"{SITE_URL}/beaches"] = {"kind": "beaches", "file": html_file, "hash": _fingerprint(snapshot),
+                                    "lastmod": _today()}
+    _save_manifest(pages, manifest_file)
+    write_sitemap(pages, sitemap_file)
     print(f"build_beaches: wrote snapshot for {len(beaches)} beaches ({safe} safe, {unsafe} unsafe)")
     return html_file
 
 
-def build(cache_file=CACHE_FILE, output_file=OUTPUT_FILE):
-    with open(cache_file, "r", encoding="utf-8") as f:
-        pools = json.load(f)
-
-    # Toronto wall-clock time (naive) so "already finished" is judged in the
-    # pools' local timezone, matching the naive datetimes stored in the cache.
-    # Uses the same fail-loud Toronto clock as the scraper (no silent UTC).
-    from scrape import now_toronto
-    now = now_toronto().replace(tzinfo=None)
-    pools = sorted(pools, key=lambda p: p.get("complexname", ""))
+def _pool_view(pool, now):
+    """What a pool's pages show, as plain data (fingerprinted, and sent to
+    worker processes), or None for a pool without a name or upcoming sessions.
+    Each session's times are parsed once."""
+    name = pool.get("complexname", "").strip()
+    if not name:
+        return None
 
-    pool_sections = []
-    total_sessions = 0
-    for pool in pools:
-        name = pool.get("complexname", "").strip()
-        if not name:
+    # Group upcoming sessions by day
+    by_day = defaultdict(list)
+    sessions = 0
+    for s in pool.get("swim_data", []):
+        try:
+            start, end = parse_iso(s["start_time"]), parse_iso(s["end_time"])
+        except (KeyError, ValueError, TypeError):
             continue
-        address = pool.get("address", "").strip()
-        pool_type = pool.get("pool_type", "Indoor")
-        website = pool.get("website", "")
+        if end < now:
+            continue  # skip sessions already finished
+        by_day[start.date()].append((start, end))
+        sessions += 1
+    if not by_day:
+        return None
+
+    days = []
+    for day in sorted(by_day):
+        times = sorted(by_day[day])
+        days.append([fmt_day(times[0][0]), [f"{fmt_time(start)}&ndash;{fmt_time(end)}" for start, end in times]])
+    return {
+        "name": name,
+        "address": pool.get("address", "").strip(),
+        "pool_type": pool.get("pool_type", "Indoor"),
+        "pool_length": pool.get("pool_length", "Unknown"),
+        "website": pool.get("website", ""),
+        "days": days,
+        "sessions": sessions,
+    }
 
-        # Group upcoming sessions by day
-        by_day = defaultdict(list)
-        for s in pool.get("swim_data", []):
-            try:
-                end = datetime.strptime(s["end_time"], "%Y-%m-%dT%H:%M:%S")
-            except (KeyError, ValueError, TypeError):
-                continue
-            if end < now:
-                continue  # skip sessions already finished
-            by_day[s["start_time"][:10]].append(s)
-
-        if not by_day:
-            continue
 
-        day_html = []
-        for day_key in sorted(by_day):
-            sessions = sorted(by_day[day_key], key=lambda s: s["start_time"])
-            times = ", ".join(
-                f"{fmt_time(s['start_time'])}&ndash;{fmt_time(s['end_time'])}" for s in sessions
-            )
-            total_sessions += len(sessions)
-            day_html.append(
-                f'      <li><span class="day">{html.escape(fmt_day(sessions[0]["start_time"]))}:</span> {times}</li>'
-            )
-
-        name_html = html.escape(name)
-        title_html = (
-            f'<a href="{html.escape(website)}" target="_blank" rel="noopener">{name_html}</a>'
-            if website
-            else name_html
-        )
-        meta_bits = []
-        if address:
-            meta_bits.append(html.escape(address))
-        pool_length = pool.get("pool_length", "Unknown")
-        type_bit = f"{html.escape(pool_type)} pool"
-        if pool_length and pool_length != "Unknown":
-            type_bit += f" &middot; {html.escape(pool_length)}"
-        meta_bits.append(type_bit)
-        pool_sections.append(
-            f'''  <section class="pool" id="{slugify(name)}">
+def _pool_section(view, page_link=True):
+    name_html = html.escape(view["name"])
+    website = view["website"]
+    title_html = (
+        f'<a href="{html.escape(website)}" target="_blank" rel="noopener">{name_html}</a>'
+        if website
+        else name_html
+    )
+    meta_bits = []
+    if view["address"]:
+        meta_bits.append(html.escape(view["address"]))
+    pool_length = view["pool_length"]
+    type_bit = f"{html.escape(view['pool_type'])} pool"
+    if pool_length and pool_length != "Unknown":
+        type_bit += f" &middot; {html.escape(pool_length)}"
+    meta_bits.append(type_bit)
+    if page_link:
+        meta_bits.append(f'<a href="{SITE_URL}/pools/{view["slug"]}">Schedule page</a>')
+    day_html = [
+        f'      <li><span class="day">{html.escape(label)}:</span> {", ".join(times)}</li>'
+        for label, times in view["days"]
+    ]
+    return f'''  <section class="pool" id="{view["slug"]}">
     <h2>{title_html}</h2>
     <p class="meta">{' &middot; '.join(meta_bits)}</p>
     <ul class="times">
 {os.linesep.join(day_html)}
     </ul>
   </section>'''
-        )
 
-    # ItemList structured data of the pools (crawlable list of names + anchors)
+
+def _pool_page(view):
+    """The standalone page of one pool, at /lane-duck/pools/<slug>. Nothing on
+    it depends on when it was rendered, so an unchanged fingerprint means an
+    unchanged page."""
+    url = f"{SITE_URL}/pools/{view['slug']}"
+    name_html = html.escape(view["name"])
+    place = {
+        "@context": "https://schema.org",
+        "@type": "PublicSwimmingPool",
+        "name": view["name"],
+        "url": url,
+    }
+    if view["address"]:
+        place["address"] = {"@type": "PostalAddress", "streetAddress": view["address"],
+                            "addressLocality": "Toronto", "addressRegion": "ON", "addressCountry": "CA"}
+    if view["website"]:
+        place["sameAs"] = view["website"]
+    where = f" at {view['address']}" if view["address"] else ""
+    description = html.escape(
+        f"Upcoming lane swim (lap swim) times at {view['name']}, a Toronto {view['pool_type'].lower()} "
+        f"pool{where}. Updated daily.", quote=True)
+    return f'''<!DOCTYPE html>
+<html lang="en-CA">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{name_html} Lane Swim Schedule | LaneDuck 🦆</title>
+<meta name="description" content="{description}">
+<meta name="robots" content="index, follow, max-image-preview:large">
+<link rel="canonical" href="{url}">
+<meta property="og:title" content="{name_html} Lane Swim Schedule | LaneDuck">
+<meta property="og:description" content="{description}">
+<meta property="og:type" content="website">
+<meta property="og:url" content="{url}">
+<meta property="og:image" content="{SITE_URL}/og-image.png">
+<meta name="geo.region" content="CA-ON">
+<meta name="geo.placename" content="Toronto">
+<script type="application/ld+json">
+{json.dumps(place, ensure_ascii=False, indent=2)}
+</script>
+<style>
+{_STYLE}</style>
+</head>
+<body>
+<div class="wrap">
+  <header>
+    <h1>{name_html} Lane Swim Schedule</h1>
+    <p>Upcoming lane swim times at {name_html}. <a href="{SITE_URL}/pools">← All Toronto pools</a> &middot; <a href="{SITE_URL}">LaneDuck finder</a></p>
+  </header>
+{_pool_section(view, page_link=False)}
+  <footer>Schedule data from the City of Toronto. Always confirm times on the pool's official page before visiting.</footer>
+</div>
+</body>
+</html>
+'''
+
+
+def _render_pool_pages(jobs):
+    """Write [(path, view), ...]; runs in a worker process for big batches."""
+    for path, view in jobs:
+        write_atomic(path, _pool_page(view))
+    return len(jobs)
+
+
+def _index_page(views, total_sessions, now):
+    # ItemList structured data of the pools (crawlable list of names + pages)
     item_list = {
         "@context": "https://schema.org",
         "@type": "ItemList",
         "name": "Toronto public pools with lane swimming",
-        "numberOfItems": len(pool_sections),
+        "numberOfItems": len(views),
         "itemListElement": [
             {
                 "@type": "ListItem",
                 "position": i + 1,
-                "name": p.get("complexname", "").strip(),
-                "url": f"{SITE_URL}/pools#{slugify(p.get('complexname', '').strip())}",
+                "name": view["name"],
+                "url": f"{SITE_URL}/pools/{view['slug']}",
             }
-            for i, p in enumerate(
-                [p for p in pools if p.get("complexname", "").strip()]
-            )
+            for i, view in enumerate(views)
         ],
     }
 
     updated = now.strftime("%B %-d, %Y at %-I:%M %p")
-    page = f'''<!DOCTYPE html>
+    return f'''<!DOCTYPE html>
 <html lang="en-CA">
 <head>
 <meta charset="UTF-8">
@@ -226,32 +385,7 @@ def build(cache_file=CACHE_FILE, output_file=OUTPUT_FILE):
 {json.dumps(item_list, ensure_ascii=False, indent=2)}
 </script>
 <style>
-  * {{ margin:0; padding:0; box-sizing:border-box; }}
-  body {{ font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif; color:#1C2B2A; background:#f4f7f7; line-height:1.55; padding:24px 16px 64px; }}
-  .wrap {{ max-width:820px; margin:0 auto; }}
-  header {{ background:linear-gradient(135deg,#1AA8A0 0%,#14837d 100%); color:#fff; border-radius:14px; padding:32px 28px; margin-bottom:24px; }}
-  header h1 {{ font-size:1.9rem; margin-bottom:8px; }}
-  header p {{ opacity:.95; }}
-  header a {{ color:#fff; font-weight:600; }}
-  .intro {{ background:#fff; border:1px solid #e2e8e8; border-radius:12px; padding:18px 20px; margin-bottom:24px; font-size:.96rem; }}
-  .intro a {{ color:#12766f; font-weight:600; }}
-  .pool {{ background:#fff; border:1px solid #e2e8e8; border-radius:12px; padding:18px 20px; margin-bottom:14px; }}
-  .pool h2 {{ font-size:1.18rem; margin-bottom:2px; }}
-  .pool h2 a {{ color:#12766f; text-decoration:none; }}
-  .pool h2 a:hover {{ text-decoration:underline; }}
-  .meta {{ color:#5b6b6a; font-size:.85rem; margin-bottom:10px; }}
-  .times {{ list-style:none; display:flex; flex-direction:column; gap:4px; }}
-  .times li {{ font-size:.9rem; }}
-  .day {{ font-weight:600; color:#12766f; }}
-  footer {{ margin-top:28px; color:#5b6b6a; font-size:.85rem; text-align:center; }}
-  @media (prefers-color-scheme: dark) {{
-    body {{ background:#0f1514; color:#e8efee; }}
-    .intro,.pool {{ background:#151d1c; border-color:#25322f; }}
-    .pool h2 a,.day {{ color:#2fc3ba; }}
-    .meta,footer {{ color:#9fb0ae; }}
-    .intro a {{ color:#2fc3ba; }}
-  }}
-</style>
+{_STYLE}</style>
 </head>
 <body>
 <div class="wrap">
@@ -260,18 +394,92 @@ def build(cache_file=CACHE_FILE, output_file=OUTPUT_FILE):
     <p>Lane swim times for every Toronto public pool with lane swimming — indoor &amp; outdoor. <a href="{SITE_URL}">← Back to the LaneDuck finder</a></p>
   </header>
   <div class="intro">
-    <p>This page lists <strong>{len(pool_sections)} Toronto public pools</strong> with upcoming lane swim (lap swim) sessions — {total_sessions} sessions in total, updated daily. Tap a pool name for its official City of Toronto page. For an interactive version where you can filter by date, indoor/outdoor, and sort by distance, use the <a href="{SITE_URL}">LaneDuck lane swim finder</a>.</p>
+    <p>This page lists <strong>{len(views)} Toronto public pools</strong> with upcoming lane swim (lap swim) sessions — {total_sessions} sessions in total, updated daily. Tap a pool name for its official City of Toronto page, or "Schedule page" for its own LaneDuck page. For an interactive version where you can filter by date, indoor/outdoor, and sort by distance, use the <a href="{SITE_URL}">LaneDuck lane swim finder</a>.</p>
   </div>
-{os.linesep.join(pool_sections)}
+{os.linesep.join(_pool_section(view) for view in views)}
   <footer>Schedule data from the City of Toronto, updated {updated}. Always confirm times on the pool's official page before visiting.</footer>
 </div>
 </body>
 </html>
 '''
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(page)
-    print(f"Prerendered {len(pool_sections)} pools ({total_sessions} sessions) -> {output_file}")
+
+def build(cache_file=CACHE_FILE, output_file=OUTPUT_FILE, pools=None, pages_dir=POOL_PAGES_DIR,
+          manifest_file=MANIFEST_FILE, sitemap_file=SITEMAP_FILE, parallel_threshold=PARALLEL_THRESHOLD):
+    """Render pool_schedules.html and the pool pages whose content changed,
+    delete the pages of pools that are gone, and rebuild the sitemap. `pools`
+    (the scrape's in-memory result) skips re-reading cache_file."""
+    if pools is None:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            pools = json.load(f)
+
+    # Toronto wall-clock time (naive) so "already finished" is judged in the
+    # pools' local timezone, matching the naive datetimes stored in the cache.
+    # Uses the same fail-loud Toronto clock as the scraper (no silent UTC).
+    now = clock.now_toronto().replace(tzinfo=None)
+    today = now.strftime("%Y-%m-%d")
+    pools = sorted(pools, key=lambda p: p.get("complexname", ""))
+
+    views = []
+    slugs = set()
+    for pool in pools:
+        view = _pool_view(pool, now)
+        if view is None:
+            continue
+        slug = base = slugify(view["name"]) or "pool"
+        n = 2
+        while slug in slugs:  # two records with the same name
+            slug, n = f"{base}-{n}", n + 1
+        slugs.add(slug)
+        view["slug"] = slug
+        views.append(view)
+
+    os.makedirs(pages_dir, exist_ok=True)
+    pages = load_manifest(manifest_file)
+    jobs = []
+    listed = set()
+    for view in views:
+        url = f"{SITE_URL}/pools/{view['slug']}"
+        path = os.path.join(pages_dir, f"{view['slug']}.html")
+        digest = _fingerprint(view)
+        listed.add(url)
+        entry = pages.get(url)
+        if entry is not None and entry.get("hash") == digest and os.path.exists(path):
+            continue
+        jobs.append((path, view))
+        pages[url] = {"kind": "pool", "file": path, "hash": digest, "lastmod": today}
+
+    if jobs and len(jobs) >= parallel_threshold:
+        workers = min(os.cpu_count() or 1, 8)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_render_pool_pages, [jobs[i::workers] for i in range(workers)]))
+    else:
+        _render_pool_pages(jobs)
+
+    removed = 0
+    for url, entry in list(pages.items()):
+        if entry.get("kind") == "pool" and url not in listed:
+            try:
+                os.unlink(entry["file"])
+            except FileNotFoundError:
+                pass
+            del pages[url]
+            removed += 1
+
+    # The index only changes when a pool section does (its "updated" line then
+    # records when that was).
+    total_sessions = sum(view["sessions"] for view in views)
+    index_url = f"{SITE_URL}/pools"
+    digest = _fingerprint([pages[f"{SITE_URL}/pools/{view['slug']}"]["hash"] for view in views])
+    entry = pages.get(index_url)
+    if entry is None or entry.get("hash") != digest or not os.path.exists(output_file):
+        write_atomic(output_file, _index_page(views, total_sessions, now))
+        pages[index_url] = {"kind": "index", "file": output_file, "hash": digest, "lastmod": today}
+
+    _save_manifest(pages, manifest_file)
+    write_sitemap(pages, sitemap_file)
+    print(f"Prerendered {len(views)} pools ({total_sessions} sessions) -> {output_file}; "
+          f"pool pages: {len(jobs)} rendered, {len(views) - len(jobs)} unchanged, {removed} removed")
     return output_file
 
 
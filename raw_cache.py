@@ -0,0 +1,128 @@
+"""On-disk cache of raw upstream responses, keyed by URL, for the scraper.
+
+Most locations/{id}/swim/week{N}.json files do not change between runs. For each
+URL we keep, under tmp/http_cache/:
+
+  <sha1(url)>.body   the raw response bytes
+  <sha1(url)>.json   ETag / Last-Modified, a SHA-256 of the body, and the
+                     result the scraper derived from it (with the key it was
+                     derived under)
+
+A refetch sends If-None-Match / If-Modified-Since. A 304, or a 200 whose body
+hashes the same as last time (servers that send no validators), counts as
+unchanged, and the scraper can reuse the stored derived result instead of
+decoding and parsing the file again.
+
+Everything here is best-effort: an unreadable or missing entry is a miss, and a
+failed write only costs the next run a re-parse.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from atomic_io import write_atomic
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "tmp/http_cache"
+
+# status: HTTP status of the live response (304 means the cached body is used).
+# body: the response bytes (the cached ones on a 304).
+# unchanged: the body is byte-identical to what the cache already held.
+Fetched = namedtuple("Fetched", "url status body etag last_modified content_hash unchanged entry")
+
+
+class RawCache:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0            # derived result reused
+        self.not_modified = 0    # of which the server answered 304
+        self.misses = 0          # body (re)processed
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, ext):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ext)
+
+    def _entry(self, url):
+        try:
+            with open(self._path(url, ".json"), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            return entry if entry.get("url") == url else None
+        except (OSError, ValueError):
+            return None
+
+    def _body(self, url):
+        try:
+            with open(self._path(url, ".body"), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def fetch(self, url, get):
+        """Conditionally GET `url` with `get(url, headers=...)`, which must
+        return a requests-style response. Statuses other than 200/304 come back
+        as-is with unchanged=False and are never cached."""
+        entry = self._entry(url)
+        headers = {}
+        if entry is not None and os.path.exists(self._path(url, ".body")):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            body = self._body(url)
+            if body is not None:
+                with self._lock:
+                    self.not_modified += 1
+                return Fetched(url, 304, body, entry.get("etag"), entry.get("last_modified"),
+                               entry.get("content_hash"), True, entry)
+            # Body went missing underneath us: fetch it unconditionally.
+            response = get(url, headers={})
+
+        body = response.content
+        if response.status_code != 200:
+            return Fetched(url, response.status_code, body, None, None, None, False, None)
+        content_hash = hashlib.sha256(body).hexdigest()
+        unchanged = entry is not None and entry.get("content_hash") == content_hash
+        return Fetched(url, 200, body, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                       content_hash, unchanged, entry)
+
+    def derived(self, fetched, key):
+        """The result previously stored for this exact body under `key`, or
+        None. Counts a hit or a miss."""
+        entry = fetched.entry
+        if fetched.unchanged and entry is not None and entry.get("derived_key") == key and "derived" in entry:
+            with self._lock:
+                self.hits += 1
+            return entry["derived"]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, fetched, key, derived):
+        """Remember the body, its validators, and what was derived from it."""
+        if fetched.status not in (200, 304):
+            return
+        entry = {
+            "url": fetched.url,
+            "etag": fetched.etag,
+            "last_modified": fetched.last_modified,
+            "content_hash": fetched.content_hash,
+            "derived_key": key,
+            "derived": derived,
+        }
+        try:
+            if not fetched.unchanged or not os.path.exists(self._path(fetched.url, ".body")):
+                write_atomic(self._path(fetched.url, ".body"), fetched.body, fsync=False)
+            write_atomic(self._path(fetched.url, ".json"), json.dumps(entry, ensure_ascii=False), fsync=False)
+        except OSError as e:
+            logger.warning(f"Could not cache {fetched.url} (non-fatal): {e}")
+
+    def summary(self):
+        return f"{self.hits} hits ({self.not_modified} not modified), {self.misses} misses"
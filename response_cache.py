@@ -0,0 +1,100 @@
+"""Pre-serialized /pools responses with strong ETags.
+
+The pool data changes once a day, but the frontend asks for the same few
+day-sized windows over and over. Instead of rebuilding, validating and
+JSON-encoding the same list for every request, the route keeps the encoded bytes
+in a bounded LRU keyed by the normalized query. Entries belong to one snapshot
+generation: the first lookup after a new scrape lands empties the cache.
+
+Every cached body carries a strong ETag (a digest of the bytes), so a browser
+that already has the body revalidates with If-None-Match and gets a bodyless
+304 Not Modified.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder gives the same JSON, slower
+    orjson = None
+
+CachedResponse = namedtuple("CachedResponse", "body etag")
+
+
+def encode_json(content):
+    """Encode like FastAPI's JSONResponse: compact separators, raw UTF-8, no
+    NaN. Uses orjson when it is installed (several times faster on the large
+    /pools bodies) and the stdlib json module otherwise."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            pass  # e.g. non-str dict keys, which json.dumps coerces
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def make_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value covers `etag` ("*" or a
+    comma-separated list, weak W/ prefixes compared weakly per RFC 7232)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+
+class ResponseCache:
+    """LRU of CachedResponse, bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _roll(self, generation):
+        if generation != self._generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def get(self, generation, key):
+        with self._lock:
+            self._roll(generation)
+            cached = self._entries.get(key)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached
+
+    def put(self, generation, key, body):
+        cached = CachedResponse(body, make_etag(body))
+        if len(body) > self.max_bytes:
+            return cached  # never worth evicting everything else for
+        with self._lock:
+            self._roll(generation)
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = cached
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+        return cached
+
+    def __len__(self):
+        return len(self._entries)
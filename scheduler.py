@@ -0,0 +1,149 @@
+"""In-process refresh scheduler for the API: re-scrape on a jittered interval.
+
+Every uvicorn/PM2 worker starts a scheduler thread, but only one scrape runs per
+period:
+
+  * single-flight: a worker must hold an exclusive flock on tmp/refresh.lock to
+    scrape; the others skip that tick. The lock dies with its process, so a
+    crashed worker never wedges refreshes.
+  * once per period: under the lock, the worker re-checks when the pool cache
+    was last refreshed (tmp/refresh_state.json, or the cache file's mtime, so a
+    cron or manual scrape counts too) and skips if that is recent enough.
+
+The scrape itself runs as a child process (`scrape.py --require-sanity`), so it
+never blocks the event loop or holds the GIL against requests. With
+--require-sanity the scraper only publishes the new cache when
+sanity_check_current_day passes. Publishing is the atomic rename of
+tmp/good_list_cache.json, which every worker's SnapshotStore watcher picks up.
+
+Configured from the environment:
+  LANEDUCK_REFRESH_INTERVAL  seconds between refreshes (default 86400; 0 disables)
+  LANEDUCK_REFRESH_JITTER    up to this many extra seconds, random per tick (default 1800)
+"""
+import fcntl
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pool_store
+from atomic_io import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = "tmp/refresh.lock"
+STATE_FILE = "tmp/refresh_state.json"
+DEFAULT_INTERVAL = 24 * 3600
+DEFAULT_JITTER = 30 * 60
+SCRAPE_TIMEOUT = 2 * 3600
+SCRAPE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape.py")
+
+
+def _env_seconds(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"Ignoring non-numeric {name}={os.environ[name]!r}")
+        return float(default)
+
+
+def last_refresh(state_file=STATE_FILE, cache_file=pool_store.POOLS_CACHE_FILE):
+    """Epoch seconds of the last completed refresh: the scheduler's own stamp
+    or the cache file's mtime, whichever is newer; 0 if neither exists."""
+    stamps = [0.0]
+    try:
+        with open(state_file, "r") as f:
+            stamps.append(float(json.load(f)["completed_at"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    try:
+        stamps.append(os.stat(cache_file).st_mtime)
+    except OSError:
+        pass
+    return max(stamps)
+
+
+class RefreshScheduler:
+    """Run `command` every `interval` (+ up to `jitter`) seconds, single-flight
+    across processes sharing `lock_file`."""
+
+    def __init__(self, interval=None, jitter=None, command=None, lock_file=LOCK_FILE, state_file=STATE_FILE,
+                 cache_file=pool_store.POOLS_CACHE_FILE, timeout=SCRAPE_TIMEOUT):
+        self.interval = _env_seconds("LANEDUCK_REFRESH_INTERVAL", DEFAULT_INTERVAL) if interval is None else interval
+        self.jitter = _env_seconds("LANEDUCK_REFRESH_JITTER", DEFAULT_JITTER) if jitter is None else jitter
+        self.command = command or [sys.executable, SCRAPE_SCRIPT, "--require-sanity"]
+        self.lock_file = lock_file
+        self.state_file = state_file
+        self.cache_file = cache_file
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_delay(self, now=None):
+        """Seconds until this worker should next try: due time plus jitter,
+        where the jitter spreads workers (and servers) apart."""
+        now = time.time() if now is None else now
+        due = last_refresh(self.state_file, self.cache_file) + self.interval
+        return max(due - now, 0.0) + random.uniform(0, self.jitter)
+
+    def run_once(self):
+        """Scrape if this process wins the lock and a refresh is still due.
+        Returns the scrape's exit code, or None if skipped."""
+        os.makedirs(os.path.dirname(self.lock_file) or ".", exist_ok=True)
+        with open(self.lock_file, "a") as lock:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                logger.info("Refresh already running in another worker; skipping")
+                return None
+            try:
+                # Another worker may have finished a refresh while we slept.
+                if time.time() - last_refresh(self.state_file, self.cache_file) < self.interval * 0.5:
+                    return None
+                return self._scrape()
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _scrape(self):
+        import obs
+        started = time.time()
+        logger.warning(f"Scheduled refresh starting: {' '.join(self.command)}")
+        try:
+            code = subprocess.run(self.command, timeout=self.timeout).returncode
+        except subprocess.TimeoutExpired:
+            code = -1
+            logger.error(f"Scheduled refresh killed after {self.timeout}s")
+        except OSError as e:
+            code = -1
+            logger.error(f"Scheduled refresh could not start: {e}")
+        if code != 0:
+            obs.capture_message(f"Scheduled refresh failed (exit {code}); the previous cache keeps serving",
+                                level="error")
+        # Stamp the attempt either way: a failing scrape is retried next period,
+        # not in a tight loop across every worker.
+        write_json_atomic(self.state_file, {"started_at": started, "completed_at": time.time(), "exit_code": code})
+        return code
+
+    def _loop(self):
+        while not self._stop.wait(self.next_delay()):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Scheduled refresh errored: {e}")
+
+    def start(self):
+        """Start the scheduler thread (idempotent). No-op when the interval is 0."""
+        if self.interval <= 0:
+            logger.info("Refresh scheduler disabled (LANEDUCK_REFRESH_INTERVAL=0)")
+            return None
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
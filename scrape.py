@@ -1,14 +1,21 @@
 import argparse
-import requests
 import json
-import random
 import re
 import os
+import threading
 import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from tqdm.cli import tqdm
 import logging
 import os
 
+import http_client
+from atomic_io import write_json_atomic
+from raw_cache import RawCache
+from scrape_stats import REPORT_FILE, RunStats, append_report
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.WARNING)
 
@@ -22,29 +29,30 @@ if not os.path.exists('logs'):
 
 CACHE_FILE = "tmp/good_list_cache.json"
 
+# Upstream hosts. Point them at fixture_server.py (e.g.
+# LANEDUCK_ARCGIS_URL=http://127.0.0.1:8765) to scrape recorded data offline.
+ARCGIS_BASE_URL = os.environ.get("LANEDUCK_ARCGIS_URL", "https://services3.arcgis.com")
+TORONTO_BASE_URL = os.environ.get("LANEDUCK_TORONTO_URL", "https://www.toronto.ca")
+LOCATIONS_PATH = '/b9WvedVPoizGfvfD/arcgis/rest/services/V_Swim_Locations_2022/FeatureServer/0/query?f=json&where=Show_On_Map%20=%20%27Yes%27&returnGeometry=true&spatialRel=esriSpatialRelIntersects&outFields=*&outSR=102100&resultOffset=0&resultRecordCount=5000'
+
+
+def schedule_url(location_id, week_num):
+    return f"{TORONTO_BASE_URL}/data/parks/live/locations/{location_id}/swim/week{week_num}.json"
+
 def fetch_locations():
-    url = 'https://services3.arcgis.com/b9WvedVPoizGfvfD/arcgis/rest/services/V_Swim_Locations_2022/FeatureServer/0/query?f=json&where=Show_On_Map%20=%20%27Yes%27&returnGeometry=true&spatialRel=esriSpatialRelIntersects&outFields=*&outSR=102100&resultOffset=0&resultRecordCount=5000'
-    response = requests.get(url)
+    url = ARCGIS_BASE_URL + LOCATIONS_PATH
+    response = http_client.get(url)
     response.raise_for_status()
     return response.json()['features']
 
-def fetch_locations_with_retries(max_retries=3, backoff_factor=2):
-    retries = 0
-    delay = 1  # Initial delay in seconds
-
-    while retries < max_retries:
-        try:
-            return fetch_locations()  # Attempt to fetch locations
-        except Exception as e:
-            retries += 1
-            logger.info(f"Attempt {retries} failed: {e}")
-            if retries < max_retries:
-                logger.info(f"Retrying in {delay} seconds...")
-                time.sleep(delay)
-                delay *= backoff_factor  # Exponential backoff
-            else:
-                logger.warning("All retries failed.")
-                raise
+def fetch_locations_with_retries():
+    """Fetch the ArcGIS locations. Connection errors and 5xx/429 responses are
+    retried with backoff by the shared client (see http_client.py)."""
+    try:
+        return fetch_locations()
+    except Exception as e:
+        logger.warning(f"Fetching locations failed: {e}")
+        raise
 
 def process_locations(locations):
     # Return all locations - we'll filter based on actual schedule data later
@@ -65,54 +73,103 @@ def save_good_list_to_cache(good_list):
     with open(CACHE_FILE, 'w') as file:
         json.dump(good_list, file)
 
-def fetch_with_retries(url, max_retries=3, backoff_factor=2):
-    retries = 0
-    delay = 1  # Initial delay in seconds
-
-    while retries < max_retries:
-        try:
-            response = requests.get(url)
-            if response.status_code == 404:
-                logger.info(f"404 returned for URL {url}.")
-                return response
-            response.raise_for_status()
+def fetch_with_retries(url, headers=None):
+    """GET a URL through the shared client, which owns the timeout and the
+    retry/backoff policy (see http_client.py). A 404 is returned as-is (the
+    location simply has no such file); any other error status raises."""
+    try:
+        response = http_client.get(url, headers=headers)
+        if response.status_code == 404:
+            logger.info(f"404 returned for URL {url}.")
             return response
-        except Exception as e:
-            retries += 1
-            logger.info(f"Attempt {retries} failed for URL {url}: {e}")
-            if retries < max_retries:
-                logger.info(f"Retrying in {delay} seconds...")
-                time.sleep(delay)
-                delay *= backoff_factor
-            else:
-                logger.warning(f"All retries failed for URL {url}.")
-                raise
+        response.raise_for_status()
+        return response
+    except Exception as e:
+        logger.warning(f"All retries failed for URL {url}: {e}")
+        raise
 
 from datetime import datetime, timedelta
 
+from clock import now_toronto
 
-def now_toronto():
-    """Current date/time in Toronto. The pools and users are all in Toronto, so
-    the "current week" must be anchored to Toronto's calendar, not the server's
-    UTC clock — otherwise, when the server (UTC) crosses midnight into a new week
-    before Toronto does (e.g. Sunday ~8pm-midnight ET), the scraper drops the day
-    users still consider "today" and the site shows no pools for it.
 
-    Uses the stdlib zoneinfo (Python 3.9+), or the backports.zoneinfo shim on the
-    VM's Python 3.8. The tzdata pip package is pinned in requirements.txt so the
-    IANA database is guaranteed present regardless of the OS.
+# Map days of the week to integers (Monday=0, Sunday=6)
+DAYS_OF_WEEK = {
+    "monday": 0,
+    "tuesday": 1,
+    "wednesday": 2,
+    "thursday": 3,
+    "friday": 4,
+    "saturday": 5,
+    "sunday": 6
+}
 
-    Deliberately does NOT fall back to naive UTC on error: silently using the
-    wrong timezone reintroduces that exact bug with no signal. A missing tz
-    database therefore raises loudly (ZoneInfoNotFoundError) instead."""
-    try:
-        from zoneinfo import ZoneInfo          # Python 3.9+
-    except ImportError:                          # Python 3.8 (production VM)
-        from backports.zoneinfo import ZoneInfo  # provided by backports.zoneinfo
-    return datetime.now(ZoneInfo("America/Toronto"))
 
+@lru_cache(maxsize=None)
+def parse_clock_time(time_str):
+    """(hour, minute) for a schedule time like "1:00 PM", memoized: a city's
+    worth of sessions only uses a few dozen distinct times. Parsed exactly as
+    the date+time strptime used to, so the same inputs are accepted or raise
+    ValueError."""
+    parsed = datetime.strptime(f"1900-01-01 {time_str}", "%Y-%m-%d %I:%M %p")
+    return parsed.hour, parsed.minute
+
+
+@lru_cache(maxsize=None)
+def pool_length_from_title(swim_type_title):
+    """Extract pool length from swim type title. Toronto encodes it as a
+    parenthetical like "(50m)" or "(25m)" (and occasionally yards, e.g.
+    "(25y)"). Most plain "Lane Swim" titles carry no length -> "Unknown"."""
+    if swim_type_title:
+        length_match = re.search(r'\((\d+)\s*([my])\)', swim_type_title, re.IGNORECASE)
+        if length_match:
+            return f"{length_match.group(1)}{length_match.group(2).lower()}"
+    return "Unknown"
+
+
+class SessionConverter:
+    """Converts raw schedule sessions for one scrape run.
+
+    The week anchors (Monday of the current Toronto week, plus offsets) are
+    fixed once from a single clock reading, `now` (default now_toronto()).
+    Every session of the run is dated against the same weeks, even if the
+    clock ticks past midnight, or into a new week, mid-scrape."""
+
+    def __init__(self, now=None):
+        self.now = now if now is not None else now_toronto()
+        today = self.now.date()
+        self.monday = today - timedelta(days=today.weekday())  # Monday of the current week
+
+    def week_start(self, week_offset=0):
+        return self.monday + timedelta(weeks=week_offset)
+
+    def convert(self, obj, week_offset=0, swim_type_title=None):
+        # Determine the date for the given day
+        day_offset = DAYS_OF_WEEK.get(obj.get("day", "").lower(), 0)
+        day_date = (self.week_start(week_offset) + timedelta(days=day_offset)).isoformat()
+
+        # Extract start and end times from the "title" field
+        time_range = obj.get("title", "").split(" - ")
+        start_time_str = time_range[0] if len(time_range) > 0 else None
+        end_time_str = time_range[1] if len(time_range) > 1 else None
 
-def convert_to_new_format(obj, week_offset=0, swim_type_title=None):
+        start_time = end_time = None
+        if start_time_str:
+            start_time = "%sT%02d:%02d:00" % ((day_date,) + parse_clock_time(start_time_str))
+        if end_time_str:
+            end_time = "%sT%02d:%02d:00" % ((day_date,) + parse_clock_time(end_time_str))
+
+        # Return the reformatted dictionary
+        return {
+            "status": obj.get("status", "").lower(),
+            "start_time": start_time,
+            "end_time": end_time,
+            "id": int(obj.get("id", 0)),
+            "pool_length": pool_length_from_title(swim_type_title)
+        }
+
+
+def convert_to_new_format(obj, week_offset=0, swim_type_title=None, converter=None):
     """
     Converts the input dictionary into the specified format.
 
@@ -120,59 +177,15 @@ def convert_to_new_format(obj, week_offset=0, swim_type_title=None):
         obj (dict): Input dictionary with fields like id, day, title, status, etc.
         week_offset (int): 0 for current week, 1 for next week
         swim_type_title (str): The swim type title (e.g., "Lane Swim: Long Course (50m)")
+        converter (SessionConverter): the run's converter; without one the week
+            is anchored on now_toronto() at call time.
 
     Returns:
-        dict: Reformatted dictionary with datetime objects and structured fields.
+        dict: Reformatted dictionary with ISO start/end times and structured fields.
     """
-    # Map days of the week to integers (Monday=0, Sunday=6)
-    days_of_week = {
-        "monday": 0,
-        "tuesday": 1,
-        "wednesday": 2,
-        "thursday": 3,
-        "friday": 4,
-        "saturday": 5,
-        "sunday": 6
-    }
-
-    # Get the current date (Toronto time) and calculate the start of the week (Monday)
-    today = now_toronto()
-    start_of_week = today - timedelta(days=today.weekday())  # Monday of the current week
-
-    # Add week offset for next week data
-    start_of_week = start_of_week + timedelta(weeks=week_offset)
-
-    # Determine the date for the given day
-    day_name = obj.get("day", "").lower()
-    day_offset = days_of_week.get(day_name, 0)
-    day_date = start_of_week + timedelta(days=day_offset)
-
-    # Extract start and end times from the "title" field
-    time_range = obj.get("title", "").split(" - ")
-    start_time_str = time_range[0] if len(time_range) > 0 else None
-    end_time_str = time_range[1] if len(time_range) > 1 else None
-
-    # Combine the date and times into datetime objects
-    start_datetime = datetime.strptime(f"{day_date.date()} {start_time_str}", "%Y-%m-%d %I:%M %p") if start_time_str else None
-    end_datetime = datetime.strptime(f"{day_date.date()} {end_time_str}", "%Y-%m-%d %I:%M %p") if end_time_str else None
-
-    # Extract pool length from swim type title. Toronto encodes it as a
-    # parenthetical like "(50m)" or "(25m)" (and occasionally yards, e.g.
-    # "(25y)"). Most plain "Lane Swim" titles carry no length -> "Unknown".
-    pool_length = "Unknown"
-    if swim_type_title:
-        length_match = re.search(r'\((\d+)\s*([my])\)', swim_type_title, re.IGNORECASE)
-        if length_match:
-            pool_length = f"{length_match.group(1)}{length_match.group(2).lower()}"
-
-    # Return the reformatted dictionary
-    return {
-        "status": obj.get("status", "").lower(),
-        "start_time": start_datetime.strftime("%Y-%m-%dT%H:%M:%S") if start_datetime else None,
-        "end_time": end_datetime.strftime("%Y-%m-%dT%H:%M:%S") if end_datetime else None,
-        "id": int(obj.get("id", 0)),
-        "pool_length": pool_length
-    }
+    if converter is None:
+        converter = SessionConverter()
+    return converter.convert(obj, week_offset, swim_type_title)
 
 
 # Lane-swim titles that are demographic/age-restricted and intentionally NOT
@@ -190,7 +203,9 @@ def is_general_lane_swim(title: str) -> bool:
     lowered = title.lower()
     return not any(q in lowered for q in EXCLUDED_LANE_SWIM_QUALIFIERS)
 
-def process_swim_data(raw_swim_data: dict, week_offset=0) -> dict:
+def process_swim_data(raw_swim_data: dict, week_offset=0, converter=None) -> dict:
+    if converter is None:
+        converter = SessionConverter()
     swim_data_objs = [program["days"] for program in raw_swim_data['programs'] if program['program'] == 'Swim - Drop-In']
     if len(swim_data_objs) == 0:
         return []
@@ -202,66 +217,164 @@ def process_swim_data(raw_swim_data: dict, week_offset=0) -> dict:
         if is_general_lane_swim(swim_data_obj['title']) and swim_data_obj['status'] == 'active':
             filtered_sessions = [session for session in swim_data_obj['times'] if session['status'] == 'active']
             swim_type_title = swim_data_obj['title']
-            flattened_swim_sessions.extend([convert_to_new_format(session, week_offset, swim_type_title) for session in filtered_sessions])
+            flattened_swim_sessions.extend([converter.convert(session, week_offset, swim_type_title) for session in filtered_sessions])
     logger.info(f"Found {len(flattened_swim_sessions)} active lane swim sessions for week offset {week_offset}.")
     return flattened_swim_sessions
 
     
 
-def process_locations_with_data(locations, good_list_file):
-    updated_good_list = []
-
-    for location in tqdm(locations):
-        location_id = location['locationid']
-        logger.info(f"Processing location: {location_id}")
-
-        all_swim_data = []
-
-        # Fetch both current week and next week (reverting to simple assumption for now)
-        for week_num, week_offset in [(1, 0), (2, 1)]:
-            url = f"https://www.toronto.ca/data/parks/live/locations/{location_id}/swim/week{week_num}.json"
-
-            try:
-                response = fetch_with_retries(url)
-                # Decode the response explicitly as UTF-16
-                raw_response = response.content.decode('utf-16', errors='replace')
+# Concurrency for the per-location schedule fetches. Politeness to toronto.ca is
+# enforced by the shared rate limiter, not by the worker count: total scrape time
+# scales with the rate, while workers only hide per-request latency.
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 4.0  # requests per second, across all workers
+
+
+class RateLimiter:
+    """Token bucket shared by every fetch thread: at most `rate` requests per
+    second on average, with bursts of up to `burst`. acquire() reserves a token
+    under the lock and sleeps outside it, so waiting threads queue up in order
+    instead of spinning."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# Bump when parsing/conversion changes, so sessions cached by older code are
+# re-derived instead of reused (see raw_cache.py).
+SCHEDULE_PARSE_VERSION = 1
+
+
+def parse_week_file(content, location_id, week_num, week_offset, converter=None, stats=None):
+    """Decode a raw week{N}.json body into active lane swim sessions."""
+    if stats is None:
+        stats = RunStats()
+    # Decode the response explicitly as UTF-16
+    with stats.stage("decode_utf16"):
+        raw_response = content.decode('utf-16', errors='replace')
+
+    # Remove invalid characters at the start of the response
+    with stats.stage("clean_prefix"):
+        cleaned_response = re.sub(r'^[^\{]*', '', raw_response)
+
+    if cleaned_response == "":
+        logger.info(f"Empty response for location {location_id} week {week_num}.")
+        return []
 
-                # Remove invalid characters at the start of the response
-                cleaned_response = re.sub(r'^[^\{]*', '', raw_response)
+    # Parse the cleaned JSON and process the swim data for this week
+    with stats.stage("json_loads"):
+        data = json.loads(cleaned_response)
+    with stats.stage("process_swim_data"):
+        sessions = process_swim_data(data, week_offset, converter)
+    stats.count("week_files_parsed")
+    return sessions
 
-                if cleaned_response == "":
-                    logger.info(f"Empty response for location {location_id} week {week_num}.")
-                    continue
 
-                # Parse the cleaned JSON
-                data = json.loads(cleaned_response)
+def fetch_location_swim_data(location, limiter=None, cache=None, converter=None, stats=None):
+    """Fetch and parse both schedule weeks for one location. Returns the
+    location's active lane swim sessions (possibly empty); never raises.
 
-                # Process the swim data for this week
-                week_swim_data = process_swim_data(data, week_offset)
-                all_swim_data.extend(week_swim_data)
+    With a RawCache, each file is fetched conditionally, and when its body is
+    unchanged the sessions parsed from it last time are reused. Sessions carry
+    absolute dates, so they are only reused for the same week anchor."""
+    if converter is None:
+        converter = SessionConverter()
+    if stats is None:
+        stats = RunStats()
+    location_id = location['locationid']
+    logger.info(f"Processing location: {location_id}")
 
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSON decoding failed for location {location_id} week {week_num}: {e}")
-            except Exception as e:
-                logger.error(f"Failed to fetch data for location {location_id} week {week_num}: {e}")
+    all_swim_data = []
 
-            # Wait between requests
-            time.sleep(0.25 + random.uniform(0, 0.25))
+    # Fetch both current week and next week (reverting to simple assumption for now)
+    for week_num, week_offset in [(1, 0), (2, 1)]:
+        url = schedule_url(location_id, week_num)
 
-        # Only include locations that have actual lane swim data
+        try:
+            if limiter is not None:
+                stats.add_time("rate_limit_wait", limiter.acquire())
+            if cache is None:
+                response = fetch_with_retries(url)
+                all_swim_data.extend(parse_week_file(response.content, location_id, week_num, week_offset, converter, stats))
+                continue
+
+            fetched = cache.fetch(url, fetch_with_retries)
+            key = f"v{SCHEDULE_PARSE_VERSION}:{converter.week_start(week_offset).isoformat()}"
+            week_swim_data = cache.derived(fetched, key) if fetched.status in (200, 304) else None
+            if week_swim_data is None:
+                week_swim_data = parse_week_file(fetched.body, location_id, week_num, week_offset, converter, stats)
+                cache.store(fetched, key, week_swim_data)
+            all_swim_data.extend(week_swim_data)
+
+        except json.JSONDecodeError as e:
+            logger.warning(f"JSON decoding failed for location {location_id} week {week_num}: {e}")
+        except Exception as e:
+            logger.error(f"Failed to fetch data for location {location_id} week {week_num}: {e}")
+            stats.count("fetch_errors")
+
+    stats.count("sessions", len(all_swim_data))
+    return all_swim_data
+
+
+# --- Scrape pipeline -------------------------------------------------------
+# fetch -> decode -> parse (per location, in worker threads) -> filter -> tag
+# -> dedup -> enrich -> sinks. Each stage is a generator or a plain function over
+# the records, so the run holds at most a bounded window of in-flight fetches
+# plus the pools themselves, and the final list is handed to every sink in
+# memory instead of being written and read back.
+
+def fetch_stage(locations, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, cache=None, converter=None, stats=None):
+    """Yield (location, sessions) in input order. Fetch/decode/parse run on
+    `workers` threads sharing one `rate` requests/second budget, with at most
+    2 x workers locations in flight, so output order never depends on which
+    fetch finishes first. All sessions are dated by one SessionConverter."""
+    limiter = RateLimiter(rate)
+    if converter is None:
+        converter = SessionConverter()
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for location in locations:
+            pending.append((location, executor.submit(fetch_location_swim_data, location, limiter, cache, converter, stats)))
+            if len(pending) >= 2 * workers:
+                location, future = pending.popleft()
+                yield location, future.result()
+        while pending:
+            location, future = pending.popleft()
+            yield location, future.result()
+
+
+def filter_stage(fetched):
+    """Keep only locations that have actual lane swim data."""
+    for location, all_swim_data in fetched:
         if all_swim_data:
             location['swim_data'] = all_swim_data
-            updated_good_list.append(location)
+            yield location
         else:
-            logger.info(f"No lane swim data found for location {location_id}, skipping.")
+            logger.info(f"No lane swim data found for location {location['locationid']}, skipping.")
 
-        # Wait between locations
-        time.sleep(0.25 + random.uniform(0, 0.25))
 
-    # Save the updated good list to the file
-    with open(good_list_file, 'w', encoding='utf-8') as f:
-        json.dump(updated_good_list, f, ensure_ascii=False, indent=4)
-    logger.info(f"Updated good list saved to {good_list_file}")
+def tag_stage(pools):
+    """Tag each pool Indoor/Outdoor as it streams past (see tag_pool_type)."""
+    for pool in pools:
+        tag_pool_type([pool])
+        yield pool
+
 
 def tag_pool_type(pools):
     """Tag each pool as Indoor or Outdoor (case insensitive) instead of dropping
@@ -279,7 +392,7 @@ def tag_pool_type(pools):
         else:
             pool['pool_type'] = 'Indoor'
 
-    logger.info(f"Tagged {outdoor_count} outdoor and {len(pools) - outdoor_count} indoor pools.")
+    logger.debug(f"Tagged {outdoor_count} outdoor and {len(pools) - outdoor_count} indoor pools.")
     return pools
 
 def deduplicate_pools(pools):
@@ -367,56 +480,239 @@ def apply_pool_lengths(pool_data, lengths_file=POOL_LENGTHS_FILE):
     return pool_data
 
 
-def main():
-    logger.info("Fetching fresh data from Toronto API...")
+# Per-location records (ArcGIS attributes + pool_type + swim_data) from the last
+# run, before deduplication: the baseline an --incremental run diffs against.
+STATE_FILE = "tmp/locations_state.json"
+# Machine-readable list of what the last run added, removed or changed.
+CHANGELOG_FILE = "tmp/changelog.json"
 
-    # Always fetch fresh location data
-    locations = fetch_locations_with_retries()
-    location_list = process_locations(locations)
 
-    # Tag pools as Indoor/Outdoor (previously outdoor pools were dropped here)
-    location_list = tag_pool_type(location_list)
+def load_json_file(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def merge_incremental(previous_records, fetched_records):
+    """Reuse the previous run's record for every location whose ArcGIS
+    attributes and sessions are unchanged; only changed or new locations are
+    re-tagged. `fetched_records` may be any iterable (e.g. the filter stage).
+    Returns (records in fetched order, number rebuilt).
+
+    This is all an --incremental run saves per location: every schedule is
+    still fetched (cheaply, through the raw cache's conditional requests), and
+    dedup, pool lengths and the sinks still run over the full list, since each
+    of their outputs is a snapshot of every pool. What the run skips besides
+    re-tagging is publishing when nothing changed: then only the CLOCK_SINKS
+    run (see _publish)."""
+    previous = {r['locationid']: r for r in previous_records}
+    merged = []
+    rebuilt = 0
+    for record in fetched_records:
+        old = previous.get(record['locationid'])
+        if old is not None and {k: v for k, v in old.items() if k != 'pool_type'} == record:
+            merged.append(old)
+        else:
+            merged.extend(tag_pool_type([record]))
+            rebuilt += 1
+    return merged, rebuilt
+
+
+def _session_key(session):
+    return (session.get('start_time'), session.get('end_time'), session.get('pool_length'))
+
+
+def diff_pools(old_pools, new_pools):
+    """Changelog between two final caches, keyed by locationid: pools added
+    and removed, and per changed pool the attributes that differ plus the
+    sessions added/removed (compared by start, end and length)."""
+    old = {p['locationid']: p for p in old_pools}
+    new = {p['locationid']: p for p in new_pools}
+    brief = lambda p: {'locationid': p['locationid'], 'complexname': p.get('complexname', '')}
+
+    changed = []
+    for locationid, pool in new.items():
+        before = old.get(locationid)
+        if before is None or before == pool:
+            continue
+        fields = sorted(k for k in set(before) | set(pool)
+                        if k != 'swim_data' and before.get(k) != pool.get(k))
+        old_sessions = Counter(_session_key(s) for s in before.get('swim_data', []))
+        new_sessions = Counter(_session_key(s) for s in pool.get('swim_data', []))
+        added = [list(k) for k in (new_sessions - old_sessions).elements()]
+        removed = [list(k) for k in (old_sessions - new_sessions).elements()]
+        changed.append(dict(brief(pool), fields=fields, sessions_added=added, sessions_removed=removed))
 
-    # Process all locations with detailed data and filter by actual schedule content
-    process_locations_with_data(location_list, CACHE_FILE)
+    return {
+        'added': [brief(p) for lid, p in new.items() if lid not in old],
+        'removed': [brief(p) for lid, p in old.items() if lid not in new],
+        'changed': changed,
+    }
 
-    # Load the data back and apply deduplication
-    with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-        pool_data = json.load(f)
 
-    # Deduplicate pools by name while preserving all swim times
-    pool_data = deduplicate_pools(pool_data)
+def build_pool_data(locations, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, previous_state=None, now=None, cache=None,
+                    stats=None):
+    """Run the pipeline up to the final pool list. `now` is the run's clock
+    (default now_toronto()), read once to anchor every session's week. With
+    `previous_state` (the records of the last run) only changed locations are
+    re-tagged; everything after that still covers every location. `cache` defaults to the on-disk RawCache under tmp/; `stats`
+    collects stage timings (see scrape_stats.py). Returns (pool_data, records
+    before dedup, locations rebuilt)."""
+    if cache is None:
+        cache = RawCache()
+    if stats is None:
+        stats = RunStats()
+    converter = SessionConverter(now)
+    with stats.stage("fetch_pipeline"):
+        fetched = filter_stage(tqdm(fetch_stage(locations, workers, rate, cache, converter, stats), total=len(locations)))
+        if previous_state is None:
+            # Tag pools as Indoor/Outdoor (previously outdoor pools were dropped here)
+            records = list(tag_stage(fetched))
+            rebuilt = len(records)
+        else:
+            records, rebuilt = merge_incremental(previous_state, fetched)
+    logger.info(f"Schedule cache: {cache.summary()}")
+    stats.count("schedule_cache_hits", cache.hits)
+    stats.count("schedule_cache_not_modified", cache.not_modified)
+    stats.count("schedule_cache_misses", cache.misses)
+    stats.count("locations", len(locations))
+    stats.count("locations_with_sessions", len(records))
+    stats.count("locations_rebuilt", rebuilt)
+
+    # Deduplicate pools by name while preserving all swim times. Dedup merges
+    # sessions into the first record, so it works on copies and `records`
+    # stays the per-location baseline for the next --incremental run.
+    with stats.stage("dedup"):
+        pool_data = deduplicate_pools([dict(r, swim_data=list(r['swim_data'])) for r in records])
 
     # Tag each pool with a stable length identifier (curated + title-derived)
-    pool_data = apply_pool_lengths(pool_data)
+    with stats.stage("pool_lengths"):
+        pool_data = apply_pool_lengths(pool_data)
+    return pool_data, records, rebuilt
 
-    # Save the cleaned data back to the file
-    with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(pool_data, f, ensure_ascii=False, indent=4)
 
+def cache_sink(pool_data):
+    """Publish the final cache: written once, atomically."""
+    write_json_atomic(CACHE_FILE, pool_data, indent=4)
     logger.info(f"Data cleanup completed. Final pool count: {len(pool_data)}")
 
-    # Regenerate the static, crawlable pool-schedule page for SEO (see prerender.py).
-    # Non-fatal: a prerender failure must not fail the scrape.
+
+def compact_sink(pool_data):
+    """Also publish the compact binary snapshot the API can mmap (see
+    compact_cache.py). Non-fatal: the JSON cache is the source of truth."""
     try:
-        import prerender
-        prerender.build()
-        prerender.stamp_sitemap()  # keep sitemap lastmod fresh for SEO
+        import compact_cache
+        compact_cache.write(pool_data)
     except Exception as e:
-        logger.error(f"Prerender failed (non-fatal): {e}")
+        logger.error(f"Compact snapshot failed (non-fatal): {e}")
 
-    # Refresh Toronto beach water-quality advisories (see beaches.py).
-    # Non-fatal: a beaches failure must not fail the pool scrape.
+
+def archive_sink(pool_data):
+    """Append the published cache to the SQLite history archive (see
+    archive.py). Non-fatal: history is a side record, not what the API serves
+    now."""
+    try:
+        import archive
+        archive.ingest(pool_data, taken_at=now_toronto().replace(tzinfo=None))
+    except Exception as e:
+        logger.error(f"Archive ingest failed (non-fatal): {e}")
+
+
+def availability_sink(pool_data):
+    """Precompute the hour-of-week availability aggregates /stats/availability
+    serves (see availability.py). Non-fatal."""
+    try:
+        import availability
+        availability.write(pool_data, generated_at=now_toronto().replace(tzinfo=None))
+    except Exception as e:
+        logger.error(f"Availability stats failed (non-fatal): {e}")
+
+
+def prerender_sink(pool_data):
+    """Regenerate the static, crawlable pool-schedule pages for SEO, and the
+    sitemap, from the in-memory pools (see prerender.py; only pages whose
+    content changed are rewritten). Non-fatal: a prerender failure must not
+    fail the scrape."""
     try:
-        import beaches
-        beaches.build()
         import prerender
-        prerender.build_beaches()  # static crawlable snapshot into beaches.html
+        prerender.build(pools=pool_data)
     except Exception as e:
-        logger.error(f"Beaches refresh failed (non-fatal): {e}")
+        logger.error(f"Prerender failed (non-fatal): {e}")
 
-    # Log completion timestamp
-    log_scrape_completion()
+
+DEFAULT_SINKS = (cache_sink, compact_sink, availability_sink, archive_sink, prerender_sink)
+# Sinks whose output depends on the clock as well as the pools (the prerender
+# drops sessions that have ended): they run even when an incremental run found
+# nothing to publish.
+CLOCK_SINKS = (prerender_sink,)
+
+
+# Runs slower than this (seconds) raise an alert; SCRAPE_TIME_BUDGET overrides.
+DEFAULT_TIME_BUDGET = 600
+PROFILE_FILE = "logs/scrape_profile.prof"
+
+
+def main(workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, incremental=False, sinks=DEFAULT_SINKS, budget=None,
+         report_file=REPORT_FILE, require_sanity=False):
+    logger.info("Fetching fresh data from Toronto API...")
+
+    # One clock reading for the whole run: every session is dated against the
+    # week this run started in
+    run_started = now_toronto()
+
+    # Stage timings and counters for the run report (see scrape_stats.py)
+    stats = RunStats()
+    http_client.add_listener(stats.on_response)
+    try:
+        ok, mode = _run(stats, run_started, workers, rate, incremental, sinks, require_sanity)
+    finally:
+        http_client.remove_listener(stats.on_response)
+
+    if budget is None:
+        budget = float(os.environ.get("SCRAPE_TIME_BUDGET", DEFAULT_TIME_BUDGET))
+    report = stats.report(mode=mode, workers=workers, rate=rate, budget_seconds=budget,
+                          over_budget=stats.wall_seconds > budget, sanity_ok=ok)
+    try:
+        append_report(report, report_file)
+    except OSError as e:
+        logger.error(f"Could not write the run report (non-fatal): {e}")
+    summary = f"Scrape took {report['wall_seconds']:.1f}s ({stats.summary()}) -> {report_file}"
+    if not report["over_budget"]:
+        logger.info(summary)
+    else:
+        logger.warning(summary)
+        import obs
+        obs.capture_message(
+            f"Scrape took {report['wall_seconds']:.0f}s, over its {budget:.0f}s budget ({stats.summary()})",
+            level="warning",
+        )
+    return ok
+
+
+def _run(stats, run_started, workers, rate, incremental, sinks, require_sanity=False):
+    """The body of main(); returns (sanity ok, "full" / "incremental").
+
+    With require_sanity, nothing is published (state, changelog, sinks) unless
+    the new data passes sanity_check_current_day, so the API keeps serving the
+    previous cache instead of a broken one."""
+    # The cache as the API serves it now, for the changelog
+    with stats.stage("load_previous"):
+        previous_pools = load_good_list_from_cache() or []
+
+    # Always fetch fresh location data
+    with stats.stage("locations"):
+        locations = fetch_locations_with_retries()
+        location_list = process_locations(locations)
+
+    previous_state = load_json_file(STATE_FILE) if incremental else None
+    if incremental and previous_state is None:
+        logger.warning(f"No usable {STATE_FILE} from a previous run; doing a full rebuild.")
+
+    pool_data, records, rebuilt = build_pool_data(location_list, workers, rate, previous_state, now=run_started,
+                                                  stats=stats)
+    stats.count("pools", len(pool_data))
 
     # Content sanity check: the cache must cover today (Toronto). Catches the
     # wrong-week bug that a plain heartbeat would miss (scrape "succeeds" but
@@ -426,15 +722,93 @@ def main():
         logger.info(f"Sanity check passed: {msg}")
     else:
         logger.error(f"Sanity check FAILED: {msg}")
-    return ok
+
+    if require_sanity and not ok:
+        logger.error("Not publishing: --require-sanity is set; the previous cache stays live.")
+    else:
+        _publish(stats, run_started, pool_data, records, rebuilt, previous_pools, previous_state, sinks)
+
+    # Refresh Toronto beach water-quality advisories (see beaches.py).
+    # Non-fatal: a beaches failure must not fail the pool scrape.
+    with stats.stage("beaches"):
+        try:
+            import beaches
+            beach_data = beaches.build()
+            import prerender
+            prerender.build_beaches(beaches=beach_data)  # static crawlable snapshot into beaches.html
+        except Exception as e:
+            logger.error(f"Beaches refresh failed (non-fatal): {e}")
+
+    # Log completion timestamp
+    log_scrape_completion()
+    return ok, 'incremental' if previous_state is not None else 'full'
+
+
+def _publish(stats, run_started, pool_data, records, rebuilt, previous_pools, previous_state, sinks):
+    """Write the incremental baseline and changelog, then run the sinks."""
+    with stats.stage("state_and_changelog"):
+        # Baseline for the next --incremental run
+        write_json_atomic(STATE_FILE, records)
+
+        changelog = diff_pools(previous_pools, pool_data)
+        unchanged = not (changelog['added'] or changelog['removed'] or changelog['changed'])
+        write_json_atomic(CHANGELOG_FILE, dict(
+            generated_at=run_started.isoformat(timespec='seconds'),
+            mode='incremental' if previous_state is not None else 'full',
+            locations_rebuilt=rebuilt,
+            **changelog,
+        ), indent=2)
+    logger.info(f"Changelog: {len(changelog['added'])} added, {len(changelog['removed'])} removed, "
+                f"{len(changelog['changed'])} changed pools ({rebuilt} locations rebuilt) -> {CHANGELOG_FILE}")
+
+    # The sinks always get the full pool list, not the changelog's changed
+    # locations: each writes a whole snapshot (prerender then only rewrites the
+    # pages whose content changed).
+    if previous_state is not None and unchanged:
+        # Nothing to publish: leave the cache (and what the API serves) as-is,
+        # but still re-render what goes stale with the clock.
+        logger.info("Incremental scrape found no changes; cache left as-is.")
+        sinks = [sink for sink in sinks if sink in CLOCK_SINKS]
+    for sink in sinks:
+        with stats.stage(sink.__name__):
+            sink(pool_data)
 
 if __name__ == "__main__":
     import sys
     import obs
+    parser = argparse.ArgumentParser(description="Scrape Toronto lane swim schedules into the API cache.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent schedule fetches (default {DEFAULT_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"max requests/second to toronto.ca across all workers (default {DEFAULT_RATE})")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-tag locations whose data changed since the last run and "
+                             "only re-render the clock-dependent pages when nothing changed")
+    parser.add_argument("--budget", type=float, default=None,
+                        help=f"alert when the run takes longer than this many seconds "
+                             f"(default $SCRAPE_TIME_BUDGET or {DEFAULT_TIME_BUDGET})")
+    parser.add_argument("--profile", nargs="?", const=PROFILE_FILE, default=None, metavar="PATH",
+                        help=f"write a cProfile dump of the run (default {PROFILE_FILE}); "
+                             f"inspect with python -m pstats")
+    parser.add_argument("--require-sanity", action="store_true",
+                        help="only publish the new cache if it covers today (Toronto); "
+                             "used by the API's refresh scheduler")
+    args = parser.parse_args()
     obs.load_dotenv()
     obs.init_sentry(environment="production")
+    run = lambda: main(workers=args.workers, rate=args.rate, incremental=args.incremental, budget=args.budget,
+                     require_sanity=args.require_sanity)
     try:
-        scrape_ok = main()
+        if args.profile:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                scrape_ok = profiler.runcall(run)
+            finally:
+                profiler.dump_stats(args.profile)
+                logger.info(f"Profile written to {args.profile}")
+        else:
+            scrape_ok = run()
     except Exception as e:
         obs.capture_exception(e)
         obs.ping_healthchecks(success=False)
@@ -0,0 +1,93 @@
+"""Per-stage timers and counters for one scrape run, and the run report.
+
+A RunStats is threaded through the scrape pipeline next to the converter and
+the raw cache. Stages are timed where they happen — network round trips (from
+the shared HTTP client's listener), rate-limit sleeps, UTF-16 decoding, the
+junk-prefix regex, json.loads, process_swim_data in the fetch threads, then
+dedup, the sinks and beaches in the main thread. Times measured in the worker
+threads add up across threads ("thread-seconds"), so with N workers they can
+exceed the run's wall time; `wall_seconds` is the real elapsed time.
+
+At the end of a run the report is appended as one JSON line to
+logs/scrape_report.jsonl, next to logs/scrape_timestamp.log.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_FILE = "logs/scrape_report.jsonl"
+
+
+class RunStats:
+    """Thread-safe stage timers (seconds, calls) and counters."""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.monotonic()
+        self.stages = {}
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds, calls=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, [0.0, 0])
+            stage[0] += seconds
+            stage[1] += calls
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def on_response(self, url, response, elapsed):
+        """http_client listener: network time, bytes, statuses and retries."""
+        retries = getattr(getattr(response.raw, "retries", None), "history", ()) or ()
+        with self._lock:
+            stage = self.stages.setdefault("network", [0.0, 0])
+            stage[0] += elapsed
+            stage[1] += 1
+            self.counters["requests"] += 1
+            self.counters["bytes_fetched"] += len(response.content)
+            self.counters[f"http_{response.status_code}"] += 1
+            self.counters["retries"] += len(retries)
+
+    @property
+    def wall_seconds(self):
+        return time.monotonic() - self._started
+
+    def report(self, **extra):
+        """The run report as a dict; `extra` (mode, workers, ...) is merged in."""
+        with self._lock:
+            stages = {name: {"seconds": round(seconds, 4), "calls": calls}
+                      for name, (seconds, calls) in sorted(self.stages.items(), key=lambda kv: -kv[1][0])}
+            counters = dict(sorted(self.counters.items()))
+        return dict(
+            started_at=self.started_at.isoformat(timespec="seconds"),
+            finished_at=datetime.now().isoformat(timespec="seconds"),
+            wall_seconds=round(self.wall_seconds, 3),
+            **extra,
+            stages=stages,
+            counters=counters,
+        )
+
+    def summary(self, top=6):
+        """One line with the slowest stages, for the scrape's console output."""
+        with self._lock:
+            slowest = sorted(self.stages.items(), key=lambda kv: -kv[1][0])[:top]
+        return ", ".join(f"{name} {seconds:.2f}s" for name, (seconds, _) in slowest)
+
+
+def append_report(report, path=REPORT_FILE):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report, ensure_ascii=False) + "\n")
+    return path
@@ -0,0 +1,118 @@
+"""Interval index over a snapshot's swim sessions, for /pools window queries.
+
+The API answers two different questions about a [start_date, end_date] window,
+and they deliberately use different comparisons:
+
+  * pool selection (`contained`): does the pool have a session that lies
+    entirely inside the window — start >= start_date and end <= end_date?
+  * time listing (`overlapping`): which of a pool's sessions touch the window —
+    end >= start_date and start <= end_date (so an in-progress session shows)?
+
+Either bound may be None. `next_session` answers a third one for /pools/next:
+the earliest session of a pool that is in progress or still to come at a given
+time.
+
+Instead of scanning every session of every pool, the
+index keeps start-sorted arrays (one global, one per pool) and answers both with
+bisect, touching only the candidate sessions: O(log n + k).
+"""
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+
+class SessionIndex:
+    """Build from `sessions`, a list (one entry per pool) of (start, end, item)
+    tuples in stored order. `item` is returned as-is by `overlapping`."""
+
+    def __init__(self, sessions):
+        self.pool_count = len(sessions)
+
+        # Global table sorted by start: the candidates for "starts in window".
+        rows = sorted(
+            (start, end, i)
+            for i, pool_sessions in enumerate(sessions)
+            for start, end, _ in pool_sessions
+        )
+        self.starts = [r[0] for r in rows]
+        self.ends = [r[1] for r in rows]
+        self.pool_of = [r[2] for r in rows]
+
+        # A session "contained" in the window starts at/before end_date unless it
+        # ends before it starts (a mis-entered overnight title); widen the scan
+        # by the largest such overrun so those are still found.
+        self.max_overrun = max((start - end for start, end, _ in rows), default=timedelta(0))
+        self.max_overrun = max(self.max_overrun, timedelta(0))
+
+        # Per pool, sorted by start; positions restore the stored order.
+        self.pool_starts = []
+        self.pool_rows = []
+        self.pool_max_duration = []
+        # One-sided selections only depend on each pool's extreme session.
+        by_max_start = []
+        by_min_end = []
+        for i, pool_sessions in enumerate(sessions):
+            ordered = sorted(
+                ((start, pos, end, item) for pos, (start, end, item) in enumerate(pool_sessions)),
+                key=lambda r: (r[0], r[1]),
+            )
+            self.pool_starts.append([r[0] for r in ordered])
+            self.pool_rows.append(ordered)
+            self.pool_max_duration.append(max((max(end - start, timedelta(0)) for start, _, end, _ in ordered), default=timedelta(0)))
+            if ordered:
+                by_max_start.append((max(r[0] for r in ordered), i))
+                by_min_end.append((min(r[2] for r in ordered), i))
+        by_max_start.sort()
+        by_min_end.sort()
+        self._max_starts = [r[0] for r in by_max_start]
+        self._max_start_pools = [r[1] for r in by_max_start]
+        self._min_ends = [r[0] for r in by_min_end]
+        self._min_end_pools = [r[1] for r in by_min_end]
+
+    def contained(self, start_date=None, end_date=None):
+        """Sorted indices of pools with a session inside the window."""
+        if start_date is None and end_date is None:
+            return sorted(self._max_start_pools)
+        if end_date is None:
+            lo = bisect_left(self._max_starts, start_date)
+            return sorted(self._max_start_pools[lo:])
+        if start_date is None:
+            hi = bisect_right(self._min_ends, end_date)
+            return sorted(self._min_end_pools[:hi])
+
+        lo = bisect_left(self.starts, start_date)
+        hi = bisect_right(self.starts, end_date + self.max_overrun)
+        ends, pool_of = self.ends, self.pool_of
+        return sorted({pool_of[j] for j in range(lo, hi) if ends[j] <= end_date})
+
+    def overlapping(self, i, start_date=None, end_date=None):
+        """Items of pool i whose session overlaps the window, in stored order."""
+        starts = self.pool_starts[i]
+        rows = self.pool_rows[i]
+        lo = 0 if start_date is None else bisect_left(starts, start_date - self.pool_max_duration[i])
+        hi = len(starts) if end_date is None else bisect_right(starts, end_date)
+        hits = [
+            (pos, item)
+            for _, pos, end, item in rows[lo:hi]
+            if start_date is None or end >= start_date
+        ]
+        hits.sort(key=lambda h: h[0])
+        return [item for _, item in hits]
+
+    def overlapping_positions(self, i, start_date=None, end_date=None):
+        """Like overlapping, but the sessions' positions in pool i's list."""
+        starts = self.pool_starts[i]
+        rows = self.pool_rows[i]
+        lo = 0 if start_date is None else bisect_left(starts, start_date - self.pool_max_duration[i])
+        hi = len(starts) if end_date is None else bisect_right(starts, end_date)
+        return sorted(pos for _, pos, end, _ in rows[lo:hi] if start_date is None or end >= start_date)
+
+    def next_session(self, i, at):
+        """(start, end, item) of pool i's earliest session that is in progress
+        (start <= at < end) or has not started yet (start >= at), or None."""
+        starts = self.pool_starts[i]
+        rows = self.pool_rows[i]
+        # Nothing starting more than the pool's longest session ago can still run.
+        for start, _, end, item in rows[bisect_left(starts, at - self.pool_max_duration[i]):]:
+            if end > at or start >= at:
+                return start, end, item
+        return None
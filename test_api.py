@@ -0,0 +1,172 @@
+"""API-level checks of the /pools routes against a fixed cache and clock."""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import compact_cache
+import get_pools
+import pool_store
+from response_cache import ResponseCache
+
+
+def session(start, end):
+    return {"start_time": f"2026-07-08T{start}:00", "end_time": f"2026-07-08T{end}:00", "pool_length": "25m"}
+
+
+# Wednesday 2026-07-08 at noon, from downtown (43.65, -79.38).
+NOON = "2026-07-08T12:00:00"
+HERE = {"lat": 43.65, "lng": -79.38}
+POOLS = [
+    {"locationid": 1, "complexname": "Starts Now Pool", "x": -79.38, "y": 43.65,
+     "swim_data": [session("12:00", "13:00")]},
+    {"locationid": 2, "complexname": "Uptown Pool", "x": -79.40, "y": 43.70,
+     "swim_data": [session("11:00", "12:00"), session("12:30", "13:30")]},
+    {"locationid": 3, "complexname": "Next Door Pool", "x": -79.381, "y": 43.651,
+     "swim_data": [session("13:00", "14:00")]},
+    {"locationid": 4, "complexname": "Unmapped Pool",
+     "swim_data": [session("12:10", "13:00")]},
+]
+
+
+class ApiTestCase(unittest.TestCase):
+    """Serves `pools` from a temporary JSON cache, with no shared compact
+    snapshot unless a test writes one to self.compact_path."""
+
+    pools = POOLS
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.cache_path = os.path.join(self.dir.name, "good_list_cache.json")
+        self.compact_path = os.path.join(self.dir.name, "good_list_cache.bin")
+        with open(self.cache_path, "w") as f:
+            json.dump(self.pools, f)
+        for target, name, value in (
+                (pool_store, "pools_store", pool_store.SnapshotStore(self.cache_path, pool_store.PoolSnapshot)),
+                (compact_cache, "compact_store", compact_cache.CompactStore(self.compact_path, check_interval=0)),
+                (get_pools, "response_cache", ResponseCache())):
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(get_pools.app)
+
+    def get(self, path, **params):
+        response = self.client.get(path, params=params)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+
+class NextSwimsTest(ApiTestCase):
+    def names(self, rows):
+        return [row["pool_name"] for row in rows]
+
+    def test_rank_by_time(self):
+        rows = self.get("/pools/next", time=NOON)
+        self.assertEqual(self.names(rows), ["Starts Now Pool", "Unmapped Pool", "Uptown Pool", "Next Door Pool"])
+        self.assertEqual(self.names(self.get("/pools/next", time=NOON, limit=2)), ["Starts Now Pool", "Unmapped Pool"])
+
+    def test_session_edges(self):
+        rows = {row["pool_name"]: row for row in self.get("/pools/next", time=NOON)}
+        # Starting exactly now counts as in progress.
+        self.assertEqual((rows["Starts Now Pool"]["in_progress"], rows["Starts Now Pool"]["minutes_until_start"]), (True, 0))
+        # Ending exactly now is over: Uptown's next is the 12:30 session.
+        uptown = rows["Uptown Pool"]
+        self.assertEqual((uptown["in_progress"], uptown["minutes_until_start"]), (False, 30))
+        self.assertEqual(uptown["times"], [session("12:30", "13:30")])
+        self.assertNotIn("distance_km", uptown)
+
+    def test_rank_by_score_and_radius(self):
+        # Uptown waits 30 min plus ~6 km; Next Door waits 60 min next door;
+        # Unmapped has no distance and goes last.
+        rows = self.get("/pools/next", time=NOON, rank="score", **HERE)
+        self.assertEqual(self.names(rows), ["Starts Now Pool", "Uptown Pool", "Next Door Pool", "Unmapped Pool"])
+        self.assertIsNone(rows[-1]["distance_km"])
+        self.assertAlmostEqual(rows[1]["distance_km"], 5.8, delta=0.2)
+        near = self.get("/pools/next", time=NOON, radius_km=1, **HERE)
+        self.assertEqual(self.names(near), ["Starts Now Pool", "Next Door Pool"])
+
+    def test_defaults_to_toronto_now(self):
+        with patch("clock.now_toronto", return_value=datetime(2026, 7, 8, 13, 15)):
+            rows = self.get("/pools/next")
+        self.assertEqual(self.names(rows), ["Uptown Pool", "Next Door Pool"])
+        self.assertEqual([row["in_progress"] for row in rows], [True, True])
+
+    def test_bad_combinations(self):
+        for params in ({"rank": "score"}, {"radius_km": 2}, {"lat": 43.65}):
+            self.assertEqual(self.client.get("/pools/next", params=params).status_code, 400, params)
+
+    def test_bad_time(self):
+        for value in ("garbage", "2026-07-08", "2026-13-08T12:00:00"):
+            response = self.client.get("/pools/next", params={"time": value})
+            self.assertEqual(response.status_code, 400, value)
+            self.assertIn("YYYY-MM-DDTHH:MM:SS", response.json()["detail"])
+
+
+class PoolTest(ApiTestCase):
+    def test_one_pool(self):
+        self.assertEqual(self.get("/pools/3")["complexname"], "Next Door Pool")
+        row = self.get("/pools/2", simple="true", start_date="2026-07-08T12:30:00", end_date="2026-07-08T23:59:59")
+        self.assertEqual(row["times"], [session("12:30", "13:30")])
+        self.assertEqual(self.client.get("/pools/99").status_code, 404)
+
+    def test_bad_dates(self):
+        for params in ({"start_date": "bad"}, {"end_date": "2026-07-08"}, {"simple": "true", "start_date": "bad"}):
+            response = self.client.get("/pools/2", params=params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("YYYY-MM-DDTHH:MM:SS", response.json()["detail"])
+
+
+class NearbyPoolsTest(ApiTestCase):
+    def test_nearby_positions_share_a_cache_entry(self):
+        first = self.get("/pools", simple="true", lat=43.65012, lng=-79.38034, radius_km=1.00004)
+        second = self.get("/pools", simple="true", lat=43.64996, lng=-79.37971, radius_km=1.0)
+        self.assertEqual(first, second)
+        self.assertEqual([row["pool_name"] for row in first], ["Starts Now Pool", "Next Door Pool"])
+        self.assertEqual((get_pools.response_cache.misses, get_pools.response_cache.hits), (1, 1))
+
+class NdjsonTest(ApiTestCase):
+    def ndjson(self, **params):
+        response = self.client.get("/pools", params=dict(params, format="ndjson"))
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        self.assertTrue(response.text.endswith("\n"))
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_one_pool_per_line_like_pools(self):
+        window = {"start_date": "2026-07-08T12:05:00", "end_date": "2026-07-08T23:59:59"}
+        for params in ({}, window, dict(window, simple="true"), dict(window, simple="true", **HERE)):
+            rows = self.ndjson(**params)
+            self.assertTrue(rows)
+            self.assertEqual(rows, self.get("/pools", **params), params)
+
+    def test_fields_projection(self):
+        rows = self.ndjson(simple="true", fields="pool_name,distance_km,missing", **HERE)
+        self.assertEqual(rows[0], {"pool_name": "Starts Now Pool", "distance_km": 0.0})
+        self.assertTrue(all(list(row) == ["pool_name", "distance_km"] for row in rows))
+        self.assertEqual(rows, self.get("/pools", simple="true", fields="pool_name,distance_km,missing", **HERE))
+
+class SharedSnapshotTest(ApiTestCase):
+    def test_simple_views_do_not_load_the_json_snapshot(self):
+        compact_cache.write(self.pools, self.compact_path)
+        window = {"start_date": "2026-07-08T00:00:00", "end_date": "2026-07-08T23:59:59"}
+        simple = self.get("/pools", simple="true", **window)
+        compact = self.get("/pools", format="compact", **window)
+        self.assertIsNone(pool_store.pools_store.peek())
+        self.assertEqual(pool_store.expand_compact_view(compact), simple)
+
+        full = self.get("/pools", **window)
+        self.assertIsNotNone(pool_store.pools_store.peek())
+        self.assertEqual([pool["locationid"] for pool in full], [1, 2, 3, 4])
+        # Same bodies from the JSON snapshot, once it is loaded anyway.
+        with patch.object(get_pools, "response_cache", ResponseCache()), \
+                patch.object(compact_cache.compact_store, "current", return_value=None):
+            self.assertEqual(self.get("/pools", simple="true", **window), simple)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,66 @@
+"""Each published cache is appended to the SQLite archive; sessions that vanish
+while still inside the next snapshot's window are recorded as removals."""
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import archive
+
+
+def pool(locationid, *sessions, name=None):
+    return {"locationid": locationid, "complexname": name or f"Pool {locationid}", "address": " 1 Main St ",
+            "x": -79.4, "y": 43.65, "pool_type": "Indoor",
+            "swim_data": [{"start_time": start, "end_time": end, "pool_length": "25m"} for start, end in sessions]}
+
+
+MON = ("2026-07-06T07:00:00", "2026-07-06T08:00:00")
+TUE = ("2026-07-07T07:00:00", "2026-07-07T08:00:00")
+WED = ("2026-07-08T07:00:00", "2026-07-08T08:00:00")
+THU = ("2026-07-09T07:00:00", "2026-07-09T08:00:00")
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "archive.sqlite3")
+
+    def ingest(self, day, *pools):
+        return archive.ingest(list(pools), taken_at=datetime(2026, 7, day, 6), path=self.path)
+
+    def test_removals_and_history(self):
+        self.ingest(6, pool(1, MON, TUE, WED), pool(2, TUE, THU))
+        # Tuesday: Monday fell into the past (outside the window, not a removal),
+        # pool 1 cancelled Wednesday, pool 2 closed.
+        self.ingest(7, pool(1, TUE, THU))
+
+        conn = archive.connect(self.path, readonly=True)
+        self.addCleanup(conn.close)
+        removed = archive.removed_sessions(conn)
+        self.assertEqual([(r["locationid"], r["start_time"], r["removed_at"]) for r in removed],
+                         [(2, TUE[0], "2026-07-07T06:00:00"), (1, WED[0], "2026-07-07T06:00:00"),
+                          (2, THU[0], "2026-07-07T06:00:00")])
+        self.assertEqual(removed[0]["complexname"], "Pool 2")
+        self.assertEqual(len(archive.removed_sessions(conn, locationid=1, end_date="2026-07-08T23:59:59")), 1)
+
+        history = archive.pool_history(conn, 1)
+        self.assertEqual([(h["start_time"], h["first_seen"][8:10], h["last_seen"][8:10], h["removed_at"])
+                          for h in history],
+                         [(MON[0], "06", "06", None), (TUE[0], "06", "07", None),
+                          (WED[0], "06", "06", "2026-07-07T06:00:00"), (THU[0], "07", "07", None)])
+        self.assertEqual(len(archive.pool_history(conn, 1, start_date=TUE[0], end_date=WED[0])), 2)
+        self.assertIsNone(archive.pool_history(conn, 99))
+
+    def test_indexes_and_wal(self):
+        self.ingest(6, pool(1, MON))
+        conn = archive.connect(self.path)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE locationid = 1 AND start_time >= '2026-07-06'"))
+        self.assertIn("sessions_by_pool", plan)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,40 @@
+"""Atomic writes leave either the old file or the complete new one, readable
+by other users, and no temp files behind."""
+import os
+import stat
+import tempfile
+import unittest
+
+from atomic_io import atomic_open, write_atomic, write_json_atomic
+
+
+class AtomicWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "out.json")
+
+    def test_text_bytes_json_and_mode(self):
+        write_atomic(self.path, "café")
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), "café".encode("utf-8"))
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o644)
+        write_atomic(self.path, b"\x00\x01", mode=0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        write_json_atomic(self.path, {"name": "café"})
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), '{"name": "café"}')
+
+    def test_failed_write_keeps_old_file(self):
+        write_atomic(self.path, "old")
+        with self.assertRaises(RuntimeError):
+            with atomic_open(self.path, text=True) as f:
+                f.write("half of the new")
+                raise RuntimeError("interrupted")
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "old")
+        self.assertEqual(os.listdir(self.dir.name), ["out.json"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,58 @@
+"""Hour-of-week availability is counted once at scrape time and queried by
+summing the precomputed series."""
+import unittest
+
+import availability
+
+# 2026-07-06 is a Monday.
+POOLS = [
+    {"locationid": 1, "complexname": "Downtown Pool", "x": -79.38, "y": 43.65, "swim_data": [
+        {"start_time": "2026-07-06T07:00:00", "end_time": "2026-07-06T08:00:00", "pool_length": "25m"},
+        {"start_time": "2026-07-13T07:30:00", "end_time": "2026-07-13T09:15:00", "pool_length": "25m"},
+        {"start_time": "2026-07-12T23:30:00", "end_time": "2026-07-13T00:30:00", "pool_length": "50m"},
+        {"start_time": "2026-07-07T10:00:00", "end_time": "2026-07-07T09:00:00", "pool_length": "25m"},
+    ]},
+    {"locationid": 1, "complexname": "Downtown Pool (duplicate record)", "x": -79.38, "y": 43.65, "swim_data": [
+        {"start_time": "2026-07-06T07:00:00", "end_time": "2026-07-06T08:00:00", "pool_length": "25m"},
+    ]},
+    {"locationid": 2, "complexname": "Far Outdoor Pool", "x": -79.60, "y": 43.80, "swim_data": [
+        {"start_time": "2026-07-06T07:00:00", "end_time": "2026-07-06T08:00:00", "pool_length": "Unknown"},
+    ]},
+    {"locationid": 3, "complexname": "Nowhere Pool", "swim_data": [
+        {"start_time": "2026-07-08T12:00:00", "end_time": "2026-07-08T13:00:00"},
+    ]},
+]
+
+MON_7, MON_8, SUN_23, WED_12 = 7, 8, 6 * 24 + 23, 2 * 24 + 12
+
+
+class AvailabilityTest(unittest.TestCase):
+    def setUp(self):
+        self.doc = availability.build(POOLS)
+        self.stats = availability.AvailabilityStats(self.doc)
+
+    def test_counts_per_hour_of_week(self):
+        counts = self.stats.query()["hour_of_week"]
+        self.assertEqual(len(counts), 168)
+        # Mon 7:00 twice at pool 1 (two weeks) and once at pool 2; 7:30-9:15 also fills 8:00.
+        self.assertEqual((counts[MON_7], counts[MON_8], counts[9]), (3, 1, 1))
+        # Sunday 23:30 to Monday 00:30 counts in both slots; the backwards session nowhere.
+        self.assertEqual((counts[SUN_23], counts[0], counts[WED_12]), (1, 1, 1))
+        self.assertEqual(sum(counts), 8)
+        self.assertEqual(self.doc["weeks"], 2)
+        self.assertEqual(availability.peak_hours(counts, top=1),
+                         [{"day": "Mon", "hour": 7, "hour_of_week": MON_7, "count": 3}])
+
+    def test_filters_and_groups(self):
+        self.assertEqual(self.stats.query(pool_type="Outdoor")["hour_of_week"][MON_7], 1)
+        self.assertEqual(sum(self.stats.query(pool_length="50m")["hour_of_week"]), 2)
+        near = self.stats.query(lat=43.651, lng=-79.381, radius_km=3)
+        self.assertEqual((near["pools"], near["hour_of_week"][MON_7]), (1, 2))
+        grouped = self.stats.query(group_by="pool_length")["groups"]
+        self.assertEqual(sorted(grouped), ["25m", "50m", "Unknown"])
+        self.assertEqual(grouped["25m"][MON_8], 1)
+        self.assertIn("unlocated", self.stats.query(group_by="cell")["groups"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,87 @@
+"""Beach results accumulate in a per-beach history: each refresh fetches only
+from the newest stored sample onwards, and the API answers date ranges from it."""
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import beaches
+from pool_store import BeachHistory
+
+TODAY = datetime(2026, 7, 20, 9, 30)
+
+
+def results(*days):
+    return [{"CollectionDate": date, "data": [{"beachId": bid, "eColi": ecoli, "advisory": "", "statusFlag": flag}
+                                              for bid, ecoli, flag in rows]}
+            for date, rows in days]
+
+
+class FeedStub:
+    """Stands in for beaches._get_json: two beaches, and `days` of results."""
+
+    def __init__(self, days):
+        self.days = days
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        if "beach_list" in url:
+            return [{"beachId": 1, "beachName": "Cherry Beach"}, {"beachId": 2, "beachName": "Kew Beach"}]
+        return results(*self.days)
+
+
+class BeachHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.files = dict(output_file=os.path.join(self.dir.name, "beaches_cache.json"),
+                          history_file=os.path.join(self.dir.name, "beach_history.json"))
+
+    def build(self, days):
+        feed = FeedStub(days)
+        with patch.object(beaches, "_get_json", feed), patch("clock.now_toronto", return_value=TODAY):
+            out = beaches.build(**self.files)
+        return out, feed.urls[-1]
+
+    def test_incremental_fetch_keeps_every_sample(self):
+        out, url = self.build([("2026-07-18", [(1, 20, "SAFE"), (2, 300, "UNSAFE")]),
+                               ("2026-07-19", [(1, 40, "SAFE")])])
+        self.assertIn("startDate=2026-06-20&endDate=2026-07-20", url)  # backfill the window
+        self.assertEqual([(b["beach_name"], b["status"], b["sample_date"]) for b in out],
+                         [("Cherry Beach", "SAFE", "2026-07-19"), ("Kew Beach", "UNSAFE", "2026-07-18")])
+
+        # Only from the newest stored date on; a late posting for it fills in a blank.
+        out, url = self.build([("2026-07-19", [(1, 45, "SAFE"), (2, 90, "SAFE")]),
+                               ("2026-07-20", [(1, 500, "UNSAFE"), (2, None, "")])])
+        self.assertIn("startDate=2026-07-19&endDate=2026-07-20", url)
+        history = beaches.load_history(self.files["history_file"])
+        self.assertEqual([s["sample_date"] for s in history["1"]], ["2026-07-18", "2026-07-19", "2026-07-20"])
+        self.assertEqual(history["1"][1]["ecoli"], 45)
+        self.assertEqual(out[0]["status"], "UNSAFE")
+
+        # A re-fetched date never trades a posted status for a blank one.
+        self.build([("2026-07-20", [(1, None, "")])])
+        self.assertEqual(beaches.load_history(self.files["history_file"])["1"][-1]["status"], "UNSAFE")
+
+    def test_feed_down_leaves_files_untouched(self):
+        with patch.object(beaches, "_get_json", side_effect=OSError("down")), \
+                patch("clock.now_toronto", return_value=TODAY):
+            self.assertIsNone(beaches.build(**self.files))
+        self.assertFalse(os.path.exists(self.files["history_file"]))
+
+    def test_date_range_queries(self):
+        samples = [{"sample_date": f"2026-07-{d:02d}", "status": "SAFE", "ecoli": d, "advisory": ""}
+                   for d in (9, 3, 5, 1, 7)]
+        history = BeachHistory({"beaches": {"1": samples}})
+        dates = lambda rows: [s["sample_date"][-2:] for s in rows]
+        self.assertEqual(dates(history.between(1)), ["01", "03", "05", "07", "09"])
+        self.assertEqual(dates(history.between(1, "2026-07-03", "2026-07-07")), ["03", "05", "07"])
+        self.assertEqual(dates(history.between(1, "2026-07-08")), ["09"])
+        self.assertEqual(history.between(1, "2026-07-10"), [])
+        self.assertIsNone(history.between(2))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
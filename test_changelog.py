@@ -0,0 +1,124 @@
+"""The changelog and the incremental merge decide what a scrape publishes: the
+diff must name exactly the pools and sessions that changed, an incremental run
+must reuse only the records that are really unchanged, and a run with nothing
+new must still refresh the clock-dependent pages."""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import scrape
+from scrape_stats import RunStats
+
+
+def _session(start, end, length="25m"):
+    return {"start_time": f"2026-07-08T{start}:00", "end_time": f"2026-07-08T{end}:00", "pool_length": length}
+
+
+def _pool(locationid, name, *sessions, **attrs):
+    return dict({"locationid": locationid, "complexname": name, "swim_data": list(sessions)}, **attrs)
+
+
+class DiffPoolsTest(unittest.TestCase):
+    def test_added_removed_and_changed(self):
+        old = [
+            _pool(1, "Same Pool", _session("07:00", "08:00")),
+            _pool(2, "Gone Pool", _session("07:00", "08:00")),
+            _pool(3, "Busy Pool", _session("07:00", "08:00"), _session("12:00", "13:00"), address="1 Main St"),
+        ]
+        new = [
+            _pool(1, "Same Pool", _session("07:00", "08:00")),
+            _pool(3, "Busy Pool", _session("12:00", "13:00"), _session("18:00", "19:00", "50m"), address="2 Main St"),
+            _pool(4, "New Pool", _session("09:00", "10:00")),
+        ]
+        changelog = scrape.diff_pools(old, new)
+        self.assertEqual(changelog["added"], [{"locationid": 4, "complexname": "New Pool"}])
+        self.assertEqual(changelog["removed"], [{"locationid": 2, "complexname": "Gone Pool"}])
+        self.assertEqual(changelog["changed"], [{
+            "locationid": 3, "complexname": "Busy Pool", "fields": ["address"],
+            "sessions_added": [["2026-07-08T18:00:00", "2026-07-08T19:00:00", "50m"]],
+            "sessions_removed": [["2026-07-08T07:00:00", "2026-07-08T08:00:00", "25m"]],
+        }])
+
+    def test_session_order_and_duplicates(self):
+        # Reordering is not a change; a session listed twice, then once, is.
+        twice = _pool(1, "Pool", _session("07:00", "08:00"), _session("07:00", "08:00"), _session("12:00", "13:00"))
+        reordered = _pool(1, "Pool", _session("12:00", "13:00"), _session("07:00", "08:00"), _session("07:00", "08:00"))
+        self.assertEqual(scrape.diff_pools([twice], [reordered])["changed"][0]["sessions_removed"], [])
+        once = _pool(1, "Pool", _session("07:00", "08:00"), _session("12:00", "13:00"))
+        changed = scrape.diff_pools([twice], [once])["changed"]
+        self.assertEqual(changed[0]["sessions_removed"], [["2026-07-08T07:00:00", "2026-07-08T08:00:00", "25m"]])
+        self.assertEqual(scrape.diff_pools([once], [once]), {"added": [], "removed": [], "changed": []})
+
+
+class MergeIncrementalTest(unittest.TestCase):
+    def test_reuses_only_unchanged_records(self):
+        previous = [
+            _pool(1, "Kept Pool", _session("07:00", "08:00"), pool_type="Indoor"),
+            _pool(2, "Moved Pool", _session("07:00", "08:00"), pool_type="Indoor"),
+            _pool(3, "Dropped Pool", pool_type="Indoor"),
+        ]
+        fetched = iter([
+            _pool(4, "Outdoor Pool", _session("09:00", "10:00")),
+            _pool(2, "Moved Pool", _session("07:30", "08:30")),
+            _pool(1, "Kept Pool", _session("07:00", "08:00")),
+        ])
+        merged, rebuilt = scrape.merge_incremental(previous, fetched)
+        self.assertEqual(rebuilt, 2)
+        self.assertEqual([r["locationid"] for r in merged], [4, 2, 1])
+        self.assertIs(merged[2], previous[0])
+        self.assertEqual(merged[0]["pool_type"], "Outdoor")
+        self.assertEqual(merged[1]["swim_data"], [_session("07:30", "08:30")])
+
+    def test_retags_when_only_the_type_source_changed(self):
+        previous = [_pool(1, "Pool", _session("07:00", "08:00"), pool_type="Indoor")]
+        fetched = [_pool(1, "Pool", _session("07:00", "08:00"), location_type="Outdoor Pool")]
+        merged, rebuilt = scrape.merge_incremental(previous, fetched)
+        self.assertEqual((rebuilt, merged[0]["pool_type"]), (1, "Outdoor"))
+
+
+class PublishTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.changelog_file = os.path.join(self.dir.name, "changelog.json")
+        for name, value in (("STATE_FILE", os.path.join(self.dir.name, "state.json")),
+                            ("CHANGELOG_FILE", self.changelog_file)):
+            patcher = patch.object(scrape, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.ran = []
+
+    def _sink(self, name):
+        def sink(pool_data):
+            self.ran.append(name)
+        sink.__name__ = name
+        return sink
+
+    def _publish(self, previous_pools, pool_data, previous_state):
+        self.ran = []
+        cache, pages = self._sink("cache_sink"), self._sink("prerender_sink")
+        with patch.object(scrape, "CLOCK_SINKS", (pages,)):
+            scrape._publish(RunStats(), datetime(2026, 7, 8, 12, 0), pool_data, pool_data, 0,
+                            previous_pools, previous_state, (cache, pages))
+        with open(self.changelog_file, encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_unchanged_incremental_run_only_runs_clock_sinks(self):
+        pools = [_pool(1, "Pool", _session("07:00", "08:00"))]
+        changelog = self._publish(pools, pools, previous_state=pools)
+        self.assertEqual(self.ran, ["prerender_sink"])
+        self.assertEqual((changelog["mode"], changelog["changed"]), ("incremental", []))
+
+        changed = [_pool(1, "Pool", _session("09:00", "10:00"))]
+        self._publish(pools, changed, previous_state=pools)
+        self.assertEqual(self.ran, ["cache_sink", "prerender_sink"])
+        # A full run always publishes.
+        self.assertEqual(self._publish(pools, pools, previous_state=None)["mode"], "full")
+        self.assertEqual(self.ran, ["cache_sink", "prerender_sink"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
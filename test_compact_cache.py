@@ -0,0 +1,120 @@
+"""The compact binary snapshot must serve the same simple /pools view as the
+JSON cache, and readers must refuse files from a newer format version."""
+import os
+import random
+import struct
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import compact_cache
+from pool_store import PoolSnapshot, simple_pool
+
+FMT = "%Y-%m-%dT%H:%M:%S"
+MONDAY = datetime(2026, 7, 6)
+
+
+def synthetic_city(rng, pool_count=40):
+    pools = []
+    for i in range(pool_count):
+        sessions = []
+        for _ in range(rng.randint(0, 25)):
+            start = MONDAY + timedelta(days=rng.randint(0, 13), minutes=15 * rng.randint(20, 88))
+            sessions.append({
+                "status": "active",
+                "start_time": start.strftime(FMT),
+                "end_time": (start + timedelta(minutes=rng.choice([45, 60, 90, 135, -600]))).strftime(FMT),
+                "id": 1,
+                "pool_length": rng.choice(["25m", "50m", "Unknown"]),
+            })
+        rng.shuffle(sessions)
+        pools.append({
+            "locationid": i if rng.random() > 0.05 else max(i - 1, 0),
+            "complexname": f"Pool {i} (Outdoor)" if i % 7 == 0 else f"Pool {i}",
+            "address": f" {i} Queen St W  ",
+            "x": -79.4 + i / 1000, "y": 43.65,
+            "location_type": "Indoor Pool",
+            "pool_length": "25m",
+            "website": f"https://www.toronto.ca/?id={i}",
+            "globalid": "not served",
+            "swim_data": sessions,
+        })
+    return pools
+
+
+class CompactRoundTrip(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "good_list_cache.bin")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_simple_view_matches_json_path(self):
+        rng = random.Random(7)
+        pools = synthetic_city(rng)
+        compact_cache.write(pools, self.path, generation=3)
+        snapshot = PoolSnapshot(pools)
+        compact = compact_cache.CompactSnapshot.open(self.path)
+        try:
+            self.assertEqual(compact.generation, 3)
+            for _ in range(60):
+                start = None if rng.random() < 0.2 else MONDAY + timedelta(days=rng.randint(-1, 14), seconds=rng.randint(0, 86399))
+                end = None if rng.random() < 0.2 else (start or MONDAY).replace(hour=23, minute=59, second=59) + timedelta(days=rng.randint(0, 2))
+                expected = [simple_pool(snapshot.pools[i], snapshot.times(i, start, end)) for i in snapshot.match(start, end)]
+                self.assertEqual(compact.simple_view(start, end), expected, (start, end))
+        finally:
+            compact.close()
+
+    def test_newer_version_is_refused(self):
+        compact_cache.write(synthetic_city(random.Random(1), 3), self.path)
+        with open(self.path, "r+b") as f:
+            f.seek(4)
+            f.write(struct.pack("<H", compact_cache.FORMAT_VERSION + 1))
+        with self.assertRaises(compact_cache.UnsupportedFormat):
+            compact_cache.CompactSnapshot.open(self.path)
+
+    def test_not_a_snapshot_is_refused(self):
+        with open(self.path, "wb") as f:
+            f.write(b"[{\"locationid\": 1}]")
+        with self.assertRaises(compact_cache.UnsupportedFormat):
+            compact_cache.CompactSnapshot.open(self.path)
+
+
+class SharedStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "good_list_cache.bin")
+
+    def test_switches_on_generation_counter(self):
+        store = compact_cache.CompactStore(self.path, check_interval=0)
+        self.assertIsNone(store.current())
+        first = synthetic_city(random.Random(2), 5)
+        compact_cache.write(first, self.path)
+        old = store.current()
+        self.assertEqual((store.generation, old.generation, len(old.pools)), (1, 1, 5))
+        self.assertIs(store.current(), old)  # counter unchanged: no reload
+
+        counter_inode = os.stat(compact_cache.generation_file(self.path)).st_ino
+        compact_cache.write(synthetic_city(random.Random(3), 8), self.path)
+        self.assertEqual(os.stat(compact_cache.generation_file(self.path)).st_ino, counter_inode)
+        new = store.current()
+        self.assertIsNot(new, old)
+        self.assertEqual((store.generation, len(new.pools)), (2, 8))
+        # A request still holding the old snapshot keeps reading the old mapping.
+        snapshot = PoolSnapshot(first)
+        self.assertEqual(old.simple_view(), [snapshot.simple_row(i) for i in snapshot.match()])
+
+    def test_near_matches_json_path(self):
+        pools = synthetic_city(random.Random(4), 30)
+        compact_cache.write(pools, self.path)
+        compact = compact_cache.CompactSnapshot.open(self.path)
+        self.addCleanup(compact.close)
+        snapshot = PoolSnapshot(pools)
+        matched = snapshot.match()
+        self.assertEqual(compact.near(matched, 43.65, -79.39, limit=5), snapshot.near(matched, 43.65, -79.39, limit=5))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
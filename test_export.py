@@ -0,0 +1,66 @@
+"""export.py writes the same rows as /pools?format=ndjson, one per line, and
+its -o output is replaced atomically."""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+import export
+import pool_store
+
+POOLS = [
+    {"locationid": 1, "complexname": "Morning Pool", "x": -79.38, "y": 43.65, "swim_data": [
+        {"start_time": "2026-07-08T07:00:00", "end_time": "2026-07-08T08:00:00", "pool_length": "25m"},
+        {"start_time": "2026-07-08T19:00:00", "end_time": "2026-07-08T20:30:00", "pool_length": "50m"},
+    ]},
+    {"locationid": 2, "complexname": "Évening Pool", "swim_data": [
+        {"start_time": "2026-07-09T18:00:00", "end_time": "2026-07-09T19:00:00"},
+    ]},
+]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.cache = os.path.join(self.dir.name, "good_list_cache.json")
+        with open(self.cache, "w") as f:
+            json.dump(POOLS, f)
+
+    def export(self, **options):
+        out = io.BytesIO()
+        count = export.export(out, cache_file=self.cache, **options)
+        rows = [json.loads(line) for line in out.getvalue().decode("utf-8").splitlines()]
+        self.assertEqual(count, len(rows))
+        return rows
+
+    def test_full_records_round_trip(self):
+        self.assertEqual(self.export(), POOLS)
+
+    def test_window_simple_and_fields(self):
+        start, end = datetime(2026, 7, 8, 12, 0), datetime(2026, 7, 8, 23, 59, 59)
+        snapshot = pool_store.PoolSnapshot(POOLS)
+        expected = [snapshot.simple_row(i, start, end) for i in snapshot.match(start, end)]
+        self.assertEqual(self.export(start_date=start, end_date=end, simple=True), expected)
+        self.assertEqual(self.export(start_date=start, end_date=end, simple=True, fields="pool_name"),
+                         [{"pool_name": row["pool_name"]} for row in expected])
+
+    def test_cli_writes_output_file(self):
+        output = os.path.join(self.dir.name, "pools.ndjson")
+        with open(output, "w") as f:
+            f.write("previous export\n")
+        subprocess.run([sys.executable, os.path.join(HERE, "export.py"), "--cache", self.cache, "-o", output,
+                        "--fields", "locationid"], check=True, capture_output=True)
+        with open(output) as f:
+            self.assertEqual([json.loads(line) for line in f], [{"locationid": p["locationid"]} for p in POOLS])
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ["good_list_cache.json", "pools.ndjson"])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
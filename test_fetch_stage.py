@@ -0,0 +1,96 @@
+"""The shared rate limiter must hold the fetch threads to `rate` requests per
+second after a burst of at most `burst`, and the fetch stage must yield
+results in location order however the threads finish."""
+import threading
+import unittest
+from unittest.mock import patch
+
+import scrape
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances monotonic()."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = patch.object(scrape, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_rate(self):
+        limiter = scrape.RateLimiter(rate=10, burst=3)
+        waits = [limiter.acquire() for _ in range(5)]
+        self.assertEqual(waits[:3], [0, 0, 0])
+        for wait in waits[3:]:
+            self.assertAlmostEqual(wait, 0.1)
+
+    def test_rate_bound(self):
+        limiter = scrape.RateLimiter(rate=10, burst=3)
+        start = self.clock.now
+        for _ in range(103):
+            limiter.acquire()
+        # Everything past the burst is paced at 10/s.
+        self.assertAlmostEqual(self.clock.now - start, 10.0)
+
+    def test_idle_time_refills_only_up_to_burst(self):
+        limiter = scrape.RateLimiter(rate=2, burst=2)
+        limiter.acquire()
+        self.clock.now += 60
+        waits = [limiter.acquire() for _ in range(3)]
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 0.5)
+
+    def test_waiters_queue_up(self):
+        # Reservations are taken under the lock: concurrent callers each get
+        # their own slot instead of all waking at once.
+        limiter = scrape.RateLimiter(rate=4, burst=1)
+        limiter.acquire()
+        waits = []
+        threads = [threading.Thread(target=lambda: waits.append(limiter.acquire())) for _ in range(4)]
+        with patch.object(self.clock, "sleep", lambda seconds: None):
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(sorted(waits), [0.25, 0.5, 0.75, 1.0])
+
+
+class FetchStageOrderTest(unittest.TestCase):
+    def test_yields_in_location_order(self):
+        finished = []
+        lock = threading.Lock()
+        done = [threading.Event() for _ in range(20)]
+
+        def fetch(location, limiter=None, cache=None, converter=None, stats=None):
+            # Each even location finishes only after the odd one behind it.
+            n = location["locationid"]
+            if n % 2 == 0:
+                self.assertTrue(done[n + 1].wait(5))
+            with lock:
+                finished.append(n)
+            done[n].set()
+            return [{"locationid": n}]
+
+        locations = [{"locationid": n} for n in range(20)]
+        with patch.object(scrape, "fetch_location_swim_data", fetch):
+            results = list(scrape.fetch_stage(locations, workers=4))
+        self.assertNotEqual(finished, sorted(finished))
+        self.assertEqual([location["locationid"] for location, _ in results], list(range(20)))
+        self.assertTrue(all(sessions == [{"locationid": location["locationid"]}] for location, sessions in results))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
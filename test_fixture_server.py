@@ -0,0 +1,67 @@
+"""The scraper must run end to end against the local stand-in for the City's
+endpoints: UTF-16 week files with their junk prefix, missing week2 files,
+injected 503s (retried by the shared client) and the beach feeds."""
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import beaches
+import fixture_server
+import scrape
+from raw_cache import RawCache
+
+NOW = datetime(2026, 7, 8, 12, 0)
+
+
+class OfflineScrape(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.dir.name, "fixtures")
+        fixture_server.synthesize(self.root, locations=12, seed=3)
+        saved = (scrape.ARCGIS_BASE_URL, scrape.TORONTO_BASE_URL, beaches.OPENDATA_BASE_URL,
+                 beaches.BEACH_LIST_URL, beaches.BEACH_RESULTS_URL)
+        self.addCleanup(self._restore, saved)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _restore(self, saved):
+        (scrape.ARCGIS_BASE_URL, scrape.TORONTO_BASE_URL, beaches.OPENDATA_BASE_URL,
+         beaches.BEACH_LIST_URL, beaches.BEACH_RESULTS_URL) = saved
+
+    def _serve(self, faults=None):
+        server, base_url = fixture_server.start(self.root, faults=faults)
+        self.addCleanup(server.shutdown)
+        fixture_server.point_scraper_at(base_url)
+        return server
+
+    def test_scrape_pipeline(self):
+        server = self._serve()
+        locations = scrape.process_locations(scrape.fetch_locations_with_retries())
+        self.assertEqual(len(locations), 12)
+        pool_data, records, _ = scrape.build_pool_data(locations, workers=4, rate=1000, now=NOW,
+                                                       cache=RawCache(os.path.join(self.dir.name, "cache")))
+        self.assertTrue(pool_data)
+        self.assertIn(404, server.stats)  # locations without a week2 file
+        for pool in pool_data:
+            for session in pool["swim_data"]:
+                self.assertTrue(session["start_time"].startswith("2026-07-"), session)
+
+    def test_errors_are_retried(self):
+        server = self._serve(fixture_server.Faults(error_rate=0.5, seed=1))
+        with patch("urllib3.util.retry.Retry.sleep"):  # no backoff sleeps in tests
+            self.assertEqual(len(scrape.fetch_locations_with_retries()), 12)
+        self.assertEqual(server.stats[503], 1)
+
+    def test_beach_feeds(self):
+        self._serve()
+        out = beaches.build(output_file=os.path.join(self.dir.name, "beaches_cache.json"),
+                            history_file=os.path.join(self.dir.name, "beach_history.json"))
+        self.assertEqual(len(out), 10)
+        self.assertTrue(all(b["status"] in ("SAFE", "UNSAFE") for b in out))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,39 @@
+"""The grid index must give exactly what sorting every pool by haversine
+distance gives, for radius and nearest-k queries alike."""
+import random
+import unittest
+
+from geo import GridIndex, haversine_km
+
+
+def brute_force(points, lat, lng, k=None, radius_km=None, allowed=None):
+    found = sorted(
+        (haversine_km(lat, lng, p[0], p[1]), i) for i, p in enumerate(points)
+        if p is not None and (allowed is None or i in allowed)
+    )
+    if radius_km is not None:
+        found = [f for f in found if f[0] <= radius_km]
+    return found if k is None else found[:k]
+
+
+class GridIndexTests(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(11)
+        # Toronto-ish spread with a few unlocated pools and a far-away outlier.
+        points = [(43.58 + rng.random() * 0.28, -79.62 + rng.random() * 0.48) for _ in range(150)]
+        points += [None, None, (45.42, -75.69)]
+        index = GridIndex(points)
+        for _ in range(60):
+            lat, lng = 43.5 + rng.random() * 0.45, -79.7 + rng.random() * 0.65
+            k = rng.choice([None, 1, 5, 40])
+            radius = rng.choice([None, 0.5, 3, 12])
+            allowed = rng.choice([None, set(rng.sample(range(len(points)), 60))])
+            self.assertEqual(index.nearest(lat, lng, k, radius, allowed),
+                             brute_force(points, lat, lng, k, radius, allowed))
+
+    def test_empty(self):
+        self.assertEqual(GridIndex([None]).nearest(43.6, -79.4, k=3), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
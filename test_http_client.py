@@ -0,0 +1,74 @@
+"""The shared session must retry transient failures (not 404s) with backoff,
+every request must carry the default timeouts, and each completed request must
+reach the listeners exactly once."""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import http_client
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        return SimpleNamespace(status_code=200, content=b"{}")
+
+
+class SessionConfigTest(unittest.TestCase):
+    def test_retry_policy_and_pool(self):
+        s = http_client._build_session()
+        for prefix in ("https://", "http://"):
+            adapter = s.get_adapter(prefix + "www.toronto.ca/")
+            retry = adapter.max_retries
+            self.assertEqual((retry.total, retry.connect, retry.read, retry.status), (3, 3, 3, 3))
+            self.assertEqual(retry.backoff_factor, 0.5)
+            self.assertEqual(set(retry.status_forcelist), {429, 500, 502, 503, 504})
+            self.assertNotIn(404, retry.status_forcelist)
+            self.assertFalse(retry.raise_on_status)
+            self.assertEqual(adapter._pool_maxsize, http_client.POOL_MAXSIZE)
+        self.assertIs(s.get_adapter("https://a/"), s.get_adapter("http://b/"))
+
+    def test_session_is_shared(self):
+        with patch.object(http_client, "_session", None):
+            self.assertIs(http_client.session(), http_client.session())
+
+
+class GetTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeSession()
+        patcher = patch.object(http_client, "_session", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default_timeout(self):
+        http_client.get("https://example.com/a")
+        http_client.get("https://example.com/b", timeout=1, headers={"If-None-Match": '"x"'})
+        self.assertEqual(self.fake.calls, [
+            ("https://example.com/a", {"timeout": (5, 30)}),
+            ("https://example.com/b", {"timeout": 1, "headers": {"If-None-Match": '"x"'}}),
+        ])
+
+    def test_listener_fires_once_per_request(self):
+        seen = []
+
+        def broken(url, response, elapsed):
+            raise RuntimeError("must not fail the request")
+
+        listener = lambda url, response, elapsed: seen.append((url, response.status_code, elapsed >= 0))
+        http_client.add_listener(broken)
+        http_client.add_listener(listener)
+        self.addCleanup(http_client.remove_listener, broken)
+        self.addCleanup(http_client.remove_listener, listener)
+        with self.assertLogs("http_client", level="ERROR"):
+            http_client.get("https://example.com/a")
+            http_client.get("https://example.com/b")
+        http_client.remove_listener(listener)
+        http_client.get("https://example.com/c")
+        self.assertEqual(seen, [("https://example.com/a", 200, True), ("https://example.com/b", 200, True)])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
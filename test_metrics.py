@@ -0,0 +1,45 @@
+"""Metrics recorded on many threads must add up exactly once merged, and render
+as valid Prometheus text (cumulative buckets, escaped labels)."""
+import threading
+import unittest
+
+from obs import Metrics
+
+
+class MetricsTests(unittest.TestCase):
+    def test_threads_merge(self):
+        metrics = Metrics()
+        metrics.counter("hits_total", "hits")
+        metrics.histogram("latency_seconds", "latency", buckets=(0.01, 0.1))
+
+        def work():
+            for i in range(1000):
+                metrics.inc("hits_total", {"route": "/pools"})
+                metrics.observe("latency_seconds", 0.05 if i % 2 else 0.005, {"route": "/pools"})
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        text = metrics.render()
+        self.assertIn('hits_total{route="/pools"} 8000', text)
+        self.assertIn('latency_seconds_bucket{route="/pools",le="0.01"} 4000', text)
+        self.assertIn('latency_seconds_bucket{route="/pools",le="0.1"} 8000', text)
+        self.assertIn('latency_seconds_bucket{route="/pools",le="+Inf"} 8000', text)
+        self.assertIn('latency_seconds_count{route="/pools"} 8000', text)
+
+    def test_gauges_and_escaping(self):
+        metrics = Metrics()
+        metrics.gauge("age_seconds", "age", lambda: 1.5)
+        metrics.gauge("broken", "raises", lambda: 1 / 0)
+        metrics.counter("odd_total", "odd labels")
+        metrics.inc("odd_total", {"path": 'a"b\\c'})
+        text = metrics.render()
+        self.assertIn("age_seconds 1.5\n", text)
+        self.assertNotIn("\nbroken ", text)
+        self.assertIn('odd_total{path="a\\"b\\\\c"} 1', text)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,133 @@
+"""The API's resident pool snapshot must pick up the scraper's rewrites of the
+cache, and must keep serving the previous snapshot when it catches the file
+half-written instead of crashing or serving a truncated city."""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime
+
+import pool_store
+
+
+def _pool(locationid, *sessions):
+    return {
+        "locationid": locationid,
+        "complexname": f"Pool {locationid}",
+        "swim_data": [{"start_time": s, "end_time": e, "pool_length": "25m"} for s, e in sessions],
+    }
+
+
+class SnapshotStoreReload(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "good_list_cache.json")
+        self.store = pool_store.SnapshotStore(self.path, pool_store.PoolSnapshot, check_interval=0)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _write(self, text, mtime_ns):
+        with open(self.path, "w") as f:
+            f.write(text)
+        # Distinct mtimes, regardless of the filesystem's timestamp granularity.
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_missing_cache_raises_until_scraped(self):
+        with self.assertRaises(FileNotFoundError):
+            self.store.current()
+
+    def test_loads_once_and_swaps_on_rewrite(self):
+        self._write(json.dumps([_pool(1, ("2026-07-06T06:30:00", "2026-07-06T08:00:00"))]), 1_000_000_000)
+        first = self.store.current()
+        self.assertEqual(first.sessions[0][0][0], datetime(2026, 7, 6, 6, 30))
+        self.assertIs(self.store.current(), first, "unchanged file must not be reparsed")
+
+        self._write(json.dumps([_pool(1), _pool(2)]), 2_000_000_000)
+        second = self.store.current()
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second.pools), 2)
+        self.assertEqual(second.generation, first.generation + 1)
+
+    def test_half_written_file_keeps_previous_snapshot(self):
+        self._write(json.dumps([_pool(1)]), 1_000_000_000)
+        first = self.store.current()
+        self._write('[{"locationid": 1, "complexname": "Po', 2_000_000_000)
+        self.assertFalse(self.store.refresh())
+        self.assertIs(self.store.current(), first)
+
+    def test_lazy_watcher_starts_on_first_read(self):
+        self._write(json.dumps([_pool(1)]), 1_000_000_000)
+        self.assertIsNone(self.store.start_watcher(interval=60, lazy=True))
+        self.assertEqual(self.store.file_mtime(), 1.0)
+        self.assertIsNone(self.store.peek(), "file_mtime must not load the cache")
+        self.store.current()
+        self.assertIsNotNone(self.store._watcher)
+
+    def test_match_and_times_use_window_semantics(self):
+        self._write(json.dumps([
+            _pool(1, ("2026-07-06T06:30:00", "2026-07-06T08:00:00"), ("2026-07-06T20:00:00", "2026-07-06T21:00:00")),
+            _pool(2, ("2026-07-07T06:30:00", "2026-07-07T08:00:00")),
+        ]), 1_000_000_000)
+        snapshot = self.store.current()
+        start, end = datetime(2026, 7, 6, 7, 0), datetime(2026, 7, 6, 23, 59, 59)
+        self.assertEqual(snapshot.match(start, end), [0])
+        # Listing includes the in-progress 06:30 session; selection did not need it.
+        self.assertEqual(len(snapshot.times(0, start, end)), 2)
+
+
+class LookupAndProjection(unittest.TestCase):
+    def test_find_by_locationid(self):
+        snapshot = pool_store.PoolSnapshot([_pool(272), _pool(15), _pool(272)])
+        self.assertEqual((snapshot.find(272), snapshot.find(15), snapshot.find(999)), (0, 1, None))
+
+    def test_projection_is_cached_per_field_set(self):
+        fields = pool_store.parse_fields(" pool_name,times,,pool_name,missing")
+        self.assertEqual(fields, ("pool_name", "times", "missing"))
+        self.assertIs(pool_store.projection(fields), pool_store.projection(pool_store.parse_fields("pool_name,times,missing")))
+        row = pool_store.simple_pool(_pool(272, ("2026-07-06T06:30:00", "2026-07-06T08:00:00")), [])
+        self.assertEqual(pool_store.projection(fields)(row), {"pool_name": "Pool 272", "times": []})
+
+
+class CompactView(unittest.TestCase):
+    def test_round_trips_to_simple_view(self):
+        pools = [
+            _pool(1, ("2026-07-06T06:30:00", "2026-07-06T08:00:00"), ("2026-07-06T19:00:00", "2026-07-06T21:15:00")),
+            _pool(2),
+            _pool(3, ("2026-07-05T23:00:00", "2026-07-06T07:00:00"), ("2026-07-07T12:00:00", "2026-07-07T13:00:00")),
+        ]
+        pools[2]["swim_data"][1]["pool_length"] = "50m"
+        snapshot = pool_store.PoolSnapshot(pools)
+        ranked = [(None, i) for i in range(len(pools))]
+        for start, end in [(datetime(2026, 7, 6, 6, 45, 30), datetime(2026, 7, 6, 23, 59, 59)), (None, None)]:
+            simple = [pool_store.simple_pool(p, snapshot.times(i, start, end)) for i, p in enumerate(pools)]
+            view = json.loads(json.dumps(pool_store.compact_view(snapshot, ranked, start, end)))
+            self.assertEqual(pool_store.expand_compact_view(view), simple)
+        self.assertEqual(view["lengths"], ["25m", "50m"])
+        self.assertEqual(view["window_start"], "2026-07-05T23:00:00")
+
+    def test_empty(self):
+        view = pool_store.compact_view(pool_store.PoolSnapshot([]), [])
+        self.assertEqual((view["window_start"], view["offsets"]), (None, [0]))
+        self.assertEqual(pool_store.expand_compact_view(view), [])
+
+
+class CompactViewCity(unittest.TestCase):
+    def test_matches_simple_view_of_synthetic_city(self):
+        # format=compact is the frontend's default; its cost against the simple
+        # view is tracked by bench.py, its content is checked here.
+        import bench
+        snapshot = pool_store.PoolSnapshot(bench.synthetic_cache(scale=1, weeks=2))
+        start, end = datetime(2026, 7, 8), datetime(2026, 7, 8, 23, 59, 59)
+        matched = snapshot.match(start, end)
+        self.assertTrue(matched)
+        ranked = [(None if n % 3 == 0 else n / 7, i) for n, i in enumerate(matched)]
+        for with_distance in (False, True):
+            simple = list(pool_store.iter_rows(snapshot, ranked, start, end, simple=True, with_distance=with_distance))
+            view = json.loads(json.dumps(pool_store.compact_view(snapshot, ranked, start, end, with_distance)))
+            self.assertEqual(pool_store.expand_compact_view(view), simple)
+            self.assertEqual(view["offsets"][-1], sum(len(row["times"]) for row in simple))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,84 @@
+"""The prerender only rewrites pages whose content changed, deletes the pages of
+pools that are gone, and dates each sitemap URL by its last real change."""
+import os
+import re
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import prerender
+
+POOLS = [
+    {"complexname": "Alpha Pool", "address": "1 Main St", "pool_type": "Indoor", "pool_length": "25m",
+     "website": "https://example.com/alpha", "swim_data": [
+         {"start_time": "2026-07-08T07:00:00", "end_time": "2026-07-08T08:00:00"},
+         {"start_time": "2026-07-09T18:30:00", "end_time": "2026-07-09T20:00:00"},
+     ]},
+    {"complexname": "Beta Pool", "pool_type": "Outdoor", "swim_data": [
+        {"start_time": "2026-07-10T12:00:00", "end_time": "2026-07-10T13:00:00"},
+    ]},
+    {"complexname": "Gamma Pool", "swim_data": [
+        {"start_time": "2026-07-01T12:00:00", "end_time": "2026-07-01T13:00:00"},  # already over
+    ]},
+]
+
+
+class PrerenderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        path = lambda name: os.path.join(self.dir.name, name)
+        self.pages_dir = path("pools")
+        self.files = dict(output_file=path("pool_schedules.html"), pages_dir=self.pages_dir,
+                          manifest_file=path("manifest.json"), sitemap_file=path("sitemap.xml"))
+
+    def _build(self, pools, day, **kwargs):
+        with patch("clock.now_toronto", return_value=datetime(2026, 7, day, 6, 0)):
+            prerender.build(pools=pools, **self.files, **kwargs)
+        return prerender.load_manifest(self.files["manifest_file"])
+
+    def _lastmods(self):
+        with open(self.files["sitemap_file"], encoding="utf-8") as f:
+            xml = f.read()
+        return dict(re.findall(r"<loc>[^<]*/lane-duck/?([^<]*)</loc>\n    <lastmod>([^<]*)</lastmod>", xml))
+
+    def test_incremental_pages_and_sitemap(self):
+        pages = self._build(POOLS, 7)
+        self.assertEqual(sorted(os.listdir(self.pages_dir)), ["alpha-pool.html", "beta-pool.html"])
+        with open(os.path.join(self.pages_dir, "alpha-pool.html"), encoding="utf-8") as f:
+            page = f.read()
+        self.assertIn("Wednesday, July 8:</span> 7:00 AM&ndash;8:00 AM", page)
+        self.assertIn('"@type": "PublicSwimmingPool"', page)
+        with open(self.files["output_file"], encoding="utf-8") as f:
+            self.assertIn(f"{prerender.SITE_URL}/pools/beta-pool", f.read())
+
+        # Alpha gains a session, Beta is unchanged and must not be rewritten.
+        beta = os.path.join(self.pages_dir, "beta-pool.html")
+        os.utime(beta, (0, 0))
+        changed = [dict(POOLS[0], swim_data=POOLS[0]["swim_data"] + [
+            {"start_time": "2026-07-11T09:00:00", "end_time": "2026-07-11T10:00:00"}])] + POOLS[1:]
+        self._build(changed, 8)
+        self.assertEqual(os.path.getmtime(beta), 0)
+        self.assertEqual(self._lastmods(), {"": "2026-07-08", "pools": "2026-07-08",
+                                            "pools/alpha-pool": "2026-07-08", "pools/beta-pool": "2026-07-07"})
+
+        # Beta drops off the schedule: its page and sitemap entry go.
+        pages = self._build(changed[:1], 9)
+        self.assertEqual(os.listdir(self.pages_dir), ["alpha-pool.html"])
+        self.assertNotIn(f"{prerender.SITE_URL}/pools/beta-pool", pages)
+        # Alpha's July 8 session is over by now, so its page changed too.
+        self.assertEqual(self._lastmods()["pools/alpha-pool"], "2026-07-09")
+
+    def test_parallel_render_matches_serial(self):
+        self._build(POOLS, 7)
+        with open(os.path.join(self.pages_dir, "alpha-pool.html"), encoding="utf-8") as f:
+            serial = f.read()
+        os.unlink(self.files["manifest_file"])
+        self._build(POOLS, 7, parallel_threshold=0)
+        with open(os.path.join(self.pages_dir, "alpha-pool.html"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), serial)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,84 @@
+"""Unchanged schedule files must be reused without re-parsing: via a 304 when
+the server sends validators, via the body hash when it does not, and never
+across a change of week anchor (the cached sessions carry absolute dates)."""
+import tempfile
+import unittest
+
+from raw_cache import RawCache
+
+URL = "https://www.toronto.ca/data/parks/live/locations/272/swim/week1.json"
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class FakeServer:
+    def __init__(self, body, etag=None):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, headers=None):
+        self.requests.append(dict(headers or {}))
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, {"ETag": self.etag} if self.etag else {})
+
+
+class RawCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _run(self, server, key, parsed):
+        cache = RawCache(self.dir.name)
+        fetched = cache.fetch(URL, server.get)
+        derived = cache.derived(fetched, key)
+        if derived is None:
+            derived = parsed
+            cache.store(fetched, key, derived)
+        return cache, fetched, derived
+
+    def test_not_modified_reuses_derived(self):
+        server = FakeServer(b"{}", etag='"v1"')
+        self._run(server, "2026-07-06", ["session"])
+        cache, fetched, derived = self._run(server, "2026-07-06", ["reparsed"])
+        self.assertEqual(server.requests[-1].get("If-None-Match"), '"v1"')
+        self.assertEqual(fetched.status, 304)
+        self.assertEqual(fetched.body, b"{}")
+        self.assertEqual(derived, ["session"])
+        self.assertEqual((cache.hits, cache.not_modified, cache.misses), (1, 1, 0))
+
+    def test_hash_match_without_validators(self):
+        server = FakeServer(b"{}")
+        self._run(server, "2026-07-06", ["session"])
+        cache, fetched, derived = self._run(server, "2026-07-06", ["reparsed"])
+        self.assertEqual(fetched.status, 200)
+        self.assertEqual(derived, ["session"])
+        self.assertEqual(cache.hits, 1)
+
+    def test_changed_body_or_anchor_is_a_miss(self):
+        server = FakeServer(b"{}")
+        self._run(server, "2026-07-06", ["session"])
+        cache, _, derived = self._run(server, "2026-07-13", ["next week"])
+        self.assertEqual((derived, cache.misses), (["next week"], 1))
+        server.body = b'{"changed": true}'
+        cache, _, derived = self._run(server, "2026-07-13", ["changed"])
+        self.assertEqual((derived, cache.misses), (["changed"], 1))
+
+    def test_errors_are_not_cached(self):
+        cache = RawCache(self.dir.name)
+        fetched = cache.fetch(URL, lambda url, headers=None: FakeResponse(404, b"<html>"))
+        cache.store(fetched, "k", [])
+        self.assertEqual(fetched.status, 404)
+        self.assertIsNone(cache.fetch(URL, FakeServer(b"{}").get).entry)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
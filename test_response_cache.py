@@ -0,0 +1,48 @@
+"""/pools response cache: bounded LRU per snapshot generation, and the
+If-None-Match matching that decides when to answer 304 Not Modified."""
+import unittest
+
+from response_cache import ResponseCache, encode_json, etag_matches, make_etag
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def test_hit_after_put_same_generation(self):
+        cache = ResponseCache()
+        stored = cache.put(1, ("a",), b"[1]")
+        self.assertEqual(cache.get(1, ("a",)), stored)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_new_generation_evicts_everything(self):
+        cache = ResponseCache()
+        cache.put(1, ("a",), b"[1]")
+        self.assertIsNone(cache.get(2, ("a",)))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_bounded_by_entries_and_bytes(self):
+        cache = ResponseCache(max_entries=2, max_bytes=10)
+        cache.put(1, "a", b"1234")
+        cache.put(1, "b", b"1234")
+        cache.get(1, "a")               # a is now most recently used
+        cache.put(1, "c", b"1234")      # over both limits: b goes first
+        self.assertIsNone(cache.get(1, "b"))
+        self.assertIsNotNone(cache.get(1, "a"))
+        self.assertIsNotNone(cache.get(1, "c"))
+
+    def test_encoding_matches_fastapi(self):
+        self.assertEqual(encode_json([{"pool_name": "Île", "x": 1.5}]), '[{"pool_name":"Île","x":1.5}]'.encode("utf-8"))
+
+
+class EtagMatching(unittest.TestCase):
+    def test_if_none_match_forms(self):
+        etag = make_etag(b"body")
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", {etag}', etag))
+        self.assertTrue(etag_matches(f"W/{etag}", etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"other"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
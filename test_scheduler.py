@@ -0,0 +1,59 @@
+import fcntl
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import scheduler
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        path = lambda name: os.path.join(self.dir.name, name)
+        self.marker = path("ran")
+        self.scheduler = scheduler.RefreshScheduler(
+            interval=3600, jitter=0,
+            command=[sys.executable, "-c", f"open({self.marker!r}, 'a').write('x')"],
+            lock_file=path("refresh.lock"), state_file=path("refresh_state.json"), cache_file=path("cache.json"))
+
+    def runs(self):
+        return len(open(self.marker).read()) if os.path.exists(self.marker) else 0
+
+    def test_runs_when_due_and_stamps(self):
+        self.assertEqual(self.scheduler.next_delay(), 0)
+        self.assertEqual(self.scheduler.run_once(), 0)
+        self.assertEqual(self.runs(), 1)
+        with open(self.scheduler.state_file) as f:
+            self.assertEqual(json.load(f)["exit_code"], 0)
+        self.assertGreater(self.scheduler.next_delay(), 3500)
+
+    def test_skips_when_another_worker_refreshed(self):
+        self.scheduler.run_once()
+        # A second worker waking up late must not scrape again this period.
+        self.assertIsNone(self.scheduler.run_once())
+        self.assertEqual(self.runs(), 1)
+
+    def test_cache_mtime_counts_as_a_refresh(self):
+        with open(self.scheduler.cache_file, "w") as f:
+            f.write("[]")
+        self.assertAlmostEqual(scheduler.last_refresh(self.scheduler.state_file, self.scheduler.cache_file),
+                               time.time(), delta=5)
+        self.assertIsNone(self.scheduler.run_once())
+
+    def test_single_flight_while_locked(self):
+        with open(self.scheduler.lock_file, "a") as held:
+            fcntl.flock(held.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.assertIsNone(self.scheduler.run_once())
+        self.assertEqual(self.runs(), 0)
+        self.assertEqual(self.scheduler.run_once(), 0)
+
+    def test_disabled(self):
+        self.assertIsNone(scheduler.RefreshScheduler(interval=0).start())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""The run report must add up each stage's time and calls, whether timed in the
+main thread or reported by the HTTP client's listener, and be appended as one
+JSON line per run."""
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import scrape_stats
+from scrape_stats import RunStats, append_report
+
+
+def _response(status=200, content=b"{}", retries=0):
+    raw = SimpleNamespace(retries=SimpleNamespace(history=[object()] * retries))
+    return SimpleNamespace(status_code=status, content=content, raw=raw)
+
+
+class RunStatsTest(unittest.TestCase):
+    def test_stage_timings_and_counters(self):
+        stats = RunStats()
+        # dedup: 0.5s, then 0.25s; sinks: 2s
+        with patch.object(scrape_stats.time, "perf_counter", side_effect=[10.0, 10.5, 20.0, 20.25, 30.0, 32.0]):
+            with stats.stage("dedup"):
+                pass
+            with stats.stage("dedup"):
+                pass
+            with self.assertRaises(ValueError):
+                with stats.stage("sinks"):
+                    raise ValueError("a failing stage is still timed")
+        stats.add_time("parse", 0.125, calls=4)
+        stats.count("sessions", 3)
+        stats.count("sessions")
+        stats.on_response("https://example.com/a", _response(content=b"12345"), 1.5)
+        stats.on_response("https://example.com/b", _response(status=404, retries=2), 0.5)
+
+        report = stats.report(mode="full", workers=4)
+        self.assertEqual(list(report), ["started_at", "finished_at", "wall_seconds", "mode", "workers",
+                                        "stages", "counters"])
+        self.assertEqual((report["mode"], report["workers"]), ("full", 4))
+        # Slowest stage first.
+        self.assertEqual(report["stages"], {
+            "sinks": {"seconds": 2.0, "calls": 1},
+            "network": {"seconds": 2.0, "calls": 2},
+            "dedup": {"seconds": 0.75, "calls": 2},
+            "parse": {"seconds": 0.125, "calls": 4},
+        })
+        self.assertEqual(report["counters"], {"bytes_fetched": 7, "http_200": 1, "http_404": 1,
+                                              "requests": 2, "retries": 2, "sessions": 4})
+        self.assertGreaterEqual(report["wall_seconds"], 0)
+        self.assertEqual(stats.summary(top=2), "sinks 2.00s, network 2.00s")
+
+    def test_append_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "scrape_report.jsonl")
+            for mode in ("full", "incremental"):
+                stats = RunStats()
+                stats.add_time("dedup", 0.5)
+                append_report(stats.report(mode=mode), path)
+            with open(path, encoding="utf-8") as f:
+                reports = [json.loads(line) for line in f]
+        self.assertEqual([r["mode"] for r in reports], ["full", "incremental"])
+        self.assertEqual(reports[1]["stages"], {"dedup": {"seconds": 0.5, "calls": 1}})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
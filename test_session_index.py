@@ -0,0 +1,116 @@
+"""The interval index must answer /pools window queries exactly like the
+original full scan in get_pools(): pools are selected by a session fully inside
+the window, while `times` lists every session overlapping it."""
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from pool_store import PoolSnapshot
+
+FMT = "%Y-%m-%dT%H:%M:%S"
+MONDAY = datetime(2026, 7, 6)
+
+
+def scan_pools(good_list, start_date=None, end_date=None):
+    """The pre-index get_pools() selection loop, verbatim."""
+    matched_pools = []
+    matched_pool_ids = set()
+    for pool in good_list:
+        for swim_data in pool['swim_data']:
+            start_time = datetime.strptime(swim_data['start_time'], FMT)
+            end_time = datetime.strptime(swim_data['end_time'], FMT)
+            if start_date and start_time < start_date:
+                continue
+            if end_date and end_time > end_date:
+                continue
+            if pool["locationid"] not in matched_pool_ids:
+                matched_pools.append(pool)
+                matched_pool_ids.add(pool["locationid"])
+                break
+    return matched_pools
+
+
+def scan_times(pool, start_date=None, end_date=None):
+    """The pre-index simple=true time listing, verbatim."""
+    return [
+        swim_data
+        for swim_data in pool["swim_data"]
+        if (
+            (start_date is None or datetime.strptime(swim_data["end_time"], FMT) >= start_date) and
+            (end_date is None or datetime.strptime(swim_data["start_time"], FMT) <= end_date)
+        )
+    ]
+
+
+def synthetic_city(rng, pool_count=60):
+    pools = []
+    for i in range(pool_count):
+        sessions = []
+        for _ in range(rng.randint(0, 30)):
+            start = MONDAY + timedelta(days=rng.randint(0, 13), minutes=15 * rng.randint(20, 88))
+            # Mostly ordinary sessions, plus the odd overnight/mis-entered one
+            # whose end lands before its start.
+            minutes = rng.choice([45, 60, 75, 90, 135, 180, -600])
+            sessions.append({
+                "start_time": start.strftime(FMT),
+                "end_time": (start + timedelta(minutes=minutes)).strftime(FMT),
+                "pool_length": rng.choice(["25m", "50m", "Unknown"]),
+            })
+        # Stored order is not chronological (programs are concatenated per week).
+        rng.shuffle(sessions)
+        # Occasionally two records share a locationid; only the first may match.
+        locationid = i if rng.random() > 0.05 else max(i - 1, 0)
+        pools.append({"locationid": locationid, "complexname": f"Pool {i}", "swim_data": sessions})
+    return pools
+
+
+def random_bound(rng):
+    if rng.random() < 0.2:
+        return None
+    return MONDAY + timedelta(days=rng.randint(-1, 15), seconds=rng.randint(0, 86399))
+
+
+class IndexMatchesScan(unittest.TestCase):
+    def test_random_windows(self):
+        rng = random.Random(20260706)
+        for _ in range(6):
+            good_list = synthetic_city(rng)
+            snapshot = PoolSnapshot(good_list)
+            for _ in range(30):
+                start, end = random_bound(rng), random_bound(rng)
+                if rng.random() < 0.5 and start is not None:
+                    # Day-sized windows, like the frontend asks for.
+                    end = start.replace(hour=23, minute=59, second=59)
+                expected = scan_pools(good_list, start, end)
+                matched = snapshot.match(start, end)
+                self.assertEqual([snapshot.pools[i] for i in matched], expected, (start, end))
+                for i, pool in enumerate(good_list):
+                    self.assertEqual(snapshot.times(i, start, end), scan_times(pool, start, end), (i, start, end))
+
+    def test_next_session(self):
+        rng = random.Random(12)
+        for _ in range(4):
+            snapshot = PoolSnapshot(synthetic_city(rng))
+            for _ in range(30):
+                at = random_bound(rng) or MONDAY
+                for i, sessions in enumerate(snapshot.sessions):
+                    eligible = [(s, pos, e, item) for pos, (s, e, item) in enumerate(sessions) if e > at or s >= at]
+                    expected = min(eligible, default=None, key=lambda r: (r[0], r[1]))
+                    if expected is not None:
+                        expected = (expected[0], expected[2], expected[3])
+                    self.assertEqual(snapshot.index.next_session(i, at), expected, (i, at))
+
+    def test_boundaries_are_inclusive(self):
+        pool = {"locationid": 1, "complexname": "Edge", "swim_data": [
+            {"start_time": "2026-07-06T06:30:00", "end_time": "2026-07-06T08:00:00"},
+        ]}
+        snapshot = PoolSnapshot([pool])
+        start, end = datetime(2026, 7, 6, 6, 30), datetime(2026, 7, 6, 8, 0)
+        self.assertEqual(snapshot.match(start, end), [0])
+        self.assertEqual(snapshot.match(start + timedelta(seconds=1), end), [])
+        self.assertEqual(len(snapshot.times(0, end, end)), 1)
+        self.assertEqual(snapshot.times(0, end + timedelta(seconds=1), None), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -62,5 +62,29 @@ class SundayEveningWeekAnchor(unittest.TestCase):
         self.assertNotEqual(out["start_time"][:10], "2026-07-19")
 
 
+class BatchedConverterWeekAnchor(unittest.TestCase):
+    """The scrape converts every session with one SessionConverter built from
+    a single clock reading; it must anchor exactly like the per-call path."""
+
+    def test_injected_clock_matches_per_call_path(self):
+        converter = scrape.SessionConverter(now=SUNDAY_EVENING_ET)
+        with patch.object(scrape, "now_toronto", return_value=SUNDAY_EVENING_ET):
+            for day, expected_date in EXPECTED.items():
+                out = converter.convert(_session(day), week_offset=0)
+                self.assertEqual(out["start_time"], f"{expected_date}T13:00:00")
+                self.assertEqual(out, scrape.convert_to_new_format(_session(day), week_offset=0))
+
+    def test_clock_ticking_into_monday_mid_run_keeps_the_week(self):
+        # The run started Sunday evening; by the time later sessions are
+        # converted Toronto has reached Monday. They must stay in the same week.
+        converter = scrape.SessionConverter(now=SUNDAY_EVENING_ET)
+        monday_after = datetime(2026, 7, 13, 0, 5, tzinfo=TORONTO)
+        with patch.object(scrape, "now_toronto", return_value=monday_after):
+            out = converter.convert(_session("Sunday"), week_offset=0)
+            next_week = converter.convert(_session("Monday"), week_offset=1)
+        self.assertEqual(out["start_time"][:10], "2026-07-12")
+        self.assertEqual(next_week["start_time"][:10], "2026-07-13")
+
+
 if __name__ == "__main__":
     unittest.main(verbosity=2)